@@ -1,22 +1,54 @@
-from fastapi import FastAPI, HTTPException, Depends, File, Form, UploadFile
+from fastapi import FastAPI, HTTPException, Depends, File, Form, Header, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from web3 import Web3
-from eth_account import Account
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from eth_utils import is_address, to_checksum_address, to_wei
 from dotenv import load_dotenv
-import os
-import models
-import auth
+from pydantic import TypeAdapter, ValidationError
+import asyncio
 import json
-from typing import Optional
-from datetime import datetime
-from pathlib import Path
+import models
+import schemas
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from config import settings
+from container import ChainClients, services
+from utils.auth import auth
+from utils.challenges import LoginChallenges
+from utils.ipfs import ipfs
+from utils.passwords import PasswordPoolSaturated, password_hasher
+from utils.purchase_ledger import PendingPurchase, purchase_ledger
+from utils.receipts import normalize_tx_hash
+from utils.chain_views import ChainViewError
+from utils.metrics import RequestMetricsMiddleware, registry, stage
+from utils.wallets import create_account, verify_signature
+from utils.pagination import decode_cursor, encode_cursor, keyset_after
+from utils.ttl_cache import TTLCache
+from utils.search import search_books
+from utils.shared_state import LockTimeout, RateLimiter, shared_state
+from utils.query_counter import count_queries, instrument
+from utils.streaming import RangeNotSatisfiable, etag_matches, iter_file_range, parse_range_header
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients come up in the background: the worker accepts requests at once and
+    # chain routes wait for the node connection through services.get_chain
+    services.start(on_pending=confirm_pending_books)
+    try:
+        yield
+    finally:
+        await services.stop()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -26,150 +58,445 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes CORS handling and streamed response bodies
+app.add_middleware(RequestMetricsMiddleware)
 
-# Web3 configuration
-w3 = Web3(Web3.HTTPProvider(os.getenv('WEB3_PROVIDER_URI')))
+# Per worker: rows carry the account's private key, which stays out of shared state
+user_cache = TTLCache(ttl=settings.USER_CACHE_TTL)
+login_challenges = LoginChallenges(settings.APP_NAME, shared_state, ttl=settings.WALLET_CHALLENGE_TTL)
+login_failures = RateLimiter(
+    shared_state, "login-failures", settings.LOGIN_MAX_FAILURES, settings.LOGIN_FAILURE_WINDOW
+)
 
-# Load contract ABI and address
-contract_path = Path(__file__).parent / "contracts" / "BookMarketplace.json"
-with open(contract_path) as f:
-    contract_json = json.load(f)
-    CONTRACT_ABI = contract_json['abi']
+# Database configuration (schema is managed by migrations: `alembic upgrade head`).
+# Request handlers use AsyncSession: a pool checkout awaits instead of blocking the
+# event loop, and a handler ends its transaction before awaiting IPFS or the node.
+# The sync engine is left to worker threads (ledger flushes, revocation sync).
+from database import SessionLocal, engine, get_async_db, get_async_sessionmaker
+instrument(engine)
 
-CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS')
-contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    return JSONResponse(
+        status_code=503, content={"detail": "Database busy"}, headers={"Retry-After": "1"}
+    )
 
-# Database configuration
-from database import SessionLocal, engine
-models.Base.metadata.create_all(bind=engine)
+@dataclass(frozen=True)
+class CurrentUser:
+    """Detached snapshot of the authenticated user, safe to share across sessions"""
+    id: int
+    username: str
+    role: str
+    ethereum_address: str
+    ethereum_private_key: str
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_current_user(
+    token: dict = Depends(auth.verify_token),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Resolve the token's user once per request, reusing a short-lived cached snapshot"""
+    user = user_cache.get(token["user_id"])
+    if user is None:
+        row = await db.get(models.User, token["user_id"])
+        # The request's session is shared; its connection goes back while the handler runs
+        await db.close()
+        if row is None:
+            raise HTTPException(status_code=401, detail="User no longer exists")
+        user = CurrentUser(
+            id=row.id,
+            username=row.username,
+            role=row.role,
+            ethereum_address=row.ethereum_address,
+            ethereum_private_key=row.ethereum_private_key
+        )
+        user_cache.set(row.id, user)
+    return user
+
+if settings.QUERY_COUNT_HEADER:
+    @app.middleware("http")
+    async def query_count_header(request, call_next):
+        # Exposes SQL statements per request so tests can pin query counts
+        with count_queries() as counter:
+            response = await call_next(request)
+        response.headers["X-Query-Count"] = str(counter.count)
+        return response
 
 # Blockchain helper functions
-def get_nonce(address):
-    return w3.eth.get_transaction_count(address)
+def assign_created_books(contract, books, receipt):
+    """Match BookCreated events in a receipt to the books submitted with it"""
+    with stage("event_decode"):
+        events = contract.events.BookCreated().process_receipt(receipt) if receipt['status'] else []
+    ids_by_hash = {}
+    for event in events:
+        ids_by_hash.setdefault(event['args']['ipfsHash'], []).append(event['args']['bookId'])
+
+    for book in sorted(books, key=lambda b: b.id):
+        ids = ids_by_hash.get(book.book_hash)
+        if ids:
+            book.contract_id = ids.pop(0)
+            book.status = models.BookStatus.CONFIRMED
+        else:
+            # The receipt is final, so the failed-book recheck leaves this one alone
+            book.status = models.BookStatus.FAILED
+            book.reverted = True
+
+async def resolve_pending_books(chain: ChainClients, db: AsyncSession, recheck_failed: bool = False):
+    """Apply mined createBook(s) receipts to PENDING books, failing ones past the timeout.
 
-def send_transaction(transaction, private_key):
-    signed_txn = w3.eth.account.sign_transaction(transaction, private_key)
-    tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    return tx_receipt
+    With recheck_failed, books failed by the timeout within FAILED_BOOK_RECHECK_WINDOW
+    are looked up again, so a transaction that mined late still confirms them.
+    Receipts are requested together, so the gateway sends them as one batch.
+    """
+    now = datetime.now(timezone.utc)
+    unresolved = models.Book.status == models.BookStatus.PENDING
+    if recheck_failed:
+        unresolved = or_(unresolved, and_(
+            models.Book.status == models.BookStatus.FAILED,
+            models.Book.reverted.is_(False),
+            models.Book.contract_id.is_(None),
+            models.Book.created_at >= now - timedelta(seconds=settings.FAILED_BOOK_RECHECK_WINDOW)
+        ))
+    pending = (await db.scalars(
+        select(models.Book).where(unresolved, models.Book.transaction_hash.isnot(None))
+    )).all()
+    by_tx = {}
+    for book in pending:
+        by_tx.setdefault(book.transaction_hash, []).append(book)
+
+    receipts = await asyncio.gather(*(chain.tx_manager.get_receipt(tx_hash) for tx_hash in by_tx))
+    for (tx_hash, books), receipt in zip(by_tx.items(), receipts):
+        if receipt is None:
+            created_at = books[0].created_at
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if (now - created_at).total_seconds() > settings.TX_RECEIPT_TIMEOUT:
+                for book in books:
+                    book.status = models.BookStatus.FAILED
+            continue
+        chain.tx_builder.mined(tx_hash)
+        assign_created_books(chain.contract, books, receipt)
+
+async def confirm_pending_books():
+    """Resolve PENDING books from their createBook(s) receipts"""
+    # Only run by the receipt watcher, which starts once the chain clients exist
+    chain = services.chain
+    async with get_async_sessionmaker()() as db:
+        # Follow transactions that were re-priced (or mined under an earlier hash).
+        # Every worker re-prices the transactions it sent itself.
+        for old_hash, new_hash in (await chain.tx_builder.replace_stuck()).items():
+            await db.execute(
+                models.Book.__table__.update()
+                .where(models.Book.transaction_hash == old_hash)
+                .values(transaction_hash=new_hash)
+            )
+        
+        # The pending rows are shared, so one worker per pass sweeps them
+        try:
+            async with shared_state.lock("receipt-sweep", timeout=60, blocking_timeout=0):
+                # Late mining is rare, so timed-out books are only looked at now and then
+                recheck_failed = await shared_state.set(
+                    "failed-book-recheck", "1", ex=settings.FAILED_BOOK_RECHECK_INTERVAL, nx=True
+                )
+                await resolve_pending_books(chain, db, recheck_failed=recheck_failed)
+        except LockTimeout:
+            pass
+        with stage("db_commit"):
+            await db.commit()
 
 # API Routes
 @app.get("/health")
 async def health_check():
+    # Served from the background head poller: probes never wait on the node
+    chain = services.chain
+    if chain is None:
+        components = services.readiness()
+        return {
+            "status": "starting" if components["chain"] == "pending" else "unavailable",
+            "blockchain_connected": False,
+            "components": components,
+            "ipfs_cache": ipfs.cache.stats(),
+            "purchase_ledger": purchase_ledger.stats()
+        }
     return {
         "status": "healthy",
-        "blockchain_connected": w3.is_connected(),
-        "current_block": w3.eth.block_number
+        **chain.chain_head.status(),
+        "rpc_endpoints": chain.gateway.stats(),
+        "ipfs_cache": ipfs.cache.stats(),
+        "chain_views": chain.chain_views.stats(),
+        "purchase_ledger": purchase_ledger.stats()
     }
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """503 until the database, chain clients and node are all usable, for load balancer probes"""
+    await services.recheck()
+    components = services.readiness()
+    if not services.ready:
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+    return {"ready": services.ready, "components": components}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format; the response adds the utf-8 charset
+    return PlainTextResponse(registry.render(), media_type=registry.CONTENT_TYPE)
+
+@app.get("/ipfs/{ipfs_hash}")
+async def get_ipfs_file(
+    ipfs_hash: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Only files a book refers to, so the endpoint cannot proxy (and fill the cache with) arbitrary CIDs
+    known = await db.scalar(
+        select(models.Book.id)
+        .where(or_(models.Book.book_hash == ipfs_hash, models.Book.cover_hash == ipfs_hash))
+        .limit(1)
+    )
+    await db.close()
+    if known is None:
+        raise HTTPException(status_code=404, detail="IPFS File not found")
+
+    # CIDs are immutable, so repeat reads are served from the local cache
+    path = await ipfs.get_cached_path(ipfs_hash)
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
 @app.post("/register")
 async def register(
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
     role: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if role not in ["AUTHOR", "SELLER", "USER"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    if db.query(models.User).filter(models.User.username == username).first():
+    taken = await db.scalar(select(models.User.id).where(models.User.username == username))
+    await db.close()
+    if taken is not None:
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # Create Ethereum account for user
-    account = Account.create()
+    address, private_key = await asyncio.to_thread(create_account)
     
     user = models.User(
         username=username,
         email=email,
         role=role,
-        ethereum_address=account.address,
-        ethereum_private_key=account.key.hex()  # In production, encrypt this!
+        ethereum_address=address,
+        ethereum_private_key=private_key  # In production, encrypt this!
     )
-    user.set_password(password)
+    try:
+        user.hashed_password = await password_hasher.hash(password)
+    except PasswordPoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     
     return {
         "message": "Registration successful",
-        "ethereum_address": account.address
+        "ethereum_address": address
     }
 
 @app.post("/login")
 async def login(
+    request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if not user or not user.verify_password(password):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+    # Counted across workers per client and username, so guesses cannot be spread over
+    # processes, and one client's failures never lock the account holder out. Checked
+    # before bcrypt, so a client over the limit costs no hashing at all.
+    client = request.client.host if request.client else "unknown"
+    failure_key = f"{client}:{username}"
+    if await login_failures.exceeded(failure_key):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed logins",
+            headers={"Retry-After": str(login_failures.retry_after())}
+        )
     
-    access_token = auth.create_access_token(
-        data={"sub": user.username, "role": user.role, "user_id": user.id}
-    )
+    user = await db.scalar(select(models.User).where(models.User.username == username))
+    await db.close()
+    if not user:
+        await login_failures.hit(failure_key)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        valid = await password_hasher.verify(password, user.hashed_password)
+    except PasswordPoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    if not valid:
+        await login_failures.hit(failure_key)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    return issue_tokens(user)
+
+def issue_tokens(user):
+    """Access/refresh token pair for user, with the profile fields the frontend stores"""
+    claims = {"sub": user.username, "role": user.role, "user_id": user.id}
     return {
-        "access_token": access_token,
+        "access_token": auth.create_access_token(data=claims),
+        "refresh_token": auth.create_refresh_token(data=claims),
         "token_type": "bearer",
         "role": user.role,
         "username": user.username,
         "ethereum_address": user.ethereum_address
     }
 
-@app.post("/author/upload-book")
+@app.get("/auth/challenge")
+async def wallet_challenge(wallet_address: str):
+    if not is_address(wallet_address):
+        raise HTTPException(status_code=400, detail="Invalid wallet address")
+    return await login_challenges.issue(to_checksum_address(wallet_address))
+
+async def check_wallet_signature(credentials: schemas.WalletAuth, purpose: str = "login"):
+    """Consume the challenge credentials answer and verify its signature"""
+    message = await login_challenges.consume(credentials.wallet_address, credentials.nonce, purpose)
+    if message is None:
+        raise HTTPException(status_code=401, detail="Challenge expired or already used")
+    
+    # Far cheaper than bcrypt, but still CPU-bound elliptic-curve math
+    try:
+        valid = await asyncio.to_thread(
+            verify_signature, message, credentials.signature, credentials.wallet_address
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+@app.post("/auth/wallet")
+async def wallet_login(
+    credentials: schemas.WalletAuth,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Log in by signing a challenge with the account's wallet instead of a password"""
+    await check_wallet_signature(credentials)
+    
+    address = to_checksum_address(credentials.wallet_address)
+    user = await db.scalar(select(models.User).where(
+        or_(models.User.wallet_address == address, models.User.ethereum_address == address)
+    ))
+    if not user:
+        raise HTTPException(status_code=401, detail="Wallet is not linked to an account")
+    
+    return issue_tokens(user)
+
+@app.get("/account/wallet/challenge")
+async def wallet_link_challenge(
+    wallet_address: str,
+    user: CurrentUser = Depends(get_current_user)
+):
+    if not is_address(wallet_address):
+        raise HTTPException(status_code=400, detail="Invalid wallet address")
+    # Only this account can redeem it, so the signature cannot link the wallet elsewhere
+    return await login_challenges.issue(
+        to_checksum_address(wallet_address),
+        purpose=f"link:{user.id}",
+        statement=f"Link this wallet to the {settings.APP_NAME} account {user.username}"
+    )
+
+@app.post("/account/wallet")
+async def link_wallet(
+    credentials: schemas.WalletAuth,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Link a wallet the user controls, proven by signing a link challenge, for wallet login"""
+    await check_wallet_signature(credentials, purpose=f"link:{user.id}")
+    
+    address = to_checksum_address(credentials.wallet_address)
+    owner = await db.scalar(select(models.User.id).where(
+        or_(models.User.wallet_address == address, models.User.ethereum_address == address)
+    ))
+    if owner is not None and owner != user.id:
+        raise HTTPException(status_code=409, detail="Wallet is linked to another account")
+    
+    await db.execute(
+        models.User.__table__.update().where(models.User.id == user.id).values(wallet_address=address)
+    )
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Linked to another account since the check above
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Wallet is linked to another account")
+    return {"message": "Wallet linked", "wallet_address": address}
+
+@app.post("/token/refresh")
+async def refresh_token(
+    refresh_token: str = Form(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    claims = await auth.decode_token(refresh_token, "refresh")
+    # Role changes and deleted accounts take effect at refresh time
+    user = await db.get(models.User, claims["user_id"])
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    
+    # Rotate: each refresh token is usable once, even under concurrent refreshes
+    if not await db.run_sync(auth.revoke_token, claims):
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+    return issue_tokens(user)
+
+@app.post("/logout")
+async def logout(
+    refresh_token: Optional[str] = Form(None),
+    token: dict = Depends(auth.verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await db.run_sync(auth.revoke_token, token)
+    if refresh_token:
+        try:
+            refresh_claims = await auth.decode_token(refresh_token, "refresh")
+        except HTTPException:
+            refresh_claims = None
+        if refresh_claims and refresh_claims["user_id"] == token["user_id"]:
+            await db.run_sync(auth.revoke_token, refresh_claims)
+    return {"message": "Logged out"}
+
+@app.post("/author/upload-book", status_code=202)
 async def upload_book(
     title: str = Form(...),
     description: str = Form(...),
     price: float = Form(...),
     book_file: UploadFile = File(...),
     cover_file: Optional[UploadFile] = File(None),
-    token: dict = Depends(auth.verify_token),
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    chain: ChainClients = Depends(services.get_chain),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Verify user is an author
-    user = db.query(models.User).filter(models.User.username == token["sub"]).first()
     if user.role != "AUTHOR":
         raise HTTPException(status_code=403, detail="Only authors can upload books")
     
     try:
-        # Upload files to IPFS
-        book_hash = await ipfs.upload_file(book_file)
-        cover_hash = None
+        # Upload book and cover to IPFS in parallel
         if cover_file:
-            cover_hash = await ipfs.upload_file(cover_file)
-        
-        # Create book in blockchain
-        nonce = get_nonce(user.ethereum_address)
-        transaction = contract.functions.createBook(
-            title,
-            description,
-            Web3.to_wei(price, 'ether'),
-            book_hash,
-            cover_hash or ""
-        ).build_transaction({
-            'from': user.ethereum_address,
-            'nonce': nonce,
-            'gas': 2000000
-        })
-        
-        # Send transaction
-        receipt = send_transaction(transaction, user.ethereum_private_key)
+            book_hash, cover_hash = await asyncio.gather(
+                ipfs.upload_file(book_file),
+                ipfs.upload_file(cover_file)
+            )
+        else:
+            book_hash, cover_hash = await ipfs.upload_file(book_file), None
         
-        # Get book ID from event logs
-        book_created_event = contract.events.BookCreated().process_receipt(receipt)[0]
-        contract_book_id = book_created_event['args']['bookId']
+        # Create book in blockchain; a failed send hands the nonce back
+        async with chain.nonce_manager.reserve(user.ethereum_address) as nonce:
+            # Broadcast transaction; the receipt watcher confirms it later
+            tx_hash = await chain.tx_builder.send(
+                chain.contract.functions.createBook(title, book_hash, to_wei(price, 'ether')),
+                user.ethereum_address,
+                user.ethereum_private_key,
+                nonce
+            )
         
-        # Save to database
+        # Save to database as pending until the BookCreated event is seen
         book = models.Book(
             title=title,
             description=description,
@@ -177,102 +504,474 @@ async def upload_book(
             book_hash=book_hash,
             cover_hash=cover_hash,
             author_id=user.id,
-            contract_id=contract_book_id
+            transaction_hash=tx_hash,
+            status=models.BookStatus.PENDING
         )
         
         db.add(book)
-        db.commit()
-        db.refresh(book)
+        with stage("db_commit"):
+            await db.commit()
         
         return {
-            "message": "Book uploaded successfully",
+            "message": "Book submitted",
             "book_id": book.id,
-            "contract_id": book.contract_id,
+            "status": book.status,
+            "transaction_hash": tx_hash,
             "ipfs_hash": book_hash
         }
+    except HTTPException:
+        # Keeps its status, e.g. 413 for a file over IPFS_MAX_UPLOAD_SIZE
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/books")
+@app.post("/author/upload-books", status_code=202)
+async def upload_books(
+    manifest: str = Form(...),
+    files: List[UploadFile] = File(...),
+    user: CurrentUser = Depends(get_current_user),
+    chain: ChainClients = Depends(services.get_chain),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk catalog import: a JSON manifest of books plus the files it names"""
+    if user.role != "AUTHOR":
+        raise HTTPException(status_code=403, detail="Only authors can upload books")
+    
+    try:
+        entries = TypeAdapter(List[schemas.BookManifestEntry]).validate_json(manifest)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    if not entries:
+        raise HTTPException(status_code=400, detail="Manifest is empty")
+    
+    files_by_name = {f.filename: f for f in files}
+    names = {e.book_file for e in entries} | {e.cover_file for e in entries if e.cover_file}
+    missing = names - files_by_name.keys()
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing files: {', '.join(sorted(missing))}")
+    
+    # Pin every referenced file concurrently, bounded by the IPFS client
+    async def pin(name):
+        return name, await ipfs.upload_file(files_by_name[name])
+    
+    hashes = dict(await asyncio.gather(*(pin(name) for name in names)))
+    
+    # A retried manifest skips books the author already has, so it never lists them twice
+    rows = await db.execute(
+        select(models.Book.id, models.Book.book_hash, models.Book.transaction_hash).where(
+            models.Book.author_id == user.id,
+            models.Book.book_hash.in_({hashes[e.book_file] for e in entries}),
+            models.Book.status != models.BookStatus.FAILED
+        )
+    )
+    existing = {row.book_hash: row for row in rows}
+    await db.close()
+    
+    results = [
+        {"title": e.title, "status": "pending", "book_id": None, "transaction_hash": None, "error": None}
+        for e in entries
+    ]
+    queued = []
+    for index, e in enumerate(entries):
+        row = existing.get(hashes[e.book_file])
+        if row is not None:
+            results[index].update(status="existing", book_id=row.id, transaction_hash=row.transaction_hash)
+        else:
+            queued.append(index)
+    
+    # One createBooks transaction per batch, each committed on its own: a failed
+    # batch is reported per entry and leaves the others in place
+    tx_hashes = []
+    for start in range(0, len(queued), settings.BOOK_BATCH_SIZE):
+        batch = queued[start:start + settings.BOOK_BATCH_SIZE]
+        tx_hash = None
+        try:
+            call = chain.contract.functions.createBooks(
+                [entries[i].title for i in batch],
+                [hashes[entries[i].book_file] for i in batch],
+                [to_wei(entries[i].price, 'ether') for i in batch]
+            )
+            async with chain.nonce_manager.reserve(user.ethereum_address) as nonce:
+                tx_hash = await chain.tx_builder.send(
+                    call, user.ethereum_address, user.ethereum_private_key, nonce
+                )
+            
+            books = [
+                models.Book(
+                    title=entries[i].title,
+                    description=entries[i].description,
+                    price=entries[i].price,
+                    book_hash=hashes[entries[i].book_file],
+                    cover_hash=hashes.get(entries[i].cover_file) if entries[i].cover_file else None,
+                    author_id=user.id,
+                    transaction_hash=tx_hash,
+                    status=models.BookStatus.PENDING
+                )
+                for i in batch
+            ]
+            db.add_all(books)
+            with stage("db_commit"):
+                await db.commit()
+            await db.close()
+        except Exception as e:
+            await db.rollback()
+            for i in batch:
+                # A broadcast batch the database missed is still recorded by the indexer
+                results[i].update(status="failed", transaction_hash=tx_hash, error=str(e))
+            continue
+        
+        tx_hashes.append(tx_hash)
+        for i, book in zip(batch, books):
+            results[i].update(status="created", book_id=book.id, transaction_hash=tx_hash)
+    
+    created = sum(r["status"] == "created" for r in results)
+    failed = sum(r["status"] == "failed" for r in results)
+    return {
+        "message": "Books submitted" if not failed else "Some books could not be submitted",
+        "count": created,
+        "existing": len(entries) - len(queued),
+        "failed": failed,
+        "transaction_hashes": tx_hashes,
+        "books": results
+    }
+
+@app.get("/books", response_model=schemas.BookListResponse)
 async def get_books(
-    skip: int = 0,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    author_id: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    books = db.query(models.Book).offset(skip).limit(limit).all()
-    return books
+    try:
+        last_id, page = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Unconfirmed and failed uploads are only listed to their author, by /author/books
+    query = select(models.Book).where(models.Book.status == models.BookStatus.CONFIRMED)
+    if author_id is not None:
+        query = query.where(models.Book.author_id == author_id)
+    if min_price is not None:
+        query = query.where(models.Book.price >= min_price)
+    if max_price is not None:
+        query = query.where(models.Book.price <= max_price)
+    if created_after is not None:
+        query = query.where(models.Book.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(models.Book.created_at < created_before)
+    
+    # Counting is the expensive part of a filtered listing, so totals are cached
+    # briefly, once for all workers
+    count_key = "book-count:" + json.dumps(
+        [author_id, min_price, max_price, created_after, created_before], default=str
+    )
+    total = await shared_state.get(count_key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        await shared_state.set(count_key, str(total), ex=settings.BOOK_COUNT_CACHE_TTL)
+    total = int(total)
+    
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.scalars(keyset_after(query, models.Book, last_id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return schemas.BookListResponse(
+        books=[schemas.Book.model_validate(book) for book in rows],
+        total=total,
+        page=page,
+        size=len(rows),
+        next_cursor=encode_cursor(rows[-1].id, page + 1) if has_more else None
+    )
 
-@app.get("/books/{book_id}")
+@app.get("/books/search", response_model=schemas.BookSearchResponse)
+async def search_books_endpoint(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    books = await db.run_sync(search_books, q, limit=limit, offset=offset)
+    return schemas.BookSearchResponse(
+        query=q,
+        books=[schemas.Book.model_validate(book) for book in books],
+        size=len(books)
+    )
+
+@app.get("/books/{book_id}", response_model=schemas.Book)
 async def get_book(
     book_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    # Awaited lookup: the event loop keeps serving while the row is read
+    book = await db.get(models.Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
-    return book
+    return schemas.Book.model_validate(book)
+
+async def owns_on_chain(chain: ChainClients, user: CurrentUser, books) -> dict:
+    """Map book id to on-chain ownership, one batched RPC for uncached books"""
+    listed = [book for book in books if book.contract_id is not None]
+    if not listed:
+        return {book.id: False for book in books}
+    try:
+        owned = await chain.chain_views.has_purchased_many(
+            user.ethereum_address, [book.contract_id for book in listed]
+        )
+    except ChainViewError as e:
+        raise HTTPException(status_code=502, detail=f"Ownership check failed: {str(e)}")
+    return {book.id: owned.get(book.contract_id, False) for book in books}
+
+@app.get("/books/{book_id}/content")
+async def get_book_content(
+    book_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    book = await db.get(models.Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    # Only buyers with a completed purchase, and the author, may read the file
+    purchase = None
+    if book.author_id != user.id:
+        purchase = await db.scalar(select(models.Purchase.id).where(
+            models.Purchase.book_id == book_id,
+            models.Purchase.buyer_id == user.id,
+            models.Purchase.status == models.PurchaseStatus.COMPLETED
+        ))
+    # Not needed again: no connection is held while the file streams
+    await db.close()
+    if book.author_id != user.id:
+        if not purchase:
+            purchase = purchase_ledger.pending_for(user.id, book_id)
+        # Purchases not yet verified here are still honoured from the contract
+        if not purchase and not (await owns_on_chain(await services.get_chain(), user, [book]))[book.id]:
+            raise HTTPException(status_code=403, detail="Book not purchased")
+    
+    # The CID is content-addressed, so it is a strong validator
+    etag = f'"{book.book_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    cached_path = ipfs.cache.get(book.book_hash) if ipfs.cache else None
+    if cached_path is not None:
+        size = cached_path.stat().st_size
+    else:
+        try:
+            size = int((await ipfs.stat(book.book_hash))["Size"])
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"IPFS stat failed: {str(e)}")
+    
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    if cached_path is not None:
+        body = iter_file_range(cached_path, start, length, ipfs.chunk_size)
+    else:
+        body = ipfs.cat(book.book_hash, offset=start, length=length)
+        if ipfs.cache and length == size:
+            # The whole file is streaming anyway, so the cache is filled from the same bytes
+            body = ipfs.cache.tee(book.book_hash, body)
+    
+    return StreamingResponse(
+        body,
+        status_code=206 if byte_range else 200,
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
+def purchase_response(purchase, book, message):
+    # purchase_id is None while the purchase is still in the write-behind journal;
+    # transaction_hash identifies it either way
+    return {
+        "message": message,
+        "purchase_id": getattr(purchase, "id", None),
+        "transaction_hash": purchase.transaction_hash,
+        "book_hash": book.book_hash,
+        "content_url": f"/books/{book.id}/content"
+    }
 
 @app.post("/purchase/verify")
 async def verify_purchase(
     book_id: int,
     transaction_hash: str,
-    token: dict = Depends(auth.verify_token),
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    chain: ChainClients = Depends(services.get_chain),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    tx_hash = normalize_tx_hash(transaction_hash)
+    
+    # Retries of an already-recorded hash are answered from the unique index
+    existing = purchase_ledger.pending(tx_hash) or await db.scalar(select(models.Purchase).where(
+        models.Purchase.transaction_hash == tx_hash
+    ))
+    if existing:
+        if existing.buyer_id != user.id or existing.book_id != book_id:
+            raise HTTPException(status_code=409, detail="Transaction already used for another purchase")
+    
+    # Verify the book exists
+    book = await db.get(models.Book, book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if existing:
+        return purchase_response(existing, book, "Purchase already verified")
+    await db.close()
+    
     try:
-        # Verify transaction
-        receipt = w3.eth.get_transaction_receipt(transaction_hash)
-        if not receipt or not receipt['status']:
-            raise HTTPException(status_code=400, detail="Invalid transaction")
-        
-        # Verify the book exists
-        book = db.query(models.Book).filter(models.Book.id == book_id).first()
-        if not book:
-            raise HTTPException(status_code=404, detail="Book not found")
-        
-        # Create purchase record
-        purchase = models.Purchase(
-            book_id=book_id,
-            buyer_id=token["user_id"],
-            transaction_hash=transaction_hash,
-            purchase_price=book.price,
-            status="COMPLETED"
-        )
-        
-        db.add(purchase)
-        db.commit()
-        db.refresh(purchase)
-        
-        return {
-            "message": "Purchase verified successfully",
-            "purchase_id": purchase.id,
-            "book_hash": book.book_hash
-        }
+        # Decode the receipt once; later verifications of this hash skip the RPC
+        events = chain.receipt_cache.get(tx_hash)
+        if events is None:
+            receipt = await chain.tx_manager.get_receipt(tx_hash)
+            if receipt is None:
+                raise HTTPException(status_code=400, detail="Transaction not mined yet")
+            events = chain.receipt_cache.add_receipt(tx_hash, receipt)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    event = next(
+        (e for e in events if e["book_id"] == book.contract_id and e["buyer"] == user.ethereum_address),
+        None
+    )
+    if event is None:
+        raise HTTPException(status_code=400, detail="Transaction does not purchase this book for this buyer")
+    
+    # A concurrent retry, or another transaction for the same book, may have got there first.
+    # The journal is checked after the last await, so nothing can be journaled in between;
+    # entries stay pending until their rows are committed, so none falls between the two.
+    recorded = (await db.scalars(select(models.Purchase).where(
+        models.Purchase.book_id == book_id, models.Purchase.buyer_id == user.id
+    ))).all()
+    await db.close()
+    pending = purchase_ledger.pending(tx_hash)
+    recorded = [pending] if pending else purchase_ledger.pending_for(user.id, book_id) or recorded
+    if recorded:
+        return purchase_response(recorded[0], book, "Purchase already verified")
+    
+    # Journaled durably now; the row is inserted with the next batch
+    purchase = PendingPurchase(
+        book_id=book_id,
+        buyer_id=user.id,
+        transaction_hash=tx_hash,
+        purchase_price=event["price"],
+        created_at=datetime.now(timezone.utc)
+    )
+    try:
+        await purchase_ledger.record(purchase)
+    except OSError as e:
+        raise HTTPException(
+            status_code=503, detail=f"Purchase could not be recorded: {str(e)}", headers={"Retry-After": "1"}
+        )
+    chain.chain_views.mark_purchased(user.ethereum_address, book.contract_id)
+    
+    return purchase_response(purchase, book, "Purchase verified successfully")
+
+@app.get("/purchases/entitlements")
+async def get_entitlements(
+    book_ids: List[int] = Query(..., max_length=100),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Which of book_ids the user may read, checking the contract only for unrecorded purchases"""
+    books = (await db.scalars(select(models.Book).where(models.Book.id.in_(book_ids)))).all()
+    entitled = {book.id: book.author_id == user.id for book in books}
+    recorded = await db.scalars(select(models.Purchase.book_id).where(
+        models.Purchase.buyer_id == user.id,
+        models.Purchase.book_id.in_(book_ids),
+        models.Purchase.status == models.PurchaseStatus.COMPLETED
+    ))
+    for book_id in recorded:
+        entitled[book_id] = True
+    await db.close()
+    for purchase in purchase_ledger.pending_for(user.id):
+        if purchase.book_id in entitled:
+            entitled[purchase.book_id] = True
+    
+    unresolved = [book for book in books if not entitled[book.id]]
+    if unresolved:
+        entitled.update(await owns_on_chain(await services.get_chain(), user, unresolved))
+    return {"entitlements": {book_id: entitled.get(book_id, False) for book_id in book_ids}}
 
-@app.get("/purchases")
+@app.get("/purchases", response_model=List[schemas.Purchase])
 async def get_purchases(
     token: dict = Depends(auth.verify_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    purchases = db.query(models.Purchase).filter(
-        models.Purchase.buyer_id == token["user_id"]
-    ).all()
-    return purchases
+    # One extra SELECT ... IN loads every purchased book, however many rows
+    purchases = (await db.scalars(
+        select(models.Purchase).options(
+            selectinload(models.Purchase.book)
+        ).where(
+            models.Purchase.buyer_id == token["user_id"]
+        ).order_by(models.Purchase.created_at.desc(), models.Purchase.id.desc())
+    )).all()
+    
+    # Verified purchases still in the write-behind journal are listed first, newest first
+    recorded = {purchase.transaction_hash for purchase in purchases}
+    pending = [p for p in purchase_ledger.pending_for(token["user_id"]) if p.transaction_hash not in recorded]
+    if pending:
+        books = {
+            book.id: book for book in await db.scalars(select(models.Book).where(
+                models.Book.id.in_({p.book_id for p in pending})
+            ))
+        }
+        pending_rows = [
+            schemas.Purchase(
+                id=None,
+                book_id=p.book_id,
+                buyer_id=p.buyer_id,
+                transaction_hash=p.transaction_hash,
+                purchase_price=p.purchase_price,
+                status=models.PurchaseStatus.COMPLETED,
+                created_at=p.created_at,
+                book=schemas.Book.model_validate(books[p.book_id]) if p.book_id in books else None
+            )
+            for p in pending
+        ]
+        return pending_rows + [schemas.Purchase.model_validate(purchase) for purchase in purchases]
+    return [schemas.Purchase.model_validate(purchase) for purchase in purchases]
 
-@app.get("/author/books")
+@app.get("/author/books", response_model=List[schemas.Book])
 async def get_author_books(
-    token: dict = Depends(auth.verify_token),
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.username == token["sub"]).first()
     if user.role != "AUTHOR":
         raise HTTPException(status_code=403, detail="Only authors can access this endpoint")
     
-    books = db.query(models.Book).filter(models.Book.author_id == user.id).all()
-    return books
+    books = (await db.scalars(keyset_after(
+        select(models.Book).where(models.Book.author_id == user.id), models.Book, None
+    ))).all()
+    return [schemas.Book.model_validate(book) for book in books]
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several workers need state they can all see; see "Running several workers" in README.md
+    if settings.WORKERS > 1 and not shared_state.shared:
+        raise SystemExit("WORKERS > 1 needs a shared SHARED_STATE_URL (sqlite:/// or redis://)")
+    uvicorn.run("app:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
\ No newline at end of file
@@ -0,0 +1,253 @@
+# benchmarks/app_bench.py
+"""Throughput and latency percentiles for the main API paths.
+
+Runs the real app in-process through an ASGI client, against the fake chain
+and IPFS servers in benchmarks/fakes.py and a throwaway SQLite database, and
+reports req/s and p50/p95/p99 per endpoint at each concurrency level.
+
+Results can be saved as a JSON baseline and later runs compared against it;
+a drop in req/s or a rise in p95 beyond --threshold fails the run.
+
+    python benchmarks/app_bench.py --concurrency 1 8 32 --requests 100
+    python benchmarks/app_bench.py --save benchmarks/baselines/local.json
+    python benchmarks/app_bench.py --compare benchmarks/baselines/local.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+# Only the fakes here: backend modules read Settings on import, so they load after configure()
+from benchmarks.fakes import ABI_PATH, FakeChain, FakeIPFS, serve
+
+SCENARIOS = ["list_books", "get_book", "upload_book", "verify_purchase", "login"]
+PASSWORD = "correct horse battery staple"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+def configure(workdir: Path, chain_url: str, ipfs_url: str, chain: FakeChain, args):
+    """Point Settings at the fakes before the app (and its singletons) is imported"""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "IPFS_API_URL": ipfs_url,
+        "IPFS_CACHE_DIR": str(workdir / "ipfs_cache"),
+        "PURCHASE_JOURNAL_DIR": str(workdir / "purchase_journal"),
+        "WEB3_PROVIDER_URI": chain_url,
+        "CONTRACT_ADDRESS": chain.address,
+        "CONTRACT_ABI_PATH": str(ABI_PATH),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "DEBUG": "false"
+    })
+
+class Fixtures:
+    """Users, books and mined purchases the scenarios draw from"""
+
+    def __init__(self, api, chain: FakeChain):
+        self.api = api
+        self.chain = chain
+        self.book_ids = []
+        self.purchases = []
+
+    async def create_user(self, client, username, role):
+        response = await client.post("/register", data={
+            "username": username, "email": f"{username}@bench.local", "password": PASSWORD, "role": role
+        })
+        response.raise_for_status()
+        response = await client.post("/login", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        body = response.json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["ethereum_address"]
+
+    async def setup(self, client, books: int, purchases: int):
+        self.author_headers, self.author_address = await self.create_user(client, "bench_author", "AUTHOR")
+        self.buyer_headers, self.buyer_address = await self.create_user(client, "bench_buyer", "USER")
+
+        models = self.api.models
+        db = self.api.SessionLocal()
+        try:
+            author_id = db.query(models.User.id).filter(models.User.username == "bench_author").scalar()
+            rows = []
+            for i in range(books + purchases):
+                book_hash = f"Qm{i:044d}"
+                contract_id = self.chain.seed_book(self.author_address, f"Bench book {i}", book_hash, 10 ** 16)
+                rows.append(models.Book(
+                    title=f"Bench book {i}",
+                    description="Seeded for benchmarks",
+                    price=0.01,
+                    book_hash=book_hash,
+                    author_id=author_id,
+                    contract_id=contract_id,
+                    status=models.BookStatus.CONFIRMED
+                ))
+            db.add_all(rows)
+            db.commit()
+            self.book_ids = [row.id for row in rows[:books]]
+            # Each verification needs its own book: a buyer owns a book once
+            self.purchases = [
+                (row.id, self.chain.seed_purchase(self.buyer_address, row.contract_id))
+                for row in rows[books:]
+            ]
+        finally:
+            db.close()
+        self.purchase_iter = iter(self.purchases)
+
+    def request(self, scenario: str):
+        """Coroutine factory issuing one request of scenario; returns (response, expected status)"""
+        if scenario == "list_books":
+            return lambda client, i: (client.get("/books", params={"limit": 20}), 200)
+        if scenario == "get_book":
+            return lambda client, i: (client.get(f"/books/{random.choice(self.book_ids)}"), 200)
+        if scenario == "upload_book":
+            def upload(client, i):
+                content = os.urandom(4096)
+                return client.post(
+                    "/author/upload-book",
+                    headers=self.author_headers,
+                    data={"title": f"Uploaded {i}", "description": "Benchmark upload", "price": "0.01"},
+                    files={"book_file": (f"book-{i}.pdf", content, "application/pdf")}
+                ), 202
+            return upload
+        if scenario == "verify_purchase":
+            def verify(client, i):
+                book_id, tx_hash = next(self.purchase_iter)
+                return client.post(
+                    "/purchase/verify",
+                    headers=self.buyer_headers,
+                    params={"book_id": book_id, "transaction_hash": tx_hash}
+                ), 200
+            return verify
+        if scenario == "login":
+            return lambda client, i: (
+                client.post("/login", data={"username": "bench_buyer", "password": PASSWORD}), 200
+            )
+        raise ValueError(f"Unknown scenario {scenario}")
+
+async def run(client, make_request, concurrency: int, total: int):
+    latencies, errors = [], 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            pending, expected = make_request(client, i)
+            start = time.perf_counter()
+            try:
+                response = await pending
+                errors += response.status_code != expected
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "req_per_s": round(total / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "errors": errors
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Regressions of req/s or p95 beyond threshold, or new errors, as printable lines"""
+    regressions = []
+    for scenario, levels in baseline["results"].items():
+        for concurrency, base in levels.items():
+            current = results.get(scenario, {}).get(concurrency)
+            if current is None:
+                continue
+            if current["req_per_s"] < base["req_per_s"] * (1 - threshold):
+                regressions.append(
+                    f"{scenario} c={concurrency}: req/s {base['req_per_s']} -> {current['req_per_s']}"
+                )
+            if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{scenario} c={concurrency}: p95 {base['p95_ms']} ms -> {current['p95_ms']} ms"
+                )
+            if current["errors"] > base["errors"]:
+                regressions.append(
+                    f"{scenario} c={concurrency}: errors {base['errors']} -> {current['errors']}"
+                )
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+    parser.add_argument("--books", type=int, default=500, help="Books seeded for the read paths")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--save", type=Path, help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed fractional regression")
+    args = parser.parse_args()
+
+    chain, ipfs = FakeChain(), FakeIPFS()
+    workdir = Path(tempfile.mkdtemp(prefix="app-bench-"))
+    configure(workdir, serve(chain.asgi_app()), serve(ipfs.asgi_app()), chain, args)
+
+    import models
+    models.init_db()
+    import app as api
+
+    purchases = args.requests * len(args.concurrency) if "verify_purchase" in args.scenarios else 0
+    fixtures = Fixtures(api, chain)
+    results = {}
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(app=api.app, base_url="http://bench", timeout=60) as client:
+            await fixtures.setup(client, args.books, purchases)
+            print(f"{'scenario':<18}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+            for scenario in args.scenarios:
+                make_request = fixtures.request(scenario)
+                for concurrency in args.concurrency:
+                    r = await run(client, make_request, concurrency, args.requests)
+                    results.setdefault(scenario, {})[str(concurrency)] = r
+                    print(
+                        f"{scenario:<18}{concurrency:>6}{r['req_per_s']:>10.1f}{r['p50_ms']:>10.1f}"
+                        f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}"
+                    )
+
+    meta = {
+        "requests": args.requests,
+        "books": args.books,
+        "bcrypt_rounds": args.bcrypt_rounds,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%} against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,330 @@
+# benchmarks/fakes.py
+"""In-process stand-ins for the Ethereum node and the IPFS daemon.
+
+FakeChain answers the JSON-RPC methods the backend uses (including batches)
+and mines every transaction instantly, emitting the BookMarketplace events a
+real deployment would. FakeIPFS implements add/cat/stat/pin of the Kubo HTTP
+API over an in-memory store. serve() runs either on a real localhost port in
+a background thread, since web3's HTTPProvider and the IPFS client open their
+own connections.
+"""
+import hashlib
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import rlp
+import uvicorn
+from eth_abi import encode
+from eth_account import Account
+from eth_account._utils.typed_transactions import TypedTransaction
+from eth_utils import event_abi_to_log_topic, keccak
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from hexbytes import HexBytes
+from web3 import Web3
+
+ABI_PATH = Path(__file__).resolve().parent / "BookMarketplace.abi.json"
+CONTRACT_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+CHAIN_ID = 1337
+BASE_FEE = Web3.to_wei(1, "gwei")
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+def _word(value) -> str:
+    if isinstance(value, str):
+        return "0x" + "0" * 24 + value[2:].lower()
+    return "0x" + value.to_bytes(32, "big").hex()
+
+class RPCError(Exception):
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+class FakeChain:
+    """Instant-mining BookMarketplace node: books, purchases, receipts and logs"""
+
+    def __init__(self, abi_path: Path = ABI_PATH, address: str = CONTRACT_ADDRESS):
+        with open(abi_path) as f:
+            self.abi = json.load(f)["abi"]
+        self.address = Web3.to_checksum_address(address)
+        self.contract = Web3().eth.contract(address=self.address, abi=self.abi)
+        self.topics = {
+            item["name"]: "0x" + event_abi_to_log_topic(item).hex()
+            for item in self.abi if item["type"] == "event"
+        }
+        self.lock = threading.Lock()
+        self.block_number = 1
+        self.nonces: Dict[str, int] = defaultdict(int)
+        self.queued: Dict[str, Dict[int, tuple]] = defaultdict(dict)
+        self.receipts: Dict[str, Dict[str, Any]] = {}
+        self.logs: List[Dict[str, Any]] = []
+        self.books: Dict[int, Dict[str, Any]] = {}
+        self.author_books: Dict[str, List[int]] = defaultdict(list)
+        self.purchases = set()
+        self.calls = defaultdict(int)
+
+    # Contract state
+
+    def _create_book(self, author: str, title: str, ipfs_hash: str, price: int) -> Dict[str, Any]:
+        book_id = len(self.books) + 1
+        now = int(time.time())
+        self.books[book_id] = {
+            "id": book_id, "author": author, "title": title, "ipfsHash": ipfs_hash, "price": price,
+            "isActive": True, "copiesSold": 0, "totalRevenue": 0, "createdAt": now, "updatedAt": now
+        }
+        self.author_books[author].append(book_id)
+        return {
+            "topics": [self.topics["BookCreated"], _word(book_id), _word(author)],
+            "data": "0x" + encode(["string", "uint256", "string"], [title, price, ipfs_hash]).hex()
+        }
+
+    def _purchase(self, buyer: str, book_id: int) -> Dict[str, Any]:
+        book = self.books[book_id]
+        self.purchases.add((buyer, book_id))
+        book["copiesSold"] += 1
+        book["totalRevenue"] += book["price"]
+        return {
+            "topics": [self.topics["BookPurchased"], _word(book_id), _word(buyer), _word(book["author"])],
+            "data": "0x" + encode(["uint256"], [book["price"]]).hex()
+        }
+
+    def _mine(self, tx_hash: str, sender: str, events: List[Dict[str, Any]], status: int = 1) -> Dict[str, Any]:
+        self.block_number += 1
+        block_hash = "0x" + keccak(text=f"block-{self.block_number}").hex()
+        logs = [
+            dict(
+                event,
+                address=self.address,
+                blockNumber=_hex(self.block_number),
+                blockHash=block_hash,
+                transactionHash=tx_hash,
+                transactionIndex="0x0",
+                logIndex=_hex(i),
+                removed=False
+            )
+            for i, event in enumerate(events)
+        ]
+        self.logs.extend(logs)
+        receipt = {
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "blockHash": block_hash,
+            "blockNumber": _hex(self.block_number),
+            "from": sender,
+            "to": self.address,
+            "cumulativeGasUsed": "0x30d40",
+            "gasUsed": "0x30d40",
+            "effectiveGasPrice": _hex(BASE_FEE),
+            "contractAddress": None,
+            "logs": logs,
+            "logsBloom": "0x" + "00" * 256,
+            "status": _hex(status),
+            "type": "0x2"
+        }
+        self.receipts[tx_hash] = receipt
+        return receipt
+
+    def seed_book(self, author: str, title: str, ipfs_hash: str, price: int) -> int:
+        """Create a book directly, as if an earlier createBook had been mined"""
+        with self.lock:
+            self._mine("0x" + keccak(text=f"seed-book-{len(self.books)}").hex(), author,
+                       [self._create_book(Web3.to_checksum_address(author), title, ipfs_hash, price)])
+            return len(self.books)
+
+    def seed_purchase(self, buyer: str, book_id: int) -> str:
+        """Mine a purchaseBook transaction and return its hash"""
+        buyer = Web3.to_checksum_address(buyer)
+        with self.lock:
+            tx_hash = "0x" + keccak(text=f"seed-purchase-{buyer}-{book_id}").hex()
+            self.nonces[buyer] += 1
+            self._mine(tx_hash, buyer, [self._purchase(buyer, book_id)])
+            return tx_hash
+
+    # JSON-RPC
+
+    def _send_raw_transaction(self, raw_hex: str) -> str:
+        raw = HexBytes(raw_hex)
+        sender = Account.recover_transaction(raw)
+        if raw[0] >= 0xc0:
+            nonce, _, _, to, _, data = rlp.decode(raw)[:6]
+            nonce = int.from_bytes(nonce, "big")
+        else:
+            fields = TypedTransaction.from_bytes(raw).as_dict()
+            nonce, to, data = fields["nonce"], fields["to"], fields["data"]
+        if nonce < self.nonces[sender]:
+            raise RPCError(f"nonce too low: next nonce {self.nonces[sender]}, tx nonce {nonce}")
+        if Web3.to_checksum_address(to) != self.address:
+            raise RPCError("transaction is not addressed to the marketplace")
+
+        # Like a mempool: future nonces wait until the gap before them is filled
+        tx_hash = "0x" + keccak(raw).hex()
+        self.queued[sender][nonce] = (tx_hash, data)
+        while self.nonces[sender] in self.queued[sender]:
+            queued_hash, queued_data = self.queued[sender].pop(self.nonces[sender])
+            self._execute(sender, queued_hash, queued_data)
+        return tx_hash
+
+    def _execute(self, sender: str, tx_hash: str, data):
+        func, args = self.contract.decode_function_input(data)
+        if func.fn_name == "createBook":
+            events = [self._create_book(sender, args["title"], args["ipfsHash"], args["price"])]
+        elif func.fn_name == "createBooks":
+            events = [
+                self._create_book(sender, title, ipfs_hash, price)
+                for title, ipfs_hash, price in zip(args["titles"], args["ipfsHashes"], args["prices"])
+            ]
+        else:
+            events = []
+
+        self.nonces[sender] += 1
+        # Unsupported functions are mined as reverted
+        self._mine(tx_hash, sender, events, status=1 if events else 0)
+
+    def _call(self, transaction: Dict[str, Any]) -> str:
+        func, args = self.contract.decode_function_input(transaction["data"])
+        if func.fn_name == "hasPurchased":
+            value = (Web3.to_checksum_address(args["buyer"]), args["bookId"]) in self.purchases
+            return "0x" + encode(["bool"], [value]).hex()
+        if func.fn_name == "getAuthorBooks":
+            return "0x" + encode(["uint256[]"], [self.author_books[Web3.to_checksum_address(args["author"])]]).hex()
+        if func.fn_name == "getBook":
+            book = self.books.get(args["bookId"])
+            if book is None:
+                raise RPCError("execution reverted: Book does not exist", 3)
+            fields = [book[name] for name in (
+                "id", "author", "title", "ipfsHash", "price", "isActive",
+                "copiesSold", "totalRevenue", "createdAt", "updatedAt"
+            )]
+            types = "(uint256,address,string,string,uint256,bool,uint256,uint256,uint256,uint256)"
+            return "0x" + encode([types], [fields]).hex()
+        raise RPCError(f"{func.fn_name} is not supported by the fake chain")
+
+    def _get_logs(self, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        start = int(query.get("fromBlock", "0x0"), 16)
+        end = int(query.get("toBlock", _hex(self.block_number)), 16)
+        wanted = query.get("topics") or [None]
+        first = wanted[0]
+        if isinstance(first, str):
+            first = [first]
+        return [
+            log for log in self.logs
+            if start <= int(log["blockNumber"], 16) <= end and (first is None or log["topics"][0] in first)
+        ]
+
+    def handle(self, method: str, params: List[Any]) -> Any:
+        self.calls[method] += 1
+        with self.lock:
+            if method == "eth_chainId":
+                return _hex(CHAIN_ID)
+            if method == "net_version":
+                return str(CHAIN_ID)
+            if method == "eth_blockNumber":
+                return _hex(self.block_number)
+            if method == "eth_getTransactionCount":
+                return _hex(self.nonces[Web3.to_checksum_address(params[0])])
+            if method == "eth_estimateGas":
+                return _hex(150000 + 16 * len(params[0].get("data", "")) // 2)
+            if method == "eth_gasPrice":
+                return _hex(2 * BASE_FEE)
+            if method == "eth_maxPriorityFeePerGas":
+                return _hex(BASE_FEE // 10)
+            if method == "eth_feeHistory":
+                count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+                return {
+                    "oldestBlock": _hex(max(0, self.block_number - count + 1)),
+                    "baseFeePerGas": [_hex(BASE_FEE)] * (count + 1),
+                    "gasUsedRatio": [0.5] * count,
+                    "reward": [[_hex(BASE_FEE // 10)] for _ in range(count)]
+                }
+            if method == "eth_sendRawTransaction":
+                return self._send_raw_transaction(params[0])
+            if method == "eth_getTransactionReceipt":
+                return self.receipts.get(params[0].lower())
+            if method == "eth_call":
+                return self._call(params[0])
+            if method == "eth_getLogs":
+                return self._get_logs(params[0])
+        raise RPCError(f"the method {method} does not exist", -32601)
+
+    def _respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            result = self.handle(request["method"], request.get("params") or [])
+            return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+        except RPCError as e:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32603, "message": repr(e)}}
+
+    def asgi_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/")
+        async def rpc(request: Request):
+            payload = await request.json()
+            if isinstance(payload, list):
+                return JSONResponse([self._respond(item) for item in payload])
+            return JSONResponse(self._respond(payload))
+
+        return app
+
+class FakeIPFS:
+    """Kubo HTTP API subset over an in-memory content store"""
+
+    def __init__(self):
+        self.store: Dict[str, bytes] = {}
+
+    def asgi_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/api/v0/add")
+        async def add(request: Request):
+            body = await request.body()
+            # Single-file multipart body: skip the part headers, drop the closing boundary
+            _, _, rest = body.partition(b"\r\n\r\n")
+            data = rest[:rest.rfind(b"\r\n--")]
+            cid = "Qm" + hashlib.sha256(data).hexdigest()[:44]
+            self.store[cid] = data
+            return {"Name": "file", "Hash": cid, "Size": str(len(data))}
+
+        @app.post("/api/v0/cat")
+        async def cat(arg: str, offset: int = 0, length: Optional[int] = None):
+            if arg not in self.store:
+                raise HTTPException(status_code=500, detail="not found")
+            data = self.store[arg][offset:]
+            if length is not None:
+                data = data[:length]
+            return StreamingResponse(iter([data[i:i + 65536] for i in range(0, len(data), 65536)]))
+
+        @app.post("/api/v0/files/stat")
+        async def stat(arg: str):
+            cid = arg.split("/")[-1]
+            if cid not in self.store:
+                raise HTTPException(status_code=500, detail="not found")
+            return {"Hash": cid, "Size": len(self.store[cid]), "Type": "file"}
+
+        @app.post("/api/v0/pin/add")
+        async def pin(arg: str):
+            return {"Pins": [arg]}
+
+        return app
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(app) -> str:
+    """Run an ASGI app on a free localhost port in a daemon thread; returns its URL"""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
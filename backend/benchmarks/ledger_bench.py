@@ -0,0 +1,140 @@
+# benchmarks/ledger_bench.py
+"""Purchase recording rate during a burst: per-request commits vs the write-behind ledger.
+
+Records --purchases verified purchases from --concurrency concurrent tasks
+into a throwaway SQLite database, first with one add/commit/refresh each
+(as /purchase/verify did before the ledger), then through PurchaseLedger,
+timing until every row is in the purchases table. Reports purchases/s and
+p95 time until the caller may answer.
+
+    python benchmarks/ledger_bench.py --purchases 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.app_bench import percentile
+
+def seed(purchases: int):
+    """One buyer and a book per purchase (a buyer owns a book once)"""
+    import models
+    from database import SessionLocal
+
+    models.init_db()
+    db = SessionLocal()
+    try:
+        buyer = models.User(
+            username="ledger_buyer",
+            email="ledger@bench.local",
+            hashed_password="!",
+            role="USER",
+            ethereum_address="0x" + "1" * 40,
+            ethereum_private_key="0x" + "1" * 64
+        )
+        db.add(buyer)
+        db.flush()
+        books = [
+            models.Book(
+                title=f"Ledger book {i}",
+                description="Seeded for benchmarks",
+                price=0.01,
+                book_hash=f"Qm{i:044d}",
+                author_id=buyer.id,
+                contract_id=i,
+                status=models.BookStatus.CONFIRMED
+            )
+            for i in range(purchases)
+        ]
+        db.add_all(books)
+        db.commit()
+        return buyer.id, [book.id for book in books]
+    finally:
+        db.close()
+
+async def burst(record, jobs, concurrency: int):
+    latencies = []
+    queue = iter(jobs)
+
+    async def worker():
+        for job in queue:
+            start = time.perf_counter()
+            await record(job)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=2000, help="Purchases per mode")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--flush-interval", type=float, default=0.2)
+    parser.add_argument("--no-fsync", action="store_true", help="Skip the fsync per journal append")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="ledger-bench-"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    import models
+    from database import SessionLocal
+    from utils.purchase_ledger import PendingPurchase, PurchaseLedger
+
+    buyer_id, book_ids = seed(args.purchases * 2)
+    commit_books, ledger_books = book_ids[:args.purchases], book_ids[args.purchases:]
+
+    def purchase(book_id):
+        return PendingPurchase(
+            book_id=book_id,
+            buyer_id=buyer_id,
+            transaction_hash=f"0x{book_id:064x}",
+            purchase_price=0.01,
+            created_at=datetime.now(timezone.utc)
+        )
+
+    async def commit_each(book_id):
+        # The pre-ledger route: a session, commit and refresh per purchase, on the event loop
+        db = SessionLocal()
+        try:
+            row = models.Purchase(**vars(purchase(book_id)), status=models.PurchaseStatus.COMPLETED)
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+        finally:
+            db.close()
+
+    ledger = PurchaseLedger(str(workdir / "journal"), flush_interval=args.flush_interval, fsync=not args.no_fsync)
+
+    async def journal(book_id):
+        await ledger.record(purchase(book_id))
+
+    print(f"{'mode':<10}{'purchases/s':>14}{'p50 ms':>10}{'p95 ms':>10}{'rows':>8}")
+    results = {}
+    for mode, record, books in (("commit", commit_each, commit_books), ("ledger", journal, ledger_books)):
+        if mode == "ledger":
+            ledger.start()
+        started = time.perf_counter()
+        latencies = await burst(record, books, args.concurrency)
+        if mode == "ledger":
+            # Counted until the last row is in the table, not just journaled
+            await ledger.stop()
+        elapsed = time.perf_counter() - started
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Purchase).filter(models.Purchase.book_id.in_(books)).count()
+        finally:
+            db.close()
+        results[mode] = len(books) / elapsed
+        print(
+            f"{mode:<10}{results[mode]:>14.1f}{percentile(latencies, 50) * 1000:>10.2f}"
+            f"{percentile(latencies, 95) * 1000:>10.2f}{rows:>8}"
+        )
+    print(f"ledger/commit: {results['ledger'] / results['commit']:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
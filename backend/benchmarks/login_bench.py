@@ -0,0 +1,111 @@
+# benchmarks/login_bench.py
+"""Login throughput and latency with bcrypt inline vs. on the worker pool.
+
+Builds a minimal app exposing the same /login flow (user lookup stubbed out)
+and fires concurrent logins through an in-process ASGI client while a probe
+task measures event loop lag. With hashing inline, every other request waits
+out each bcrypt call; with the pool, loop lag stays flat.
+
+    python benchmarks/login_bench.py --concurrency 1 8 32 --requests 64
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI, Form, HTTPException
+
+from utils.passwords import PasswordHasher, PasswordPoolSaturated
+
+PASSWORD = "correct horse battery staple"
+
+def build_app(hasher: PasswordHasher, offload: bool) -> FastAPI:
+    app = FastAPI()
+    hashed = hasher.context.hash(PASSWORD)
+
+    @app.post("/login")
+    async def login(username: str = Form(...), password: str = Form(...)):
+        try:
+            if offload:
+                valid = await hasher.verify(password, hashed)
+            else:
+                valid = hasher.context.verify(password, hashed)
+        except PasswordPoolSaturated:
+            raise HTTPException(status_code=503, detail="saturated")
+        if not valid:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"ok": True}
+
+    return app
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+async def run(app: FastAPI, concurrency: int, total: int):
+    login_latencies, loop_lags, rejected = [], [], 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def login_worker():
+            nonlocal rejected
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/login", data={"username": "u", "password": PASSWORD})
+                login_latencies.append(time.perf_counter() - start)
+                rejected += response.status_code == 503
+
+        async def probe(done: asyncio.Event):
+            # How late a 5 ms timer fires is how long any other request would stall
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                loop_lags.append(time.perf_counter() - start - 0.005)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "req_per_s": total / elapsed,
+        "login_p50_ms": statistics.median(login_latencies) * 1000,
+        "login_p99_ms": percentile(login_latencies, 99) * 1000,
+        "loop_lag_p99_ms": percentile(loop_lags, 99) * 1000 if loop_lags else 0.0,
+        "rejected": rejected
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(rounds=args.rounds, max_workers=args.workers, max_pending=args.max_pending)
+    print(f"{'mode':<8}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'lag p99':>10}{'503s':>6}")
+    for offload in (False, True):
+        app = build_app(hasher, offload)
+        for concurrency in args.concurrency:
+            r = await run(app, concurrency, args.requests)
+            print(
+                f"{'pool' if offload else 'inline':<8}{concurrency:>6}{r['req_per_s']:>10.1f}"
+                f"{r['login_p50_ms']:>10.1f}{r['login_p99_ms']:>10.1f}{r['loop_lag_p99_ms']:>10.1f}{r['rejected']:>6}"
+            )
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
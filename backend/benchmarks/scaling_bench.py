@@ -0,0 +1,235 @@
+# benchmarks/scaling_bench.py
+"""Read throughput of the API at increasing worker counts.
+
+Serves the app with `uvicorn --workers N` for each N in --workers, sharing
+state through SQLite as a multi-worker deployment on one host would, against
+the fake chain in benchmarks/fakes.py. GET /books and GET /books/{id} are
+driven from --clients separate load processes for --duration seconds each.
+Reports req/s, p50/p95 and scaling efficiency (req/s at N workers over N
+times req/s at one worker).
+
+Near-linear scaling needs at least as many free cores as workers plus what
+the load processes use; on a small machine, run the load elsewhere with
+--url against a server started separately.
+
+    python benchmarks/scaling_bench.py --workers 1 2 4 --clients 2 --concurrency 32
+    python benchmarks/scaling_bench.py --save benchmarks/baselines/scaling.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+import httpx
+
+from benchmarks.app_bench import percentile
+from benchmarks.fakes import ABI_PATH, FakeChain, _free_port, serve
+
+SCENARIOS = ["list_books", "get_book"]
+
+def seed(database_url: str, books: int) -> int:
+    """Migrate a fresh database and insert books; returns the highest book id"""
+    os.environ["DATABASE_URL"] = database_url
+    import models
+    from database import SessionLocal
+
+    models.init_db()
+    db = SessionLocal()
+    try:
+        author = models.User(
+            username="scaling_author",
+            email="scaling@bench.local",
+            hashed_password="!",
+            role="AUTHOR",
+            ethereum_address="0x" + "0" * 40,
+            ethereum_private_key="0x" + "0" * 64
+        )
+        db.add(author)
+        db.flush()
+        db.add_all(
+            models.Book(
+                title=f"Scaling book {i}",
+                description="Seeded for benchmarks",
+                price=0.01,
+                book_hash=f"Qm{i:044d}",
+                author_id=author.id,
+                contract_id=i,
+                status=models.BookStatus.CONFIRMED
+            )
+            for i in range(books)
+        )
+        db.commit()
+        return db.query(models.Book.id).order_by(models.Book.id.desc()).limit(1).scalar()
+    finally:
+        db.close()
+
+def start_server(workers: int, port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log"
+        ],
+        cwd=BACKEND,
+        env=env
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            # Several probes, so every worker has started its clients before timing starts
+            if all(httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200 for _ in range(workers * 4)):
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+def load(url: str, scenario: str, max_id: int, concurrency: int, duration: float, results):
+    """One load process: concurrency connections issuing requests for duration seconds"""
+    async def run():
+        latencies, errors = [], 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+            deadline = time.perf_counter() + duration
+
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    if scenario == "list_books":
+                        request = client.get("/books", params={"limit": 20})
+                    else:
+                        request = client.get(f"/books/{random.randint(1, max_id)}")
+                    start = time.perf_counter()
+                    try:
+                        response = await request
+                        errors += response.status_code != 200
+                    except httpx.HTTPError:
+                        errors += 1
+                    latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors
+
+    results.put(asyncio.run(run()))
+
+def measure(url: str, scenario: str, max_id: int, clients: int, concurrency: int, duration: float) -> dict:
+    # Spawned, not forked: this process runs the fake chain's server thread
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    per_client = max(concurrency // clients, 1)
+    processes = [
+        context.Process(target=load, args=(url, scenario, max_id, per_client, duration, results))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+    return {
+        "req_per_s": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "errors": errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--clients", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Open connections across all clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and worker count")
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--url", help="Load an already running server instead of starting one")
+    parser.add_argument("--max-id", type=int, help="Highest book id on the --url server")
+    parser.add_argument("--save", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        runs = [(None, args.url, args.max_id or args.books)]
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="scaling-bench-"))
+        chain = FakeChain()
+        chain_url = serve(chain.asgi_app())
+        max_id = seed(f"sqlite:///{workdir / 'bench.db'}", args.books)
+        runs = [(workers, None, max_id) for workers in args.workers]
+
+    print(f"{'scenario':<14}{'workers':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'scaling':>9}{'errors':>8}")
+    results = {}
+    for workers, url, max_id in runs:
+        server = None
+        if url is None:
+            port = _free_port()
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{workdir / 'bench.db'}",
+                SHARED_STATE_URL=f"sqlite:///{workdir / 'shared_state.db'}",
+                IPFS_CACHE_DIR=str(workdir / "ipfs_cache"),
+                WEB3_PROVIDER_URI=chain_url,
+                CONTRACT_ADDRESS=chain.address,
+                CONTRACT_ABI_PATH=str(ABI_PATH),
+                ABI_CACHE_DIR=str(workdir / "abi_cache"),
+                DEBUG="false"
+            )
+            server = start_server(workers, port, env)
+            url = f"http://127.0.0.1:{port}"
+        try:
+            for scenario in args.scenarios:
+                r = measure(url, scenario, max_id, args.clients, args.concurrency, args.duration)
+                one = results.get(scenario, {}).get("1")
+                if workers and one:
+                    r["scaling"] = round(r["req_per_s"] / (workers * one["req_per_s"]), 3)
+                results.setdefault(scenario, {})[str(workers or "external")] = r
+                scaling = f"{r['scaling']:.2f}" if "scaling" in r else "-"
+                print(
+                    f"{scenario:<14}{workers or '-':>8}{r['req_per_s']:>10.1f}{r['p50_ms']:>10.1f}"
+                    f"{r['p95_ms']:>10.1f}{scaling:>9}{r['errors']:>8}"
+                )
+        finally:
+            if server is not None:
+                stop_server(server)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "clients": args.clients,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "books": args.books,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        args.save.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"Saved {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,108 @@
 from pydantic_settings import BaseSettings
 from typing import Optional, List
 from functools import lru_cache
+from pathlib import Path
 
 class Settings(BaseSettings):
     # Application
     APP_NAME: str = "Book Marketplace"
     API_V1_PREFIX: str = "/api/v1"
     DEBUG: bool = True
+    QUERY_COUNT_HEADER: bool = False  # Add X-Query-Count (SQL statements per request) to responses; for tests
 
     # Database
     DATABASE_URL: str = "sqlite:///./bookmarket.db"
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10  # Persistent connections per worker for request handlers (server databases)
+    DB_THREAD_POOL_SIZE: int = 5  # Persistent connections per worker for background threads
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a pooled connection; requests then get 503
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # How long a writer waits on a locked database
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    BOOK_COUNT_CACHE_TTL: float = 30.0  # Seconds a /books total is reused per filter set
+    
+    # Serving
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 1  # Worker processes for `python app.py`; above 1 needs a shared SHARED_STATE_URL
+    SHARED_STATE_URL: str = "memory://"  # memory://, sqlite:///./shared_state.db or redis://host:6379/0
     
     # Authentication
     SECRET_KEY: str = "your-super-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    WALLET_CHALLENGE_TTL: float = 300.0  # Seconds a wallet login nonce stays valid
+    LOGIN_MAX_FAILURES: int = 10  # Failed logins per client and username per window before further attempts get 429; 0 disables
+    LOGIN_FAILURE_WINDOW: float = 300.0
+    REVOCATION_SYNC_INTERVAL: float = 10.0  # Seconds between pulls of tokens revoked by other workers
+    REVOCATION_SYNC_OVERLAP: float = 60.0  # Seconds of past revocations re-read by each pull (late commits, clock skew)
+    REVOCATION_REBUILD_INTERVAL: float = 3600.0  # Seconds between filter rebuilds that drop expired ids
+    REVOCATION_BLOOM_CAPACITY: int = 100000  # Revoked ids before the false-positive rate degrades
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    USER_CACHE_TTL: float = 60.0  # Seconds an authenticated user's row is reused across requests
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost factor for new hashes
+    PASSWORD_HASH_WORKERS: int = 4  # Threads hashing/verifying passwords per worker
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Queued hash calls before /login and /register return 503
     
     # IPFS
     IPFS_API_URL: str = "http://127.0.0.1:5001"
     IPFS_GATEWAY_URL: str = "http://127.0.0.1:8080"
+    IPFS_MAX_UPLOAD_SIZE: int = 200 * 1024 * 1024  # Bytes per uploaded file
+    IPFS_UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read from the request per chunk
+    IPFS_TIMEOUT: float = 30.0  # Seconds per IPFS API request; uploads apply it per chunk written and to the reply
+    IPFS_MAX_RETRIES: int = 3
+    IPFS_MAX_CONCURRENCY: int = 16  # Concurrent uploads and other IPFS API requests per worker
+    IPFS_MAX_STREAMS: int = 64  # Concurrent file downloads from IPFS per worker, limited separately
+    IPFS_CACHE_DIR: str = "./ipfs_cache"
+    IPFS_CACHE_MAX_SIZE: int = 2 * 1024 * 1024 * 1024  # Bytes kept on disk before LRU eviction, split evenly between WORKERS
     
     # Blockchain
     WEB3_PROVIDER_URI: str = "http://127.0.0.1:8545"  # Ganache default
+    WEB3_FALLBACK_URIS: List[str] = []  # Same-chain endpoints used while the primary is failing
+    RPC_TIMEOUT: float = 10.0  # Seconds per JSON-RPC HTTP request
+    RPC_MAX_CONNECTIONS: int = 20  # Pooled keep-alive connections per endpoint
+    RPC_BATCH_SIZE: int = 100  # Calls per JSON-RPC batch request
+    RPC_BATCH_WINDOW_MS: float = 2.0  # How long a call waits for others to share its batch
+    RPC_FAILURE_THRESHOLD: int = 3  # Consecutive transport failures before an endpoint is skipped
+    RPC_ENDPOINT_COOLDOWN: float = 30.0  # Seconds a failing endpoint stays out of rotation
     CONTRACT_ADDRESS: Optional[str] = None  # Set after contract deployment
-    CONTRACT_ABI_PATH: str = "./contracts/BookMarket.json"
+    CONTRACT_ABI_PATH: str = "./contracts/BookMarketplace.json"  # Relative to the backend directory
+    ABI_CACHE_DIR: Optional[str] = "./.abi_cache"  # Bare ABIs extracted from artifacts; None disables
+    STARTUP_TIMEOUT: float = 30.0  # Seconds a request waits for the chain clients while a worker starts
+    TX_RECEIPT_POLL_INTERVAL: float = 2.0  # Seconds between receipt watcher passes
+    TX_RECEIPT_TIMEOUT: int = 600  # Seconds before a pending transaction is marked failed
+    FAILED_BOOK_RECHECK_INTERVAL: float = 300.0  # Seconds between receipt lookups for timed-out books
+    FAILED_BOOK_RECHECK_WINDOW: int = 86400  # Seconds after submission a timed-out book may still confirm
+    BOOK_BATCH_SIZE: int = 50  # Books per createBooks transaction
+    RECEIPT_CACHE_SIZE: int = 10000  # Decoded purchase receipts kept in memory
+    GAS_LIMIT_MARGIN: float = 1.2  # Multiplier on eth_estimateGas
+    GAS_ESTIMATE_BUCKET_BYTES: int = 64  # Calldata size step sharing one cached estimate
+    GAS_ESTIMATE_CACHE_TTL: float = 300.0
+    FEE_HISTORY_BLOCKS: int = 10  # Blocks of eth_feeHistory behind each fee suggestion
+    FEE_PRIORITY_PERCENTILE: float = 50.0  # Tip percentile paid within those blocks
+    FEE_MIN_PRIORITY_GWEI: float = 0.0
+    FEE_CACHE_TTL: float = 3.0  # Seconds a fee suggestion is reused
+    TX_REPLACE_AFTER: int = 120  # Seconds pending before a transaction is re-sent with higher fees
+    TX_FEE_BUMP_PERCENT: float = 12.5  # Minimum increase nodes accept for a replacement
+    TX_MAX_REPLACEMENTS: int = 5
+    NONCE_STATE_TTL: float = 600.0  # Idle seconds before a sender's shared nonce counter is reloaded from the node
+    CHAIN_VIEW_CACHE_SIZE: int = 100000  # Cached getBook/hasPurchased/getAuthorBooks results
+    CHAIN_VIEW_SYNC_INTERVAL: float = 2.0  # Seconds between event scans that evict stale views
+    CHAIN_HEAD_REFRESH_INTERVAL: float = 5.0  # Seconds between block number polls behind /health
+    
+    # Purchase ledger
+    PURCHASE_JOURNAL_DIR: str = "./purchase_journal"  # Verified purchases not yet in the database
+    PURCHASE_FLUSH_INTERVAL: float = 0.2  # Seconds between batched inserts of journaled purchases
+    PURCHASE_FLUSH_BATCH_SIZE: int = 500  # Rows per multi-row INSERT
+    PURCHASE_JOURNAL_FSYNC: bool = True  # fsync each journal append; off survives crashes, not power loss
+    
+    # Event indexer
+    INDEXER_START_BLOCK: int = 0  # Contract deployment block
+    INDEXER_CONFIRMATIONS: int = 12  # Blocks behind head before logs are applied
+    INDEXER_POLL_INTERVAL: float = 5.0
+    INDEXER_MAX_BLOCK_RANGE: int = 5000
     
     # Author Royalty
     AUTHOR_ROYALTY_PERCENTAGE: float = 70.0
@@ -37,9 +116,15 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000"
     ]
 
+    @property
+    def contract_abi_file(self) -> Path:
+        path = Path(self.CONTRACT_ABI_PATH)
+        return path if path.is_absolute() else Path(__file__).parent / path
+
     class Config:
         env_file = ".env"
         case_sensitive = True
+        extra = "ignore"  # .env also carries keys only the deploy scripts read
 
 @lru_cache()
 def get_settings():
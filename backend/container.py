@@ -0,0 +1,254 @@
+# container.py
+"""Long-lived clients of the API, created at startup rather than at import.
+
+Importing the API must not read the contract artifact, contact the node or
+even import web3, whose import alone is the bulk of a worker's cold start.
+AppContainer.start() builds the chain clients on a worker thread while the
+database and IPFS cache are checked concurrently; routes that need the chain
+wait for them through get_chain(), everything else serves immediately.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from config import settings
+from database import SessionLocal
+from utils.abi import load_abi
+from utils.auth import revocations
+from utils.ipfs import ipfs
+from utils.passwords import password_hasher
+from utils.purchase_ledger import purchase_ledger
+from utils.shared_state import shared_state
+
+if TYPE_CHECKING:
+    from web3 import AsyncWeb3
+    from utils.chain_head import ChainHead
+    from utils.chain_views import ChainViewCache
+    from utils.nonce import NonceManager
+    from utils.receipts import ReceiptCache
+    from utils.rpc_gateway import RPCGateway
+    from utils.transactions import TransactionManager
+    from utils.tx_builder import TransactionBuilder
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChainClients:
+    gateway: "RPCGateway"
+    w3: "AsyncWeb3"
+    contract: Any
+    tx_manager: "TransactionManager"
+    nonce_manager: "NonceManager"
+    tx_builder: "TransactionBuilder"
+    receipt_cache: "ReceiptCache"
+    chain_views: "ChainViewCache"
+    chain_head: "ChainHead"
+
+def build_chain_clients() -> ChainClients:
+    """Import web3 and construct every chain client; makes no network calls"""
+    from web3 import Web3
+    from utils.chain_head import ChainHead
+    from utils.chain_views import ChainViewCache
+    from utils.nonce import NonceManager
+    from utils.receipts import ReceiptCache
+    from utils.rpc_gateway import RPCGateway
+    from utils.rpc_provider import gateway_web3
+    from utils.transactions import TransactionManager
+    from utils.tx_builder import TransactionBuilder
+
+    if not settings.CONTRACT_ADDRESS:
+        raise RuntimeError("CONTRACT_ADDRESS is not set")
+    abi = load_abi(str(settings.contract_abi_file), settings.ABI_CACHE_DIR)
+
+    # Every chain call goes through one pooled, batching gateway
+    gateway = RPCGateway(
+        [settings.WEB3_PROVIDER_URI, *settings.WEB3_FALLBACK_URIS],
+        timeout=settings.RPC_TIMEOUT,
+        max_connections=settings.RPC_MAX_CONNECTIONS,
+        batch_size=settings.RPC_BATCH_SIZE,
+        batch_window=settings.RPC_BATCH_WINDOW_MS / 1000,
+        failure_threshold=settings.RPC_FAILURE_THRESHOLD,
+        cooldown=settings.RPC_ENDPOINT_COOLDOWN
+    )
+    w3 = gateway_web3(gateway)
+    contract = w3.eth.contract(address=Web3.to_checksum_address(settings.CONTRACT_ADDRESS), abi=abi)
+    tx_manager = TransactionManager(w3, poll_interval=settings.TX_RECEIPT_POLL_INTERVAL)
+    return ChainClients(
+        gateway=gateway,
+        w3=w3,
+        contract=contract,
+        tx_manager=tx_manager,
+        nonce_manager=NonceManager(w3, shared_state, ttl=settings.NONCE_STATE_TTL),
+        tx_builder=TransactionBuilder(
+            w3,
+            tx_manager,
+            gas_margin=settings.GAS_LIMIT_MARGIN,
+            bucket_bytes=settings.GAS_ESTIMATE_BUCKET_BYTES,
+            estimate_ttl=settings.GAS_ESTIMATE_CACHE_TTL,
+            fee_history_blocks=settings.FEE_HISTORY_BLOCKS,
+            priority_percentile=settings.FEE_PRIORITY_PERCENTILE,
+            min_priority_fee=Web3.to_wei(settings.FEE_MIN_PRIORITY_GWEI, 'gwei'),
+            fee_ttl=settings.FEE_CACHE_TTL,
+            replace_after=settings.TX_REPLACE_AFTER,
+            bump_percent=settings.TX_FEE_BUMP_PERCENT,
+            max_replacements=settings.TX_MAX_REPLACEMENTS,
+            track_for=settings.TX_RECEIPT_TIMEOUT
+        ),
+        receipt_cache=ReceiptCache(contract, max_entries=settings.RECEIPT_CACHE_SIZE),
+        chain_views=ChainViewCache(
+            contract,
+            gateway,
+            max_entries=settings.CHAIN_VIEW_CACHE_SIZE,
+            sync_interval=settings.CHAIN_VIEW_SYNC_INTERVAL
+        ),
+        chain_head=ChainHead(w3, refresh_interval=settings.CHAIN_HEAD_REFRESH_INTERVAL)
+    )
+
+def _ping_database():
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+class AppContainer:
+    """Starts, gates and stops the API's clients and background tasks"""
+
+    def __init__(self, startup_timeout: float = 30.0, retry_interval: float = 5.0):
+        self.startup_timeout = startup_timeout
+        self.retry_interval = retry_interval
+        self.chain: Optional[ChainClients] = None
+        self.components: Dict[str, str] = {"database": "pending", "chain": "pending"}
+        self._on_pending: Optional[Callable[[], Awaitable[None]]] = None
+        self._chain_task: Optional[asyncio.Task] = None
+        self._chain_failed_at = 0.0
+        self._checks: Optional[asyncio.Future] = None
+
+    # Startup
+
+    async def _check(self, name: str, func: Callable[[], Any]):
+        try:
+            await asyncio.to_thread(func)
+        except Exception as e:
+            logger.exception("%s check failed", name)
+            self.components[name] = f"failed: {str(e)}"
+        else:
+            self.components[name] = "ready"
+
+    async def _build_chain(self) -> ChainClients:
+        self.components["chain"] = "pending"
+        try:
+            chain = await asyncio.to_thread(build_chain_clients)
+        except Exception as e:
+            logger.exception("Chain clients could not be built")
+            self.components["chain"] = f"failed: {str(e)}"
+            self._chain_failed_at = time.monotonic()
+            raise
+        chain.chain_head.start()
+        chain.chain_views.start()
+        if self._on_pending is not None:
+            chain.tx_manager.start_watcher(self._on_pending)
+        self.chain = chain
+        self.components["chain"] = "ready"
+        return chain
+
+    def _start_chain(self) -> asyncio.Task:
+        self._chain_task = asyncio.create_task(self._build_chain())
+        # A failure is reported through components and get_chain(), not the loop's handler
+        self._chain_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._chain_task
+
+    def start(self, on_pending: Optional[Callable[[], Awaitable[None]]] = None):
+        """Begin initializing in the background and return at once.
+
+        on_pending is run by the receipt watcher once the chain clients exist.
+        """
+        self._on_pending = on_pending
+        self._start_chain()
+        self._checks = asyncio.gather(
+            self._check("database", _ping_database),
+            # Index the on-disk IPFS cache now rather than on the first request
+            asyncio.to_thread(ipfs.cache.preload) if ipfs.cache else asyncio.sleep(0)
+        )
+        revocations.start()
+        purchase_ledger.start()
+
+    async def get_chain(self) -> ChainClients:
+        """Dependency: the chain clients, waiting up to startup_timeout while they are built"""
+        if self.chain is not None:
+            return self.chain
+        task = self._chain_task
+        if task is None:
+            raise HTTPException(status_code=503, detail="Service is starting", headers={"Retry-After": "1"})
+        if task.done() and task.exception() is not None:
+            # Retry a failed build (say, the artifact was missing) at most every retry_interval
+            if time.monotonic() - self._chain_failed_at < self.retry_interval:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Blockchain unavailable: {self.components['chain']}",
+                    headers={"Retry-After": str(int(self.retry_interval))}
+                )
+            task = self._start_chain()
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.startup_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503, detail="Blockchain clients are still starting", headers={"Retry-After": "1"}
+            )
+        except Exception:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Blockchain unavailable: {self.components['chain']}",
+                headers={"Retry-After": str(int(self.retry_interval))}
+            )
+
+    # Readiness
+
+    def readiness(self) -> Dict[str, str]:
+        components = dict(self.components)
+        if self.chain is not None:
+            head = self.chain.chain_head
+            if head.connected:
+                components["node"] = "ready"
+            elif head.last_error:
+                components["node"] = f"unreachable: {head.last_error}"
+            else:
+                components["node"] = "pending"
+        return components
+
+    @property
+    def ready(self) -> bool:
+        components = self.readiness()
+        return "node" in components and all(state == "ready" for state in components.values())
+
+    async def recheck(self):
+        """Re-run a failed database check, so readiness recovers without a restart"""
+        if self.components["database"].startswith("failed"):
+            await self._check("database", _ping_database)
+
+    # Shutdown
+
+    async def stop(self):
+        if self._chain_task is not None and not self._chain_task.done():
+            self._chain_task.cancel()
+        if self._checks is not None:
+            await asyncio.gather(self._checks, return_exceptions=True)
+        chain = self.chain
+        if chain is not None:
+            await chain.tx_manager.stop_watcher()
+            await chain.chain_views.stop()
+            await chain.chain_head.stop()
+            await chain.gateway.aclose()
+        await revocations.stop()
+        # Drains the journal into the database before the engine goes away
+        await purchase_ledger.stop()
+        await ipfs.aclose()
+        await shared_state.aclose()
+        password_hasher.shutdown()
+
+services = AppContainer(startup_timeout=settings.STARTUP_TIMEOUT)
@@ -1,21 +1,117 @@
 # database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from config import settings
+from utils import query_counter
+from utils.metrics import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./bookmarket.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+# Async drivers for the AsyncSession engine request handlers use
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers proceed during a write; NORMAL only fsyncs at checkpoints
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def _engine_options(url: str, pool_size: int = settings.DB_POOL_SIZE) -> dict:
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+            }
+        }
+        if _is_file_sqlite(url):
+            # Opening another SQLite connection is cheap, so never wait for one
+            options.update(pool_size=pool_size, max_overflow=-1)
+        return options
+    # Request handlers check out from the async engine, where a full pool makes the
+    # request await (503 after DB_POOL_TIMEOUT) rather than block the event loop, and
+    # end their transaction before awaiting IPFS or the node, so a connection is held
+    # for a handler's queries only. The sync engine serves worker threads alone.
+    return {
+        "pool_size": pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def _is_file_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL) -> Engine:
+    """Build a sync engine tuned for the configured backend, for use off the event loop"""
+    db_engine = create_engine(url, echo=settings.DB_ECHO, **_engine_options(url, settings.DB_THREAD_POOL_SIZE))
+    if _is_file_sqlite(url):
+        event.listen(db_engine, "connect", _sqlite_pragmas)
+    return db_engine
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Build the AsyncEngine request handlers use, for the same database.
+
+    Needs the aiosqlite (SQLite) or asyncpg (Postgres) driver.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend}")
+    async_url = parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+    options = _engine_options(url)
+    options.get("connect_args", {}).pop("check_same_thread", None)
+    if backend == "sqlite":
+        # aiosqlite engines pick their own pool; checkouts there await rather than block
+        options.pop("pool_size", None)
+        options.pop("max_overflow", None)
+    async_engine = create_async_engine(async_url, echo=settings.DB_ECHO, **options)
+    if _is_file_sqlite(url):
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+    return async_engine
+
+engine = create_db_engine()
+instrument_engine(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_async_sessionmaker = None
+
+def get_async_sessionmaker():
+    """Lazily create the AsyncSession factory, so scripts that only use the sync engine need no async driver"""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        async_engine = create_async_db_engine()
+        instrument_engine(async_engine.sync_engine, "async")
+        query_counter.instrument(async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_sessionmaker
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
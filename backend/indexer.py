@@ -0,0 +1,227 @@
+# indexer.py
+"""Standalone process that mirrors BookMarketplace events into the SQL tables.
+
+Run it next to the API, against a database migrated with `alembic upgrade head`:
+
+    python indexer.py            # follow the chain
+    python indexer.py --once     # catch up to the confirmed head and exit
+
+Progress is stored in the indexer_checkpoints table, so the process can be
+stopped and restarted at any time; re-applying a block range is harmless
+because every event is upserted.
+"""
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+from eth_utils import event_abi_to_log_topic
+from sqlalchemy.orm import Session
+from web3 import Web3
+
+import models
+from config import settings
+from database import SessionLocal
+from utils.blockchain import BlockchainManager
+
+logger = logging.getLogger("indexer")
+
+CHECKPOINT_NAME = "BookMarketplace"
+INDEXED_EVENTS = ("BookCreated", "BookPurchased", "BookUpdated")
+
+class EventIndexer:
+    def __init__(self, manager: BlockchainManager, confirmations: int, start_block: int, max_range: int):
+        self.w3 = manager.w3
+        self.contract = manager.contract
+        self.confirmations = confirmations
+        self.start_block = start_block
+        self.max_range = max_range
+        self.block_range = max_range
+        self.range_ceiling = max_range  # Largest range not yet known to fail
+        self.events_by_topic = {}
+        for name in INDEXED_EVENTS:
+            event = self.contract.events[name]()
+            self.events_by_topic[Web3.to_hex(event_abi_to_log_topic(event.abi))] = event
+        self.handlers = {
+            "BookCreated": self._book_created,
+            "BookPurchased": self._book_purchased,
+            "BookUpdated": self._book_updated
+        }
+
+    # Checkpoints
+    def _checkpoint(self, db: Session) -> models.IndexerCheckpoint:
+        checkpoint = db.get(models.IndexerCheckpoint, CHECKPOINT_NAME)
+        if checkpoint is None:
+            checkpoint = models.IndexerCheckpoint(name=CHECKPOINT_NAME, block_number=self.start_block - 1)
+            db.add(checkpoint)
+        return checkpoint
+
+    def _rewind_on_reorg(self, checkpoint: models.IndexerCheckpoint):
+        """Step back a confirmation depth if the checkpoint block left the canonical chain"""
+        if not checkpoint.block_hash or checkpoint.block_number < 0:
+            return
+        block = self.w3.eth.get_block(checkpoint.block_number)
+        if block["hash"].hex() != checkpoint.block_hash:
+            rewound = max(checkpoint.block_number - self.confirmations, self.start_block - 1)
+            logger.warning("Reorg at block %s, rewinding to %s", checkpoint.block_number, rewound)
+            checkpoint.block_number = rewound
+            checkpoint.block_hash = None
+
+    # Log fetching
+    def _get_logs(self, from_block: int, to_block: int):
+        return self.w3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [list(self.events_by_topic.keys())]
+        })
+
+    def _fetch_range(self, from_block: int, head: int):
+        """Fetch logs for an adaptive range, halving it on provider errors"""
+        while True:
+            to_block = min(from_block + self.block_range - 1, head)
+            try:
+                logs = self._get_logs(from_block, to_block)
+            except Exception as e:
+                if self.block_range == 1:
+                    raise
+                self.range_ceiling = max(to_block - from_block, 1)
+                self.block_range = max(self.block_range // 2, 1)
+                logger.info("get_logs failed (%s), shrinking range to %s blocks", e, self.block_range)
+                continue
+            # Grow back after a clean page, probing past the last failing size slowly
+            self.range_ceiling = min(self.range_ceiling + self.range_ceiling // 10 + 1, self.max_range)
+            self.block_range = min(self.block_range * 2, self.range_ceiling)
+            return to_block, logs
+
+    # Event handlers
+    def _apply(self, db: Session, log):
+        event = self.events_by_topic.get(Web3.to_hex(log["topics"][0]))
+        if event is None:
+            return
+        decoded = event.process_log(log)
+        self.handlers[decoded["event"]](db, decoded)
+
+    def _book_created(self, db: Session, event):
+        args = event["args"]
+        tx_hash = event["transactionHash"].hex()
+        book = db.query(models.Book).filter(models.Book.contract_id == args["bookId"]).first()
+        if book is None:
+            # A row the API submitted whose receipt the watcher has not processed yet
+            book = db.query(models.Book).filter(
+                models.Book.transaction_hash == tx_hash,
+                models.Book.book_hash == args["ipfsHash"],
+                models.Book.contract_id.is_(None)
+            ).order_by(models.Book.id).first()
+        if book is None:
+            author = _user_by_address(db, args["author"])
+            book = models.Book(
+                title=args["title"],
+                price=float(Web3.from_wei(args["price"], "ether")),
+                book_hash=args["ipfsHash"],
+                author_id=author.id if author else None,
+                transaction_hash=tx_hash
+            )
+            db.add(book)
+        book.contract_id = args["bookId"]
+        book.status = models.BookStatus.CONFIRMED
+        db.flush()
+
+    def _book_purchased(self, db: Session, event):
+        args = event["args"]
+        tx_hash = event["transactionHash"].hex()
+        book = db.query(models.Book).filter(models.Book.contract_id == args["bookId"]).first()
+        if book is None:
+            logger.warning("BookPurchased for unknown book %s in %s", args["bookId"], tx_hash)
+            return
+        purchase = db.query(models.Purchase).filter(models.Purchase.transaction_hash == tx_hash).first()
+        if purchase is None:
+            buyer = _user_by_address(db, args["buyer"])
+            purchase = models.Purchase(
+                book_id=book.id,
+                buyer_id=buyer.id if buyer else None,
+                transaction_hash=tx_hash
+            )
+            db.add(purchase)
+        purchase.purchase_price = float(Web3.from_wei(args["price"], "ether"))
+        purchase.status = models.PurchaseStatus.COMPLETED
+        db.flush()
+
+    def _book_updated(self, db: Session, event):
+        args = event["args"]
+        book = db.query(models.Book).filter(models.Book.contract_id == args["bookId"]).first()
+        if book is None:
+            return
+        # The contract leaves fields untouched when given empty/zero values
+        if args["title"]:
+            book.title = args["title"]
+        if args["price"] > 0:
+            book.price = float(Web3.from_wei(args["price"], "ether"))
+        book.is_active = args["isActive"]
+        db.flush()
+
+    # Main loop
+    def sync_once(self) -> int:
+        """Apply confirmed logs up to the current safe head; returns the checkpoint block"""
+        safe_head = self.w3.eth.block_number - self.confirmations
+        db = SessionLocal()
+        try:
+            checkpoint = self._checkpoint(db)
+            self._rewind_on_reorg(checkpoint)
+            db.commit()
+
+            while checkpoint.block_number < safe_head:
+                from_block = checkpoint.block_number + 1
+                to_block, logs = self._fetch_range(from_block, safe_head)
+                for log in sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"])):
+                    self._apply(db, log)
+
+                # Logs and checkpoint commit together, so a crash replays the whole page
+                checkpoint.block_number = to_block
+                checkpoint.block_hash = self.w3.eth.get_block(to_block)["hash"].hex()
+                db.commit()
+                logger.info("Indexed blocks %s-%s (%s logs)", from_block, to_block, len(logs))
+            return checkpoint.block_number
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def run_forever(self, poll_interval: float):
+        while True:
+            try:
+                self.sync_once()
+            except Exception:
+                logger.exception("Indexer pass failed")
+            time.sleep(poll_interval)
+
+def _user_by_address(db: Session, address: str):
+    return db.query(models.User).filter(models.User.ethereum_address == Web3.to_checksum_address(address)).first()
+
+def build_indexer() -> EventIndexer:
+    load_dotenv()
+    manager = BlockchainManager(os.getenv("WEB3_PROVIDER_URI", settings.WEB3_PROVIDER_URI))
+    manager.load_contract(
+        os.getenv("CONTRACT_ADDRESS", settings.CONTRACT_ADDRESS),
+        settings.contract_abi_file
+    )
+    return EventIndexer(
+        manager,
+        confirmations=settings.INDEXER_CONFIRMATIONS,
+        start_block=settings.INDEXER_START_BLOCK,
+        max_range=settings.INDEXER_MAX_BLOCK_RANGE
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index BookMarketplace events into the database")
+    parser.add_argument("--once", action="store_true", help="Catch up to the confirmed head and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    indexer = build_indexer()
+    if args.once:
+        print(f"Indexed up to block {indexer.sync_once()}")
+    else:
+        indexer.run_forever(settings.INDEXER_POLL_INTERVAL)
@@ -1,6 +1,6 @@
 from models import init_db
 
 if __name__ == "__main__":
-    print("Creating database tables...")
+    print("Applying database migrations...")
     init_db()
-    print("Database tables created successfully!")
\ No newline at end of file
+    print("Database is up to date!")
\ No newline at end of file
@@ -1,44 +1,11 @@
-import ipfshttpclient
-import magic
-import os
 from fastapi import UploadFile
-import shutil
+from utils.ipfs import ipfs
 
 class IPFSHandler:
-    def __init__(self):
-        self.client = None
-
-    def connect(self):
-        try:
-            self.client = ipfshttpclient.connect('/ip4/127.0.0.1/tcp/5001')
-        except Exception as e:
-            raise Exception(f"Failed to connect to IPFS: {str(e)}")
+    """Thin wrapper kept for existing callers; all I/O goes through the shared async client"""
 
     async def upload_file(self, file: UploadFile) -> str:
-        if not self.client:
-            self.connect()
-
-        # Create temp directory if it doesn't exist
-        if not os.path.exists("temp"):
-            os.makedirs("temp")
-
-        # Save file temporarily
-        temp_path = f"temp/{file.filename}"
-        try:
-            with open(temp_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # Upload to IPFS
-            result = self.client.add(temp_path)
-            return result['Hash']
-
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return await ipfs.upload_file(file)
 
-    def get_file(self, ipfs_hash: str) -> bytes:
-        if not self.client:
-            self.connect()
-        
-        return self.client.cat(ipfs_hash)
\ No newline at end of file
+    async def get_file(self, ipfs_hash: str) -> bytes:
+        return await ipfs.get_file(ipfs_hash)
\ No newline at end of file
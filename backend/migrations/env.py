@@ -0,0 +1,52 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+
+import models
+from database import SQLALCHEMY_DATABASE_URL, create_db_engine
+from utils.search import is_search_object
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+def include_name(name, type_, parent_names):
+    # Full-text objects are managed by setup_search, so autogenerate must not drop them
+    return not is_search_object(type_, name)
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of connecting"""
+    context.configure(
+        url=SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        render_as_batch=SQLALCHEMY_DATABASE_URL.startswith("sqlite"),
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    connectable = config.attributes.get("connection")
+    if connectable is None:
+        connectable = create_db_engine(SQLALCHEMY_DATABASE_URL)
+
+    with connectable.connect() if hasattr(connectable, "connect") else connectable as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite cannot ALTER most constraints in place
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
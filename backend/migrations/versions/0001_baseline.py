@@ -0,0 +1,104 @@
+"""baseline
+
+Schema as create_all and setup_search built it just before migrations existed.
+Databases created by that last create_all can be adopted with `alembic stamp
+0001`. Older ones predate books.status, transaction_hash and is_active, the
+indexer_checkpoints table or the search index, and need those added (or the
+data moved into a fresh `alembic upgrade head` database) before stamping.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.search import drop_search, setup_search
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('ethereum_address', sa.String(), nullable=True),
+        sa.Column('ethereum_private_key', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ethereum_address'),
+        sa.UniqueConstraint('ethereum_private_key')
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'books',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.Column('book_hash', sa.String(), nullable=True),
+        sa.Column('cover_hash', sa.String(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('contract_id', sa.Integer(), nullable=True),
+        sa.Column('transaction_hash', sa.String(), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'CONFIRMED', 'FAILED', name='bookstatus'), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_books_id', 'books', ['id'])
+    op.create_index('ix_books_title', 'books', ['title'])
+    op.create_index('ix_books_status', 'books', ['status'])
+    op.create_index('ix_books_transaction_hash', 'books', ['transaction_hash'])
+    op.create_index('ix_books_price', 'books', ['price'])
+    op.create_index('ix_books_created_at_id', 'books', ['created_at', 'id'])
+    op.create_index('ix_books_author_created_at_id', 'books', ['author_id', 'created_at', 'id'])
+
+    op.create_table(
+        'purchases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=True),
+        sa.Column('buyer_id', sa.Integer(), nullable=True),
+        sa.Column('transaction_hash', sa.String(), nullable=True),
+        sa.Column('purchase_price', sa.Float(), nullable=True),
+        sa.Column('status', sa.Enum('PENDING', 'COMPLETED', 'FAILED', name='purchasestatus'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id']),
+        sa.ForeignKeyConstraint(['buyer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('transaction_hash')
+    )
+    op.create_index('ix_purchases_id', 'purchases', ['id'])
+
+    op.create_table(
+        'indexer_checkpoints',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('block_number', sa.Integer(), nullable=True),
+        sa.Column('block_hash', sa.String(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    setup_search(op.get_bind())
+
+def downgrade():
+    drop_search(op.get_bind())
+    op.drop_table('indexer_checkpoints')
+    op.drop_table('purchases')
+    op.drop_table('books')
+    op.drop_table('users')
+    sa.Enum(name='purchasestatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='bookstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""indexes for hot queries
+
+Purchases are filtered by buyer (/purchases, content access) and by book
+(verification, content access); books by author and contract id (author
+listing, receipt watcher, indexer). A buyer can own a book only once:
+duplicate purchases of a book by one buyer are removed before the unique
+index is built, keeping a completed row over others, then the oldest.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:01
+"""
+import logging
+
+from alembic import context, op
+import sqlalchemy as sa
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Every purchase that another row of the same book and buyer outranks
+DEDUPLICATE_PURCHASES = """
+    DELETE FROM purchases
+    WHERE book_id IS NOT NULL AND buyer_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM purchases AS keep
+        WHERE keep.book_id = purchases.book_id
+          AND keep.buyer_id = purchases.buyer_id
+          AND (CASE WHEN keep.status = 'COMPLETED' THEN 0 ELSE 1 END, keep.id)
+            < (CASE WHEN purchases.status = 'COMPLETED' THEN 0 ELSE 1 END, purchases.id)
+    )
+"""
+
+def upgrade():
+    if context.is_offline_mode():
+        op.execute(DEDUPLICATE_PURCHASES)
+    else:
+        removed = op.get_bind().execute(sa.text(DEDUPLICATE_PURCHASES)).rowcount
+        if removed:
+            logger.warning("Removed %s duplicate purchases before adding uq_purchases_book_buyer", removed)
+    op.create_index('ix_purchases_buyer_id', 'purchases', ['buyer_id'])
+    op.create_index('ix_purchases_book_id', 'purchases', ['book_id'])
+    op.create_index('ix_purchases_buyer_created_at_id', 'purchases', ['buyer_id', 'created_at', 'id'])
+    op.create_index('uq_purchases_book_buyer', 'purchases', ['book_id', 'buyer_id'], unique=True)
+    op.create_index('ix_books_author_id', 'books', ['author_id'])
+    op.create_index('ix_books_contract_id', 'books', ['contract_id'])
+
+def downgrade():
+    op.drop_index('ix_books_contract_id', table_name='books')
+    op.drop_index('ix_books_author_id', table_name='books')
+    op.drop_index('uq_purchases_book_buyer', table_name='purchases')
+    op.drop_index('ix_purchases_buyer_created_at_id', table_name='purchases')
+    op.drop_index('ix_purchases_book_id', table_name='purchases')
+    op.drop_index('ix_purchases_buyer_id', table_name='purchases')
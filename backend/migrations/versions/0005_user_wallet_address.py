@@ -0,0 +1,25 @@
+"""linked user wallets
+
+Accounts hold a server-generated ethereum_address; wallet_address is the
+user's own wallet, linked by signing a challenge, which wallet login accepts.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('users', sa.Column('wallet_address', sa.String(), nullable=True))
+    op.create_index('ix_users_wallet_address', 'users', ['wallet_address'], unique=True)
+
+def downgrade():
+    op.drop_index('ix_users_wallet_address', table_name='users')
+    with op.batch_alter_table('users') as batch:
+        batch.drop_column('wallet_address')
@@ -0,0 +1,22 @@
+"""index books by IPFS hash
+
+/ipfs/{cid} serves only files some book refers to, looked up by either hash.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:02
+"""
+from alembic import op
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_books_book_hash', 'books', ['book_hash'])
+    op.create_index('ix_books_cover_hash', 'books', ['cover_hash'])
+
+def downgrade():
+    op.drop_index('ix_books_cover_hash', table_name='books')
+    op.drop_index('ix_books_book_hash', table_name='books')
@@ -0,0 +1,23 @@
+"""mark books failed by a reverted transaction
+
+The receipt watcher re-reads receipts of timed-out FAILED books for a while in
+case they mined late; a book whose receipt was already seen is final and
+skipped.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('books', sa.Column('reverted', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+def downgrade():
+    op.drop_column('books', 'reverted')
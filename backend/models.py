@@ -1,17 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import false, func
 from database import Base, engine
-from passlib.context import CryptContext
+from utils.passwords import password_hasher
 import enum
+from pathlib import Path
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = password_hasher.context
 
 class UserRole(str, enum.Enum):
     AUTHOR = "AUTHOR"
     SELLER = "SELLER"
     USER = "USER"
 
+class BookStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    CONFIRMED = "CONFIRMED"
+    FAILED = "FAILED"
+
 class PurchaseStatus(str, enum.Enum):
     PENDING = "PENDING"
     COMPLETED = "COMPLETED"
@@ -27,6 +33,7 @@ class User(Base):
     role = Column(String, default=UserRole.USER)
     ethereum_address = Column(String, unique=True)
     ethereum_private_key = Column(String, unique=True)
+    wallet_address = Column(String, unique=True, index=True, nullable=True)  # User's own wallet, linked by signature
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -49,8 +56,12 @@ class Book(Base):
     price = Column(Float)
     book_hash = Column(String)  # IPFS hash of the book file
     cover_hash = Column(String, nullable=True)  # IPFS hash of the cover image
-    author_id = Column(Integer, ForeignKey("users.id"))
-    contract_id = Column(Integer)  # ID in the smart contract
+    author_id = Column(Integer, ForeignKey("users.id"), index=True)
+    contract_id = Column(Integer, index=True)  # ID in the smart contract
+    transaction_hash = Column(String, index=True)  # createBook(s) transaction, shared within a batch
+    status = Column(Enum(BookStatus), default=BookStatus.PENDING, index=True)
+    is_active = Column(Boolean, default=True)  # Mirrors the contract's isActive flag
+    reverted = Column(Boolean, default=False, server_default=false(), nullable=False)  # FAILED by a mined receipt, so final
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -58,6 +69,16 @@ class Book(Base):
     author = relationship("User", back_populates="books_authored")
     purchases = relationship("Purchase", back_populates="book")
 
+    # Keyset pagination walks (created_at, id) newest first, optionally per author
+    __table_args__ = (
+        Index("ix_books_created_at_id", "created_at", "id"),
+        Index("ix_books_author_created_at_id", "author_id", "created_at", "id"),
+        Index("ix_books_price", "price"),
+        # /ipfs/{cid} only serves files some book refers to
+        Index("ix_books_book_hash", "book_hash"),
+        Index("ix_books_cover_hash", "cover_hash"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -68,6 +89,9 @@ class Book(Base):
             "cover_hash": self.cover_hash,
             "author_id": self.author_id,
             "contract_id": self.contract_id,
+            "transaction_hash": self.transaction_hash,
+            "status": self.status,
+            "is_active": self.is_active,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
@@ -76,8 +100,8 @@ class Purchase(Base):
     __tablename__ = "purchases"
 
     id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"))
-    buyer_id = Column(Integer, ForeignKey("users.id"))
+    book_id = Column(Integer, ForeignKey("books.id"), index=True)
+    buyer_id = Column(Integer, ForeignKey("users.id"), index=True)
     transaction_hash = Column(String, unique=True)
     purchase_price = Column(Float)
     status = Column(Enum(PurchaseStatus), default=PurchaseStatus.PENDING)
@@ -88,6 +112,11 @@ class Purchase(Base):
     book = relationship("Book", back_populates="purchases")
     buyer = relationship("User", back_populates="purchases")
 
+    __table_args__ = (
+        Index("ix_purchases_buyer_created_at_id", "buyer_id", "created_at", "id"),
+        Index("uq_purchases_book_buyer", "book_id", "buyer_id", unique=True),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -100,8 +129,29 @@ class Purchase(Base):
             "updated_at": self.updated_at
         }
 
+class IndexerCheckpoint(Base):
+    __tablename__ = "indexer_checkpoints"
+
+    name = Column(String, primary_key=True)
+    block_number = Column(Integer)  # Last block whose logs are fully applied
+    block_hash = Column(String)  # Hash of that block, used to detect reorgs
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, unique=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Row is pruned after this
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Workers re-read recent rows by this
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """Upgrade the configured database to the latest migration"""
+    from alembic import command
+    from alembic.config import Config
+    config = Config(str(Path(__file__).parent / "alembic.ini"))
+    config.set_main_option("script_location", str(Path(__file__).parent / "migrations"))
+    command.upgrade(config, "head")
 
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
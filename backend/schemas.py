@@ -16,6 +16,7 @@ class WalletAuth(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     role: UserRole
 
@@ -53,21 +54,30 @@ class BookCreate(BookBase):
             raise ValueError('Price must be greater than 0')
         return v
 
+class BookManifestEntry(BookBase):
+    book_file: str  # Filename of the matching part in the bulk upload
+    cover_file: Optional[str] = None
+
 class BookUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=255)
     description: Optional[str] = Field(None, max_length=1000)
     price: Optional[float] = Field(None, gt=0)
-    status: Optional[str] = Field(None, regex='^(active|deleted|suspended)$')
+    status: Optional[str] = Field(None, pattern='^(active|deleted|suspended)$')
 
-class Book(BookBase):
+class Book(BaseModel):
+    # Read back from rows the upload routes and the indexer wrote, so BookBase's input limits don't apply
     id: int
+    title: str
+    description: Optional[str] = None
+    price: float
     book_hash: str
     cover_hash: Optional[str]
-    metadata_hash: str
-    author_address: str
+    author_id: Optional[int]
+    contract_id: Optional[int]
+    is_active: Optional[bool] = True
     created_at: datetime
     updated_at: Optional[datetime]
-    status: str
+    status: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -82,9 +92,15 @@ class PurchaseBase(BaseModel):
 class PurchaseCreate(PurchaseBase):
     pass
 
-class Purchase(PurchaseBase):
-    id: int
-    purchased_at: datetime
+class Purchase(BaseModel):
+    id: Optional[int]  # None until a journaled purchase is inserted
+    book_id: int
+    buyer_id: Optional[int]
+    transaction_hash: str
+    purchase_price: Optional[float]
+    status: Optional[str]
+    created_at: datetime
+    book: Optional[Book] = None
 
     class Config:
         from_attributes = True
@@ -95,9 +111,15 @@ class Message(BaseModel):
 
 class BookListResponse(BaseModel):
     books: list[Book]
-    total: int
+    total: int  # Approximate; cached briefly per filter combination
     page: int
     size: int
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
+class BookSearchResponse(BaseModel):
+    query: str
+    books: list[Book]  # Most relevant first
+    size: int
 
 class UserStats(BaseModel):
     total_books: int
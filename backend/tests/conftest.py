@@ -0,0 +1,133 @@
+# tests/conftest.py
+"""Runs the app in-process against the fake chain and IPFS servers in
+benchmarks/fakes.py and a throwaway SQLite database, as the benchmarks do.
+
+Backend modules read Settings on import, so the environment is set here,
+before pytest imports any test module.
+"""
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fakes import ABI_PATH, FakeChain, FakeIPFS, serve
+
+PASSWORD = "correct horse battery staple"
+
+_chain = FakeChain()
+_ipfs = FakeIPFS()
+_workdir = Path(tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_workdir / 'test.db'}",
+    "IPFS_API_URL": serve(_ipfs.asgi_app()),
+    "IPFS_CACHE_DIR": str(_workdir / "ipfs_cache"),
+    "PURCHASE_JOURNAL_DIR": str(_workdir / "purchase_journal"),
+    "WEB3_PROVIDER_URI": serve(_chain.asgi_app()),
+    "CONTRACT_ADDRESS": _chain.address,
+    "CONTRACT_ABI_PATH": str(ABI_PATH),
+    "ABI_CACHE_DIR": str(_workdir / "abi"),
+    "BCRYPT_ROUNDS": "4",
+    "QUERY_COUNT_HEADER": "true"
+})
+
+class TestUser(NamedTuple):
+    headers: dict
+    id: int
+    username: str
+    address: str
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def password():
+    """Password of every user made by create_user"""
+    return PASSWORD
+
+@pytest.fixture(scope="session")
+def fake_chain():
+    return _chain
+
+@pytest.fixture(scope="session")
+def fake_ipfs():
+    return _ipfs
+
+@pytest.fixture(scope="session")
+def api():
+    """The app module, on a database migrated to head"""
+    import models
+    models.init_db()
+    import app
+    return app
+
+# One startup and shutdown for the session, as in a deployed worker
+@pytest.fixture(scope="session")
+async def client(api):
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(app=api.app, base_url="http://testserver") as client:
+            yield client
+
+@pytest.fixture
+def db(api):
+    session = api.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def create_user(api, client):
+    """Register and log in a fresh user"""
+    async def create(role: str = "USER") -> TestUser:
+        username = f"{role.lower()}-{uuid.uuid4().hex[:8]}"
+        response = await client.post("/register", data={
+            "username": username, "email": f"{username}@test.local", "password": PASSWORD, "role": role
+        })
+        response.raise_for_status()
+        response = await client.post("/login", data={"username": username, "password": PASSWORD})
+        response.raise_for_status()
+        body = response.json()
+        db = api.SessionLocal()
+        try:
+            user_id = db.query(api.models.User.id).filter(api.models.User.username == username).scalar()
+        finally:
+            db.close()
+        return TestUser({"Authorization": f"Bearer {body['access_token']}"}, user_id, username, body["ethereum_address"])
+    return create
+
+@pytest.fixture
+async def author(create_user):
+    return await create_user("AUTHOR")
+
+@pytest.fixture
+def seed_book(api, fake_chain, fake_ipfs):
+    """A confirmed book whose file is in the fake IPFS store and whose listing is on the fake chain"""
+    def seed(author: TestUser, content: bytes = b"book contents", title: str = "Test book") -> int:
+        book_hash = "Qm" + uuid.uuid4().hex
+        fake_ipfs.store[book_hash] = content
+        contract_id = fake_chain.seed_book(author.address, title, book_hash, 10 ** 16)
+        db = api.SessionLocal()
+        try:
+            book = api.models.Book(
+                title=title,
+                description="Seeded for tests",
+                price=0.01,
+                book_hash=book_hash,
+                author_id=author.id,
+                contract_id=contract_id,
+                status=api.models.BookStatus.CONFIRMED
+            )
+            db.add(book)
+            db.commit()
+            return book.id
+        finally:
+            db.close()
+    return seed
@@ -0,0 +1,126 @@
+# tests/test_book_content.py
+"""Range requests, conditional requests and caching on /books/{id}/content"""
+import pytest
+
+from utils.streaming import RangeNotSatisfiable, etag_matches, parse_range_header
+
+CONTENT = bytes(range(256)) * 40
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=abc", None),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 1000) == expected
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=5-1", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),
+    ("bytes=0-", 0),
+])
+def test_parse_range_header_unsatisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header(header, size)
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
+
+async def book_hash(client, book_id):
+    return (await client.get(f"/books/{book_id}")).json()["book_hash"]
+
+@pytest.mark.anyio
+async def test_full_download_fills_cache(api, client, author, seed_book):
+    book_id = seed_book(author, CONTENT)
+    cid = await book_hash(client, book_id)
+    stats = api.ipfs.cache.stats()
+
+    response = await client.get(f"/books/{book_id}/content", headers=author.headers)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["ETag"] == f'"{cid}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert (api.ipfs.cache.root / cid[-2:] / cid).read_bytes() == CONTENT
+
+    # Served from the cache from now on
+    response = await client.get(f"/books/{book_id}/content", headers={**author.headers, "Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-10:]
+    assert api.ipfs.cache.stats()["misses"] == stats["misses"] + 1
+    assert api.ipfs.cache.stats()["hits"] == stats["hits"] + 1
+
+@pytest.mark.anyio
+async def test_cache_lookups_exported(client, author, seed_book):
+    book_id = seed_book(author, CONTENT)
+    await client.get(f"/books/{book_id}/content", headers=author.headers)
+    await client.get(f"/books/{book_id}/content", headers=author.headers)
+
+    metrics = (await client.get("/metrics")).text
+    assert 'ipfs_cache_lookups_total{result="hit"}' in metrics
+    assert 'ipfs_cache_lookups_total{result="miss"}' in metrics
+    assert "ipfs_cache_size_bytes " in metrics
+
+@pytest.mark.anyio
+async def test_range_streams_from_ipfs(api, client, author, seed_book):
+    book_id = seed_book(author, CONTENT)
+    cid = await book_hash(client, book_id)
+
+    response = await client.get(f"/books/{book_id}/content", headers={**author.headers, "Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert response.headers["Content-Length"] == "100"
+    assert response.content == CONTENT[100:200]
+    # Partial reads are not cached
+    assert not (api.ipfs.cache.root / cid[-2:] / cid).exists()
+
+@pytest.mark.anyio
+async def test_unsatisfiable_range(client, author, seed_book):
+    book_id = seed_book(author, CONTENT)
+
+    response = await client.get(
+        f"/books/{book_id}/content", headers={**author.headers, "Range": f"bytes={len(CONTENT)}-"}
+    )
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+@pytest.mark.anyio
+async def test_empty_file(client, author, seed_book):
+    book_id = seed_book(author, b"")
+
+    response = await client.get(f"/books/{book_id}/content", headers={**author.headers, "Range": "bytes=-10"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == "bytes */0"
+
+    response = await client.get(f"/books/{book_id}/content", headers=author.headers)
+    assert response.status_code == 200
+    assert response.content == b""
+
+@pytest.mark.anyio
+async def test_if_none_match(client, author, seed_book):
+    book_id = seed_book(author, CONTENT)
+    etag = (await client.get(f"/books/{book_id}/content", headers=author.headers)).headers["ETag"]
+
+    response = await client.get(f"/books/{book_id}/content", headers={**author.headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+@pytest.mark.anyio
+async def test_requires_purchase(client, author, create_user, seed_book):
+    book_id = seed_book(author, CONTENT)
+    buyer = await create_user()
+
+    response = await client.get(f"/books/{book_id}/content", headers=buyer.headers)
+    assert response.status_code == 403
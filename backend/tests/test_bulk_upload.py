@@ -0,0 +1,84 @@
+# tests/test_bulk_upload.py
+"""Per-entry results and idempotent retries of /author/upload-books"""
+import json
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+def bulk_request(count: int):
+    tag = uuid.uuid4().hex
+    manifest = [
+        {"title": f"Bulk {i}", "description": "Bulk import", "price": 0.01, "book_file": f"book-{i}.pdf"}
+        for i in range(count)
+    ]
+    files = [("files", (f"book-{i}.pdf", f"{tag}-{i}".encode(), "application/pdf")) for i in range(count)]
+    return {"manifest": json.dumps(manifest)}, files
+
+@pytest.fixture
+async def chain(api, client):
+    return await api.services.get_chain()
+
+@pytest.fixture
+def small_batches(api, monkeypatch):
+    monkeypatch.setattr(api.settings, "BOOK_BATCH_SIZE", 2)
+
+@pytest.fixture
+def failing_batch(chain, monkeypatch):
+    """Make the nth createBooks send fail (1-based); 0 lets every send through"""
+    send = chain.tx_builder.send
+    state = {"fail": 0, "calls": 0}
+
+    async def flaky(*args, **kwargs):
+        state["calls"] += 1
+        if state["calls"] == state["fail"]:
+            raise RuntimeError("node rejected the transaction")
+        return await send(*args, **kwargs)
+
+    monkeypatch.setattr(chain.tx_builder, "send", flaky)
+    return state
+
+def author_books(api, db, author):
+    return db.query(api.models.Book).filter(api.models.Book.author_id == author.id).all()
+
+async def test_every_batch_is_created(api, client, author, db, small_batches):
+    data, files = bulk_request(3)
+    response = await client.post("/author/upload-books", data=data, files=files, headers=author.headers)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["count"] == 3 and body["failed"] == 0
+    assert len(body["transaction_hashes"]) == 2
+    assert [b["status"] for b in body["books"]] == ["created"] * 3
+    assert {b["book_id"] for b in body["books"]} == {b.id for b in author_books(api, db, author)}
+
+async def test_failed_batch_is_reported_and_retry_skips_created_books(
+    api, client, author, db, small_batches, failing_batch
+):
+    data, files = bulk_request(3)
+    failing_batch["fail"] = 2
+    response = await client.post("/author/upload-books", data=data, files=files, headers=author.headers)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["count"] == 2 and body["failed"] == 1
+    first, second, third = body["books"]
+    assert first["status"] == second["status"] == "created"
+    assert first["book_id"] and first["transaction_hash"] == second["transaction_hash"]
+    assert third["status"] == "failed"
+    assert "node rejected" in third["error"] and third["book_id"] is None
+    assert len(author_books(api, db, author)) == 2
+
+    # Retrying the whole manifest only submits what is missing
+    failing_batch["fail"] = 0
+    response = await client.post("/author/upload-books", data=data, files=files, headers=author.headers)
+    body = response.json()
+    assert body["count"] == 1 and body["existing"] == 2 and body["failed"] == 0
+    assert [b["status"] for b in body["books"]] == ["existing", "existing", "created"]
+    assert body["books"][0]["book_id"] == first["book_id"]
+    assert len(author_books(api, db, author)) == 3
+
+async def test_only_authors_may_bulk_upload(client, create_user):
+    reader = await create_user()
+    data, files = bulk_request(1)
+    response = await client.post("/author/upload-books", data=data, files=files, headers=reader.headers)
+    assert response.status_code == 403
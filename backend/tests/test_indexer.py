@@ -0,0 +1,91 @@
+# tests/test_indexer.py
+"""Checkpointing and reorg rewinds in the event indexer"""
+from types import SimpleNamespace
+
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+
+from benchmarks.fakes import ABI_PATH
+from indexer import CHECKPOINT_NAME, EventIndexer
+from utils.abi import load_abi
+
+class FakeChain:
+    """Block hashes by number, forkable, and a log of get_logs ranges (never any logs)"""
+
+    def __init__(self, head: int):
+        self.block_number = head
+        self.fork = 0
+        self.forked_from = None
+        self.ranges = []
+
+    def get_block(self, number):
+        fork = self.fork if self.forked_from is not None and number >= self.forked_from else 0
+        return {"hash": HexBytes(Web3.keccak(text=f"block-{number}-{fork}"))}
+
+    def get_logs(self, params):
+        self.ranges.append((params["fromBlock"], params["toBlock"]))
+        return []
+
+    def reorg(self, from_block: int):
+        self.fork += 1
+        self.forked_from = from_block
+
+@pytest.fixture
+def chain():
+    return FakeChain(head=100)
+
+@pytest.fixture
+def indexer(api, db, chain):
+    db.query(api.models.IndexerCheckpoint).filter(api.models.IndexerCheckpoint.name == CHECKPOINT_NAME).delete()
+    db.commit()
+    contract = Web3().eth.contract(address="0x" + "11" * 20, abi=load_abi(str(ABI_PATH), None))
+    return EventIndexer(
+        SimpleNamespace(w3=SimpleNamespace(eth=chain), contract=contract),
+        confirmations=12, start_block=10, max_range=1000
+    )
+
+def checkpoint(api, db):
+    db.expire_all()
+    return db.get(api.models.IndexerCheckpoint, CHECKPOINT_NAME)
+
+def test_indexes_up_to_the_confirmed_head(api, db, chain, indexer):
+    assert indexer.sync_once() == 88
+    assert chain.ranges == [(10, 88)]
+    saved = checkpoint(api, db)
+    assert saved.block_hash == chain.get_block(88)["hash"].hex()
+
+    chain.block_number = 110
+    assert indexer.sync_once() == 98
+    assert chain.ranges[-1] == (89, 98)
+
+def test_reorg_rewinds_a_confirmation_depth(api, db, chain, indexer):
+    indexer.sync_once()
+    chain.reorg(from_block=85)
+    chain.block_number = 105
+    assert indexer.sync_once() == 93
+    # The checkpoint block changed, so blocks after 88 - 12 are read again
+    assert chain.ranges[-1] == (77, 93)
+    assert checkpoint(api, db).block_hash == chain.get_block(93)["hash"].hex()
+
+def test_rewind_stops_at_the_start_block(api, db, chain, indexer):
+    chain.block_number = 25
+    assert indexer.sync_once() == 13
+    chain.reorg(from_block=0)
+    assert indexer.sync_once() == 13
+    assert chain.ranges[-1] == (10, 13)
+
+def test_range_shrinks_on_provider_errors(chain, indexer):
+    calls = []
+
+    def limited(params):
+        calls.append((params["fromBlock"], params["toBlock"]))
+        if params["toBlock"] - params["fromBlock"] >= 20:
+            raise ValueError("query returned more than 10000 results")
+        return []
+
+    chain.get_logs = limited
+    assert indexer.sync_once() == 88
+    covered = sorted(r for r in calls if r[1] - r[0] < 20)
+    assert covered[0][0] == 10 and covered[-1][1] == 88
+    assert all(a[1] + 1 == b[0] for a, b in zip(covered, covered[1:]))
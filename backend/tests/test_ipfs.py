@@ -0,0 +1,102 @@
+# tests/test_ipfs.py
+import asyncio
+import io
+
+import httpx
+import pytest
+from fastapi import UploadFile
+
+from utils.ipfs import IPFSManager
+
+pytestmark = pytest.mark.anyio
+
+def upload(content: bytes = b"book contents") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename="book.pdf")
+
+@pytest.fixture
+async def hung_daemon():
+    """A server that accepts uploads but never answers"""
+    async def swallow(reader, writer):
+        while await reader.read(65536):
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(swallow, "127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    yield f"http://{host}:{port}"
+    server.close()
+
+async def test_add_times_out_on_a_hung_daemon(hung_daemon):
+    manager = IPFSManager(hung_daemon, timeout=0.2, max_retries=1, max_concurrency=2)
+    try:
+        with pytest.raises(httpx.ReadTimeout):
+            await asyncio.wait_for(manager.add(upload()), 5)
+        # The concurrency slot was given back
+        assert manager.limit._value == 2
+    finally:
+        await manager.aclose()
+
+async def test_add_replays_the_body_after_a_server_error():
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(request.read())
+        if len(bodies) == 1:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"Hash": "QmTest"})
+
+    manager = IPFSManager(max_retries=1)
+    manager._http = httpx.AsyncClient(base_url="http://ipfs/api/v0", transport=httpx.MockTransport(handler))
+    try:
+        assert await manager.add(upload(b"x" * 10)) == "QmTest"
+    finally:
+        await manager.aclose()
+    assert len(bodies) == 2
+    assert b"x" * 10 in bodies[0] and b"x" * 10 in bodies[1]
+
+async def test_add_does_not_retry_an_oversized_file():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        request.read()
+        return httpx.Response(200, json={"Hash": "QmTest"})
+
+    manager = IPFSManager(max_upload_size=4, chunk_size=2, max_retries=3)
+    manager._http = httpx.AsyncClient(base_url="http://ipfs/api/v0", transport=httpx.MockTransport(handler))
+    try:
+        with pytest.raises(Exception, match="maximum size"):
+            await manager.add(upload(b"x" * 10))
+    finally:
+        await manager.aclose()
+    assert len(calls) <= 1
+
+async def book_hash(client, book_id):
+    return (await client.get(f"/books/{book_id}")).json()["book_hash"]
+
+async def test_serves_files_books_refer_to(client, author, seed_book):
+    cid = await book_hash(client, seed_book(author, b"public file"))
+    response = await client.get(f"/ipfs/{cid}")
+    assert response.status_code == 200
+    assert response.content == b"public file"
+
+async def test_refuses_cids_no_book_refers_to(api, client, fake_ipfs):
+    fake_ipfs.store["QmStranger"] = b"not a book"
+    response = await client.get("/ipfs/QmStranger")
+    assert response.status_code == 404
+    assert api.ipfs.cache.get("QmStranger") is None
+
+async def test_missing_content_is_404(client, author, seed_book, fake_ipfs):
+    cid = await book_hash(client, seed_book(author))
+    del fake_ipfs.store[cid]
+    assert (await client.get(f"/ipfs/{cid}")).status_code == 404
+
+async def test_unreachable_daemon_is_502(api, client, author, seed_book, monkeypatch):
+    cid = await book_hash(client, seed_book(author))
+
+    async def unreachable(ipfs_hash, offset=None, length=None):
+        raise httpx.ConnectError("connection refused")
+        yield b""
+
+    monkeypatch.setattr(api.ipfs, "cat", unreachable)
+    assert (await client.get(f"/ipfs/{cid}")).status_code == 502
@@ -0,0 +1,47 @@
+# tests/test_ipfs_cache.py
+"""Per-worker directories of the on-disk IPFS cache"""
+import os
+import subprocess
+import sys
+
+from utils.ipfs_cache import IPFSCache
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_single_worker_uses_the_root(tmp_path):
+    cache = IPFSCache(str(tmp_path), 1000)
+    cache.preload()
+    assert cache.root == tmp_path
+    assert cache.max_bytes == 1000
+
+def test_workers_split_the_directory_and_budget(tmp_path):
+    cache = IPFSCache(str(tmp_path), 1000, workers=4)
+    cache.preload()
+    assert cache.root == tmp_path / f"worker-{os.getpid()}"
+    assert cache.max_bytes == 250
+
+def test_a_stopped_workers_files_are_adopted(tmp_path):
+    left = tmp_path / f"worker-{dead_pid()}" / "ab" / "Qmab"
+    left.parent.mkdir(parents=True)
+    left.write_bytes(b"cached")
+
+    cache = IPFSCache(str(tmp_path), 1000, workers=2)
+    assert cache.get("Qmab") == tmp_path / f"worker-{os.getpid()}" / "ab" / "Qmab"
+    assert not left.parent.parent.exists()
+
+def test_a_live_workers_directory_is_left_alone(tmp_path):
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        theirs = tmp_path / f"worker-{other.pid}" / "ab" / "Qmab"
+        theirs.parent.mkdir(parents=True)
+        theirs.write_bytes(b"cached")
+
+        cache = IPFSCache(str(tmp_path), 1000, workers=2)
+        assert cache.get("Qmab") is None
+        assert theirs.exists()
+    finally:
+        other.kill()
+        other.wait()
@@ -0,0 +1,66 @@
+# tests/test_login.py
+"""Password login and the shared failed-login limit"""
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def from_address(api):
+    """A client for the running app that connects from another address"""
+    def connect(host: str) -> httpx.AsyncClient:
+        transport = httpx.ASGITransport(app=api.app, client=(host, 40000))
+        return httpx.AsyncClient(transport=transport, base_url="http://testserver")
+    return connect
+
+@pytest.fixture
+def verifications(api, monkeypatch):
+    """Passwords checked with bcrypt during the test"""
+    calls = []
+    verify = api.password_hasher.verify
+
+    async def counting_verify(password, hashed_password):
+        calls.append(password)
+        return await verify(password, hashed_password)
+
+    monkeypatch.setattr(api.password_hasher, "verify", counting_verify)
+    return calls
+
+async def test_login(client, create_user, password):
+    user = await create_user()
+    response = await client.post("/login", data={"username": user.username, "password": password})
+    assert response.status_code == 200
+    assert response.json()["username"] == user.username
+
+async def test_wrong_password(client, create_user):
+    user = await create_user()
+    response = await client.post("/login", data={"username": user.username, "password": "wrong"})
+    assert response.status_code == 401
+
+async def test_lockout_skips_bcrypt(api, create_user, password, from_address, verifications):
+    user = await create_user()
+    limit = api.settings.LOGIN_MAX_FAILURES
+    async with from_address("192.0.2.1") as attacker:
+        for _ in range(limit):
+            response = await attacker.post("/login", data={"username": user.username, "password": "wrong"})
+            assert response.status_code == 401
+        verified = len(verifications)
+
+        # Even the right password is refused while the client is over the limit, unhashed
+        response = await attacker.post("/login", data={"username": user.username, "password": password})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert len(verifications) == verified
+
+    # Another client logging in to the same account is unaffected
+    async with from_address("192.0.2.2") as owner:
+        response = await owner.post("/login", data={"username": user.username, "password": password})
+        assert response.status_code == 200
+
+async def test_unknown_user_counts_as_failure(api, from_address):
+    async with from_address("192.0.2.3") as client:
+        for _ in range(api.settings.LOGIN_MAX_FAILURES):
+            response = await client.post("/login", data={"username": "nobody", "password": "wrong"})
+            assert response.status_code == 401
+        response = await client.post("/login", data={"username": "nobody", "password": "wrong"})
+        assert response.status_code == 429
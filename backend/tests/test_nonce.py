@@ -0,0 +1,85 @@
+# tests/test_nonce.py
+"""Nonce allocation, release and resync against a fake node"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.nonce import NonceManager
+from utils.shared_state import MemoryState
+from utils.transactions import BroadcastOutcomeUnknown
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = "0x" + "ab" * 20
+
+class FakeNode:
+    def __init__(self, pending: int = 0):
+        self.pending = pending
+        self.calls = 0
+
+    async def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == "pending"
+        self.calls += 1
+        return self.pending
+
+@pytest.fixture
+def node():
+    return FakeNode(pending=5)
+
+@pytest.fixture
+def nonces(node):
+    return NonceManager(SimpleNamespace(eth=node), MemoryState())
+
+async def test_allocates_from_the_pending_count_once(nonces, node):
+    assert [await nonces.allocate(ADDRESS) for _ in range(3)] == [5, 6, 7]
+    assert node.calls == 1
+
+async def test_concurrent_allocations_are_distinct(nonces):
+    allocated = await asyncio.gather(*(nonces.allocate(ADDRESS) for _ in range(20)))
+    assert sorted(allocated) == list(range(5, 25))
+
+async def test_released_gap_is_reused_first(nonces):
+    for _ in range(3):
+        await nonces.allocate(ADDRESS)
+    await nonces.release(ADDRESS, 6)
+    assert await nonces.allocate(ADDRESS) == 6
+    assert await nonces.allocate(ADDRESS) == 8
+
+async def test_releasing_the_top_collapses_the_counter(nonces):
+    for _ in range(3):
+        await nonces.allocate(ADDRESS)
+    await nonces.release(ADDRESS, 6)
+    await nonces.release(ADDRESS, 7)
+    assert await nonces.allocate(ADDRESS) == 6
+    assert await nonces.allocate(ADDRESS) == 7
+
+async def test_resync_moves_forward_and_drops_used_gaps(nonces, node):
+    for _ in range(3):
+        await nonces.allocate(ADDRESS)
+    await nonces.release(ADDRESS, 5)
+    # Another sender of the same account used 5 through 9
+    node.pending = 10
+    await nonces.resync(ADDRESS)
+    assert await nonces.allocate(ADDRESS) == 10
+
+async def test_reserve_releases_on_failure(nonces):
+    with pytest.raises(RuntimeError):
+        async with nonces.reserve(ADDRESS) as nonce:
+            assert nonce == 5
+            raise RuntimeError("gas estimation failed")
+    async with nonces.reserve(ADDRESS) as nonce:
+        assert nonce == 5
+
+async def test_reserve_keeps_a_nonce_the_node_may_hold(nonces, node):
+    with pytest.raises(BroadcastOutcomeUnknown):
+        async with nonces.reserve(ADDRESS):
+            node.pending = 6  # The broadcast reached the node after all
+            raise BroadcastOutcomeUnknown("timed out")
+    assert await nonces.allocate(ADDRESS) == 6
+
+async def test_reserve_releases_a_nonce_the_node_lacks(nonces):
+    with pytest.raises(BroadcastOutcomeUnknown):
+        async with nonces.reserve(ADDRESS):
+            raise BroadcastOutcomeUnknown("timed out")
+    assert await nonces.allocate(ADDRESS) == 5
@@ -0,0 +1,65 @@
+# tests/test_pagination.py
+"""Keyset pagination of /books"""
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42, 3)) == (42, 3)
+    assert decode_cursor(None) == (None, 1)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+async def walk(client, author_id, limit):
+    ids, pages, cursor = [], [], None
+    while True:
+        params = {"author_id": author_id, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = (await client.get("/books", params=params)).json()
+        ids += [book["id"] for book in body["books"]]
+        pages.append(body["page"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages, body["total"]
+
+@pytest.fixture
+def catalog(api, db, author, seed_book):
+    """Five books, three sharing one created_at so ids break the tie"""
+    ids = [seed_book(author, title=f"Page test {i}") for i in range(5)]
+    same = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i, book_id in enumerate(ids):
+        created_at = same if i < 3 else datetime(2026, 1, i, tzinfo=timezone.utc)
+        db.query(api.models.Book).filter(api.models.Book.id == book_id).update({"created_at": created_at})
+    db.commit()
+    # Newest first, then highest id
+    return [ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+async def test_pages_cover_every_book_once_in_order(client, author, catalog):
+    ids, pages, total = await walk(client, author.id, limit=2)
+    assert ids == catalog
+    assert pages == [1, 2, 3]
+    assert total == 5
+
+async def test_new_books_do_not_shift_later_pages(client, author, catalog, seed_book):
+    first = (await client.get("/books", params={"author_id": author.id, "limit": 2})).json()
+    seed_book(author, title="Page test new")
+    rest = (await client.get("/books", params={
+        "author_id": author.id, "limit": 10, "cursor": first["next_cursor"]
+    })).json()
+    assert [book["id"] for book in first["books"] + rest["books"]] == catalog
+
+async def test_unconfirmed_books_are_not_listed(api, client, db, author, catalog):
+    db.query(api.models.Book).filter(api.models.Book.id == catalog[0]).update(
+        {"status": api.models.BookStatus.PENDING}
+    )
+    db.commit()
+    ids, _, _ = await walk(client, author.id, limit=10)
+    assert ids == catalog[1:]
+
+async def test_invalid_cursor(client):
+    assert (await client.get("/books", params={"cursor": "garbage"})).status_code == 400
@@ -0,0 +1,133 @@
+# tests/test_purchase_ledger.py
+"""Journal replay and flushing of the write-behind purchase ledger"""
+import fcntl
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from utils.purchase_ledger import PendingPurchase, PurchaseLedger
+
+pytestmark = pytest.mark.anyio
+
+def purchase(book_id, buyer_id, n):
+    return PendingPurchase(
+        book_id=book_id,
+        buyer_id=buyer_id,
+        transaction_hash=f"0x{n:064x}",
+        purchase_price=0.01,
+        created_at=datetime.now(timezone.utc)
+    )
+
+@pytest.fixture
+def recorded(api):
+    def recorded(buyer_id):
+        db = api.SessionLocal()
+        try:
+            rows = db.query(api.models.Purchase.transaction_hash).filter(api.models.Purchase.buyer_id == buyer_id)
+            return sorted(tx for tx, in rows)
+        finally:
+            db.close()
+    return recorded
+
+@pytest.fixture
+async def buyer_and_books(author, create_user, seed_book):
+    buyer = await create_user()
+    return buyer.id, [seed_book(author) for _ in range(3)]
+
+async def test_recover_skips_torn_last_line(tmp_path, buyer_and_books, recorded):
+    buyer_id, book_ids = buyer_and_books
+    entries = [purchase(book_id, buyer_id, buyer_id * 100 + i) for i, book_id in enumerate(book_ids)]
+    segment = tmp_path / "crashed.journal"
+    # A crash mid-append leaves the last line without its newline
+    segment.write_text(entries[0].to_json() + "\n" + entries[1].to_json() + "\n" + entries[2].to_json()[:20])
+
+    ledger = PurchaseLedger(str(tmp_path), fsync=False)
+    assert ledger.recover() == 2
+    assert not segment.exists()
+    assert recorded(buyer_id) == sorted(entry.transaction_hash for entry in entries[:2])
+
+async def test_recover_is_idempotent(tmp_path, buyer_and_books, recorded):
+    buyer_id, book_ids = buyer_and_books
+    entry = purchase(book_ids[0], buyer_id, buyer_id * 100)
+    # Inserted already, but the worker died before deleting the segment
+    for name in ("a.journal", "b.journal"):
+        (tmp_path / name).write_text(entry.to_json() + "\n")
+
+    ledger = PurchaseLedger(str(tmp_path), fsync=False)
+    assert ledger.recover() == 2
+    assert recorded(buyer_id) == [entry.transaction_hash]
+
+async def test_recover_leaves_live_segments(tmp_path, buyer_and_books, recorded):
+    buyer_id, book_ids = buyer_and_books
+    segment = tmp_path / "live.journal"
+    segment.write_text(purchase(book_ids[0], buyer_id, buyer_id * 100).to_json() + "\n")
+    fd = os.open(segment, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        assert PurchaseLedger(str(tmp_path), fsync=False).recover() == 0
+        assert segment.exists()
+    finally:
+        os.close(fd)
+    assert recorded(buyer_id) == []
+
+async def test_record_then_flush(tmp_path, buyer_and_books, recorded):
+    buyer_id, book_ids = buyer_and_books
+    ledger = PurchaseLedger(str(tmp_path), fsync=False)
+    entry = purchase(book_ids[0], buyer_id, buyer_id * 100)
+    await ledger.record(entry)
+    assert ledger.pending(entry.transaction_hash) is entry
+    assert ledger.pending_for(buyer_id, book_ids[0]) == [entry]
+
+    await ledger.flush()
+    assert ledger.pending(entry.transaction_hash) is None
+    assert recorded(buyer_id) == [entry.transaction_hash]
+    assert list(tmp_path.glob("*.journal")) == []
+    assert ledger.stats()["flushed"] == 1
+
+async def test_flush_dead_letters_rejected_rows(tmp_path, buyer_and_books, recorded):
+    buyer_id, book_ids = buyer_and_books
+    # The app's SQLite engine leaves foreign keys unenforced; Postgres would reject these rows
+    engine = create_engine(os.environ["DATABASE_URL"])
+    event.listen(engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON"))
+    ledger = PurchaseLedger(str(tmp_path), session_factory=sessionmaker(bind=engine), fsync=False)
+
+    good = purchase(book_ids[0], buyer_id, buyer_id * 100)
+    orphan = purchase(10 ** 9, buyer_id, buyer_id * 100 + 1)
+    await ledger.record(good)
+    await ledger.record(orphan)
+    await ledger.flush()
+    # A later segment is not held back by the rejected row
+    later = purchase(book_ids[1], buyer_id, buyer_id * 100 + 2)
+    await ledger.record(later)
+    await ledger.flush()
+    engine.dispose()
+
+    assert recorded(buyer_id) == sorted([good.transaction_hash, later.transaction_hash])
+    dead = [json.loads(line) for line in (tmp_path / "dead_letter.jsonl").read_text().splitlines()]
+    assert [row["transaction_hash"] for row in dead] == [orphan.transaction_hash]
+    assert "FOREIGN KEY" in dead[0]["error"]
+    assert ledger.stats()["flushed"] == 2
+    assert ledger.stats()["dead_lettered"] == 1
+    assert list(tmp_path.glob("*.journal")) == []
+
+async def test_verify_returns_transaction_hash(client, author, create_user, seed_book, fake_chain):
+    buyer = await create_user()
+    book_id = seed_book(author)
+    contract_id = (await client.get(f"/books/{book_id}")).json()["contract_id"]
+    tx_hash = fake_chain.seed_purchase(buyer.address, contract_id)
+
+    response = await client.post(
+        "/purchase/verify", headers=buyer.headers, params={"book_id": book_id, "transaction_hash": tx_hash}
+    )
+    assert response.status_code == 200
+    assert response.json()["transaction_hash"] == tx_hash
+    # Retries are answered from the journal or the table, with the same identifier
+    response = await client.post(
+        "/purchase/verify", headers=buyer.headers, params={"book_id": book_id, "transaction_hash": tx_hash}
+    )
+    assert response.json()["message"] == "Purchase already verified"
+    assert response.json()["transaction_hash"] == tx_hash
@@ -0,0 +1,65 @@
+# tests/test_query_counts.py
+"""Statements per request, read from the X-Query-Count header.
+
+Counts are taken on a second request, once per-worker caches (users, book
+totals) are warm, and must not grow with the number of rows returned.
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def warm_count(client, path, headers=None):
+    await client.get(path, headers=headers)
+    response = await client.get(path, headers=headers)
+    assert response.status_code == 200
+    return int(response.headers["X-Query-Count"])
+
+@pytest.fixture
+def seed_purchases(api, db):
+    def seed(buyer, book_ids):
+        db.add_all(
+            api.models.Purchase(
+                book_id=book_id,
+                buyer_id=buyer.id,
+                transaction_hash=f"0x{buyer.id:032x}{book_id:032x}",
+                purchase_price=0.01,
+                status=api.models.PurchaseStatus.COMPLETED,
+                created_at=datetime.now(timezone.utc)
+            )
+            for book_id in book_ids
+        )
+        db.commit()
+    return seed
+
+async def test_list_books(client, author, seed_book):
+    for _ in range(5):
+        seed_book(author)
+    # The total is cached, leaving the page itself
+    assert await warm_count(client, "/books?limit=20") == 1
+    assert await warm_count(client, f"/books?author_id={author.id}") == 1
+
+async def test_search_books(client, author, seed_book):
+    seed_book(author)
+    assert await warm_count(client, "/books/search?q=test") == 1
+
+async def test_author_books(client, author, seed_book):
+    for _ in range(5):
+        seed_book(author)
+    assert await warm_count(client, "/author/books", author.headers) == 1
+
+async def test_purchases_load_books_in_one_query(client, author, create_user, seed_book, seed_purchases):
+    buyer = await create_user()
+    seed_purchases(buyer, [seed_book(author) for _ in range(5)])
+    assert await warm_count(client, "/purchases", buyer.headers) == 2
+
+async def test_entitlements(client, author, create_user, seed_book, seed_purchases):
+    buyer = await create_user()
+    book_ids = [seed_book(author) for _ in range(5)]
+    seed_purchases(buyer, book_ids)
+    query = "&".join(f"book_ids={book_id}" for book_id in book_ids)
+    assert await warm_count(client, f"/purchases/entitlements?{query}", buyer.headers) == 2
+
+def test_header_off_by_default(api):
+    assert api.settings.model_fields["QUERY_COUNT_HEADER"].default is False
@@ -0,0 +1,86 @@
+# tests/test_receipts.py
+"""Receipt sweeps over pending and timed-out books"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+class FakeReceipts:
+    """get_receipt over a dict of tx hash -> receipt, recording overlap between calls"""
+
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_receipt(self, tx_hash):
+        self.calls.append(tx_hash)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.receipts.get(tx_hash)
+
+@pytest.fixture
+def sweep(api):
+    async def run(receipts, recheck_failed=False):
+        fake = FakeReceipts(receipts)
+        chain = SimpleNamespace(
+            tx_manager=fake,
+            tx_builder=SimpleNamespace(mined=lambda tx_hash: None),
+            contract=None  # Only read for successful receipts, which these tests do not use
+        )
+        async with api.get_async_sessionmaker()() as session:
+            await api.resolve_pending_books(chain, session, recheck_failed=recheck_failed)
+            await session.commit()
+        return fake
+    return run
+
+@pytest.fixture
+def add_book(api, db, author):
+    def add(status, age: float = 0.0) -> "api.models.Book":
+        book = api.models.Book(
+            title="Receipt test",
+            price=0.01,
+            book_hash="Qm" + uuid.uuid4().hex,
+            author_id=author.id,
+            transaction_hash="0x" + uuid.uuid4().hex * 2,
+            status=status,
+            created_at=datetime.now(timezone.utc) - timedelta(seconds=age)
+        )
+        db.add(book)
+        db.commit()
+        return book
+    return add
+
+async def test_receipts_are_requested_together(api, client, db, add_book, sweep):
+    books = [add_book(api.models.BookStatus.PENDING) for _ in range(3)]
+    fake = await sweep({})
+    assert {b.transaction_hash for b in books} <= set(fake.calls)
+    assert fake.max_in_flight >= 3
+
+async def test_reverted_books_are_not_rechecked(api, client, db, add_book, sweep):
+    book = add_book(api.models.BookStatus.PENDING)
+    await sweep({book.transaction_hash: {"status": 0, "logs": []}})
+    db.refresh(book)
+    assert book.status == api.models.BookStatus.FAILED
+    assert book.reverted
+
+    fake = await sweep({}, recheck_failed=True)
+    assert book.transaction_hash not in fake.calls
+
+async def test_timed_out_books_are_rechecked(api, client, db, add_book, sweep, monkeypatch):
+    monkeypatch.setattr(api.settings, "TX_RECEIPT_TIMEOUT", 60)
+    book = add_book(api.models.BookStatus.PENDING, age=120)
+    await sweep({})
+    db.refresh(book)
+    assert book.status == api.models.BookStatus.FAILED
+    assert not book.reverted
+
+    fake = await sweep({}, recheck_failed=True)
+    assert book.transaction_hash in fake.calls
@@ -0,0 +1,100 @@
+# tests/test_rpc_gateway.py
+"""Coalescing, batching and failover in RPCGateway"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from utils.rpc_gateway import RPCGateway, RPCUnavailable
+
+pytestmark = pytest.mark.anyio
+
+PRIMARY = "http://primary.test/rpc"
+FALLBACK = "http://fallback.test/rpc"
+
+class FakeNodes:
+    """Answers every call with its method name; hosts in down fail at the transport level"""
+
+    def __init__(self):
+        self.posts = []
+        self.down = set()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.posts.append((request.url.host, payload))
+        if request.url.host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        reply = lambda call: {"jsonrpc": "2.0", "id": call["id"], "result": f"{call['method']}@{request.url.host}"}
+        if isinstance(payload, list):
+            return httpx.Response(200, json=[reply(call) for call in reversed(payload)])
+        return httpx.Response(200, json=reply(payload))
+
+@pytest.fixture
+def nodes():
+    return FakeNodes()
+
+@pytest.fixture
+async def gateway(nodes):
+    gateway = RPCGateway([PRIMARY, FALLBACK], batch_window=0.01, failure_threshold=2, cooldown=60)
+    gateway._client = httpx.AsyncClient(transport=httpx.MockTransport(nodes.handler))
+    yield gateway
+    await gateway.aclose()
+
+async def test_identical_reads_share_one_request(gateway, nodes):
+    replies = await asyncio.gather(*(gateway.make_request("eth_blockNumber", []) for _ in range(10)))
+    assert {reply["result"] for reply in replies} == {"eth_blockNumber@primary.test"}
+    assert len(nodes.posts) == 1
+    assert not isinstance(nodes.posts[0][1], list)
+
+async def test_writes_are_never_merged(gateway, nodes):
+    await asyncio.gather(*(gateway.make_request("eth_sendRawTransaction", ["0x01"]) for _ in range(3)))
+    (_, batch), = nodes.posts
+    assert [call["method"] for call in batch] == ["eth_sendRawTransaction"] * 3
+
+async def test_concurrent_calls_go_out_as_one_batch(gateway, nodes):
+    replies = await asyncio.gather(
+        gateway.make_request("eth_getBalance", ["0x1", "latest"]),
+        gateway.make_request("eth_getBalance", ["0x2", "latest"]),
+        gateway.make_request("eth_gasPrice", [])
+    )
+    assert len(nodes.posts) == 1 and len(nodes.posts[0][1]) == 3
+    # Matched by id although the node answered out of order
+    assert [reply["result"] for reply in replies] == [
+        "eth_getBalance@primary.test", "eth_getBalance@primary.test", "eth_gasPrice@primary.test"
+    ]
+    assert len({reply["id"] for reply in replies}) == 3
+
+async def test_batch_size_flushes_early(nodes):
+    gateway = RPCGateway([PRIMARY], batch_size=2, batch_window=60)
+    gateway._client = httpx.AsyncClient(transport=httpx.MockTransport(nodes.handler))
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            gateway.make_request("eth_getBalance", ["0x1"]),
+            gateway.make_request("eth_getBalance", ["0x2"])
+        ), 5)
+    finally:
+        await gateway.aclose()
+    assert len(nodes.posts) == 1 and len(nodes.posts[0][1]) == 2
+
+async def test_chain_id_is_asked_once(gateway, nodes):
+    await gateway.make_request("eth_chainId", [])
+    await gateway.make_request("eth_chainId", [])
+    assert len(nodes.posts) == 1
+
+async def test_failover_and_cooldown(gateway, nodes):
+    nodes.down.add("primary.test")
+    reply = await gateway.make_request("eth_blockNumber", [])
+    assert reply["result"] == "eth_blockNumber@fallback.test"
+
+    await gateway.make_request("eth_gasPrice", [])
+    # Two failures in a row: the primary is skipped until the cooldown passes
+    nodes.posts.clear()
+    await gateway.make_request("eth_getCode", ["0x1"])
+    assert [host for host, _ in nodes.posts] == ["fallback.test"]
+    assert [e["up"] for e in gateway.stats()] == [False, True]
+
+async def test_all_endpoints_down(gateway, nodes):
+    nodes.down.update({"primary.test", "fallback.test"})
+    with pytest.raises(RPCUnavailable):
+        await gateway.make_request("eth_blockNumber", [])
@@ -0,0 +1,58 @@
+# tests/test_search.py
+"""Full-text search over confirmed books (SQLite FTS5 in the test database)"""
+import uuid
+
+import pytest
+
+from utils.search import fts5_query
+
+pytestmark = pytest.mark.anyio
+
+def test_fts5_query():
+    assert fts5_query("dragon's hoard") == '"dragon" "s" "hoard"*'
+    assert fts5_query('say "AND" OR') == '"say" "AND" "OR"*'
+    assert fts5_query("!!!") == ""
+
+@pytest.fixture
+def word():
+    """A term no other test's books contain"""
+    return "zq" + "".join(chr(ord("a") + int(c, 16)) for c in uuid.uuid4().hex[:10])
+
+def set_book(api, db, book_id, **values):
+    db.query(api.models.Book).filter(api.models.Book.id == book_id).update(values)
+    db.commit()
+
+async def search(client, q):
+    response = await client.get("/books/search", params={"q": q})
+    assert response.status_code == 200
+    return [book["id"] for book in response.json()["books"]]
+
+async def test_title_matches_rank_above_description_matches(api, client, db, author, seed_book, word):
+    in_description = seed_book(author, title="Plain title")
+    set_book(api, db, in_description, description=f"mentions {word} once")
+    in_title = seed_book(author, title=f"The {word} chronicles")
+    assert await search(client, word) == [in_title, in_description]
+
+async def test_every_term_is_required_and_the_last_is_a_prefix(client, author, seed_book, word):
+    both = seed_book(author, title=f"{word} lighthouse keeper")
+    seed_book(author, title=f"{word} harbour")
+    assert await search(client, f"{word} lightho") == [both]
+
+async def test_words_are_stemmed(client, author, seed_book, word):
+    book = seed_book(author, title=f"{word} running")
+    assert await search(client, f"runs {word}") == [book]
+
+async def test_edits_are_reindexed(api, client, db, author, seed_book, word):
+    book = seed_book(author, title=f"Old {word}")
+    set_book(api, db, book, title="Renamed entirely")
+    assert await search(client, word) == []
+    set_book(api, db, book, title=f"Back to {word}")
+    assert await search(client, word) == [book]
+
+async def test_only_confirmed_books_are_found(api, client, db, author, seed_book, word):
+    book = seed_book(author, title=word)
+    set_book(api, db, book, status=api.models.BookStatus.PENDING)
+    assert await search(client, word) == []
+
+async def test_query_without_terms(client):
+    assert await search(client, "!!!") == []
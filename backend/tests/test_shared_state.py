@@ -0,0 +1,104 @@
+# tests/test_shared_state.py
+"""The SharedState backends behave alike; redis runs when TEST_REDIS_URL is set"""
+import asyncio
+import os
+
+import pytest
+
+from utils.shared_state import LockTimeout, RateLimiter, create_shared_state
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+async def state(request, tmp_path):
+    if request.param == "memory":
+        backend = create_shared_state("memory://")
+    elif request.param == "sqlite":
+        backend = create_shared_state(f"sqlite:///{tmp_path / 'state.db'}")
+    else:
+        url = os.environ.get("TEST_REDIS_URL")
+        if not url:
+            pytest.skip("TEST_REDIS_URL is not set")
+        pytest.importorskip("redis")
+        backend = create_shared_state(url)
+        await backend.delete("k", "n", "lock:l", "gone")
+    yield backend
+    await backend.aclose()
+
+async def test_set_get_delete(state):
+    assert await state.get("k") is None
+    assert await state.set("k", "1")
+    assert await state.get("k") == "1"
+    assert await state.delete("k", "gone") == 1
+    assert await state.get("k") is None
+
+async def test_set_nx(state):
+    assert await state.set("k", "first", nx=True)
+    assert not await state.set("k", "second", nx=True)
+    assert await state.get("k") == "first"
+
+async def test_getdel_hands_out_a_value_once(state):
+    await state.set("k", "challenge")
+    results = await asyncio.gather(*(state.getdel("k") for _ in range(5)))
+    assert results.count("challenge") == 1
+
+async def test_expiry(state):
+    await state.set("k", "v", ex=0.1)
+    await state.set("n", "0")
+    assert await state.expire("n", 0.1)
+    assert not await state.expire("gone", 1)
+    await asyncio.sleep(0.2)
+    assert await state.get("k") is None
+    assert await state.get("n") is None
+    assert await state.set("k", "again", nx=True)
+
+async def test_incr_keeps_expiry(state):
+    assert await state.incr("n") == 1
+    await state.expire("n", 0.1)
+    assert await state.incr("n", 5) == 6
+    await asyncio.sleep(0.2)
+    assert await state.get("n") is None
+
+async def test_lock_excludes(state):
+    async with state.lock("l", timeout=5):
+        with pytest.raises(LockTimeout):
+            async with state.lock("l", timeout=5, blocking_timeout=0):
+                pass
+        with pytest.raises(LockTimeout):
+            async with state.lock("l", timeout=5, blocking_timeout=0.05):
+                pass
+    async with state.lock("l", timeout=5, blocking_timeout=0):
+        pass
+
+async def test_rate_limiter(state):
+    limiter = RateLimiter(state, "test", limit=2, window=60)
+    assert not await limiter.exceeded("client")
+    await limiter.hit("client")
+    assert not await limiter.exceeded("client")
+    await limiter.hit("client")
+    assert await limiter.exceeded("client")
+    assert not await limiter.exceeded("other")
+    assert 1 <= limiter.retry_after() <= 60
+
+async def test_sqlite_state_is_shared_between_instances(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    first, second = create_shared_state(url), create_shared_state(url)
+    try:
+        await first.set("k", "v")
+        assert await second.get("k") == "v"
+        async with first.lock("l", timeout=5):
+            with pytest.raises(LockTimeout):
+                async with second.lock("l", timeout=5, blocking_timeout=0):
+                    pass
+        # A lapsed lock can be taken by another worker
+        async with first.lock("lapsing", timeout=0.1):
+            await asyncio.sleep(0.2)
+            async with second.lock("lapsing", timeout=5, blocking_timeout=0):
+                pass
+    finally:
+        await first.aclose()
+        await second.aclose()
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError):
+        create_shared_state("postgres://localhost/state")
@@ -0,0 +1,92 @@
+# tests/test_tokens.py
+"""Refresh token rotation and revocation through the bloom-filtered revocation list"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils.auth import RevocationList, revocations
+from utils.bloom import BloomFilter
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    members = [uuid.uuid4().hex for _ in range(1000)]
+    bloom.update(members)
+    assert all(member in bloom for member in members)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
+
+@pytest.fixture
+async def session(client, create_user, password):
+    """A fresh user's login response, with both tokens"""
+    user = await create_user()
+    response = await client.post("/login", data={"username": user.username, "password": password})
+    return response.json()
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.mark.anyio
+async def test_refresh_rotates_the_refresh_token(client, session):
+    response = await client.post("/token/refresh", data={"refresh_token": session["refresh_token"]})
+    assert response.status_code == 200
+    tokens = response.json()
+    assert (await client.get("/purchases", headers=bearer(tokens["access_token"]))).status_code == 200
+
+    # The old refresh token was used up; the new one works once
+    assert (await client.post("/token/refresh", data={"refresh_token": session["refresh_token"]})).status_code == 401
+    assert (await client.post("/token/refresh", data={"refresh_token": tokens["refresh_token"]})).status_code == 200
+
+@pytest.mark.anyio
+async def test_concurrent_refreshes_succeed_once(client, session):
+    responses = await asyncio.gather(*(
+        client.post("/token/refresh", data={"refresh_token": session["refresh_token"]}) for _ in range(5)
+    ))
+    assert sorted(r.status_code for r in responses) == [200, 401, 401, 401, 401]
+
+@pytest.mark.anyio
+async def test_token_types_are_not_interchangeable(client, session):
+    assert (await client.post("/token/refresh", data={"refresh_token": session["access_token"]})).status_code == 401
+    assert (await client.get("/purchases", headers=bearer(session["refresh_token"]))).status_code == 401
+
+@pytest.mark.anyio
+async def test_logout_revokes_both_tokens(client, session):
+    response = await client.post(
+        "/logout", data={"refresh_token": session["refresh_token"]}, headers=bearer(session["access_token"])
+    )
+    assert response.status_code == 200
+    assert (await client.get("/purchases", headers=bearer(session["access_token"]))).status_code == 401
+    assert (await client.post("/token/refresh", data={"refresh_token": session["refresh_token"]})).status_code == 401
+
+@pytest.mark.anyio
+async def test_unrevoked_tokens_skip_the_database(client, session, monkeypatch):
+    lookups = []
+    monkeypatch.setattr(revocations, "_lookup", lambda jti: lookups.append(jti) or False)
+    assert (await client.get("/purchases", headers=bearer(session["access_token"]))).status_code == 200
+    assert lookups == []
+
+def revoke(db, jti, expires_in: float):
+    revocations.revoke(db, jti, datetime.now(timezone.utc) + timedelta(seconds=expires_in))
+
+def test_other_workers_pick_up_revocations(db):
+    other = RevocationList(rebuild_interval=3600)
+    before, after = uuid.uuid4().hex, uuid.uuid4().hex
+    revoke(db, before, 3600)
+    other.sync()  # First pass rebuilds from the table
+    assert before in other._filter
+
+    revoke(db, after, 3600)
+    assert after not in other._filter
+    other.sync()  # Later passes read recent rows
+    assert after in other._filter
+
+def test_rebuild_prunes_expired_revocations(db):
+    expired, live = uuid.uuid4().hex, uuid.uuid4().hex
+    revoke(db, expired, -60)
+    revoke(db, live, 3600)
+    other = RevocationList()
+    other.sync()
+    assert live in other._filter
+    assert expired not in other._filter
+    assert not other._lookup(expired)
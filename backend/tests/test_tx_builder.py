@@ -0,0 +1,130 @@
+# tests/test_tx_builder.py
+"""Gas estimate caching, fee suggestions and replace-by-fee in TransactionBuilder"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.tx_builder import TransactionBuilder
+
+pytestmark = pytest.mark.anyio
+
+SENDER = "0x" + "ab" * 20
+
+class FakeCall:
+    fn_name = "createBooks"
+
+    def __init__(self, calldata_bytes: int, gas: int = 100000):
+        self.calldata_bytes = calldata_bytes
+        self.gas = gas
+        self.estimates = 0
+
+    def _encode_transaction_data(self) -> str:
+        return "0x" + "00" * self.calldata_bytes
+
+    async def estimate_gas(self, transaction):
+        self.estimates += 1
+        return self.gas
+
+    async def build_transaction(self, transaction):
+        return dict(transaction, data=self._encode_transaction_data())
+
+class FakeEth:
+    def __init__(self, base_fee=None):
+        self.base_fee = base_fee
+        self.fee_history_calls = 0
+
+    async def fee_history(self, blocks, newest, percentiles):
+        self.fee_history_calls += 1
+        if self.base_fee is None:
+            raise ValueError("method not supported")
+        return {"baseFeePerGas": [self.base_fee] * (blocks + 1), "reward": [[2], [4], [6]]}
+
+    @property
+    async def gas_price(self):
+        return 20
+
+    @property
+    async def chain_id(self):
+        return 1337
+
+class FakeTxManager:
+    def __init__(self):
+        self.sent = []
+        self.mined = set()
+
+    async def send_transaction(self, transaction, private_key):
+        self.sent.append(transaction)
+        return f"0x{len(self.sent):064x}"
+
+    async def get_receipt(self, tx_hash):
+        return {"status": 1} if tx_hash in self.mined else None
+
+def builder(eth=None, tx_manager=None, **options):
+    return TransactionBuilder(
+        SimpleNamespace(eth=eth or FakeEth(base_fee=100)), tx_manager or FakeTxManager(), **options
+    )
+
+async def test_gas_estimate_is_cached_per_size_bucket():
+    txs = builder(gas_margin=1.5, bucket_bytes=64)
+    small, same_bucket, larger = FakeCall(10), FakeCall(60), FakeCall(200)
+    assert await txs.estimate_gas(small, SENDER) == 150000
+    assert await txs.estimate_gas(same_bucket, SENDER) == 150000
+    assert same_bucket.estimates == 0
+    await txs.estimate_gas(larger, SENDER)
+    assert larger.estimates == 1
+
+async def test_eip1559_fees_from_fee_history():
+    eth = FakeEth(base_fee=100)
+    txs = builder(eth, min_priority_fee=1)
+    fees = await txs.suggest_fees()
+    assert fees == {"maxPriorityFeePerGas": 4, "maxFeePerGas": 204}
+    await txs.suggest_fees()
+    assert eth.fee_history_calls == 1
+
+async def test_legacy_gas_price_without_a_base_fee():
+    assert await builder(FakeEth(base_fee=None)).suggest_fees() == {"gasPrice": 20}
+
+async def test_build_populates_every_field():
+    transaction = await builder().build(FakeCall(10), SENDER, nonce=7)
+    assert transaction["nonce"] == 7 and transaction["chainId"] == 1337
+    assert transaction["gas"] == 120000
+    assert transaction["maxFeePerGas"] == 204
+
+async def test_stuck_transaction_is_replaced_with_bumped_fees():
+    manager = FakeTxManager()
+    txs = builder(tx_manager=manager, replace_after=0, bump_percent=12.5)
+    first = await txs.send(FakeCall(10), SENDER, "key", nonce=3)
+
+    moved = await txs.replace_stuck()
+    replacement = manager.sent[-1]
+    assert moved == {first: f"0x{2:064x}"}
+    assert replacement["nonce"] == 3
+    assert replacement["maxPriorityFeePerGas"] == 5  # ceil(4 * 1.125)
+    assert replacement["maxFeePerGas"] == 230  # ceil(204 * 1.125)
+
+async def test_mined_earlier_version_is_followed():
+    manager = FakeTxManager()
+    txs = builder(tx_manager=manager, replace_after=0)
+    first = await txs.send(FakeCall(10), SENDER, "key", nonce=3)
+    second = (await txs.replace_stuck())[first]
+
+    manager.mined.add(first)
+    assert await txs.replace_stuck() == {second: first}
+    assert len(manager.sent) == 2
+    assert await txs.replace_stuck() == {}
+
+async def test_mined_transactions_are_not_replaced():
+    manager = FakeTxManager()
+    txs = builder(tx_manager=manager, replace_after=0)
+    tx_hash = await txs.send(FakeCall(10), SENDER, "key", nonce=3)
+    txs.mined(tx_hash)
+    assert await txs.replace_stuck() == {}
+    assert len(manager.sent) == 1
+
+async def test_replacements_are_capped():
+    manager = FakeTxManager()
+    txs = builder(tx_manager=manager, replace_after=0, max_replacements=2)
+    await txs.send(FakeCall(10), SENDER, "key", nonce=3)
+    for _ in range(5):
+        await txs.replace_stuck()
+    assert len(manager.sent) == 3
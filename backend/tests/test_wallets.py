@@ -0,0 +1,85 @@
+# tests/test_wallets.py
+"""Linking a wallet to an account and logging in by signature"""
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+pytestmark = pytest.mark.anyio
+
+def sign(account, challenge) -> dict:
+    signature = account.sign_message(encode_defunct(text=challenge["message"])).signature.hex()
+    return {"wallet_address": account.address, "signature": signature, "nonce": challenge["nonce"]}
+
+async def login_challenge(client, account):
+    return (await client.get("/auth/challenge", params={"wallet_address": account.address})).json()
+
+async def link_challenge(client, user, account):
+    response = await client.get(
+        "/account/wallet/challenge", params={"wallet_address": account.address}, headers=user.headers
+    )
+    return response.json()
+
+@pytest.fixture
+def wallet():
+    return Account.create()
+
+@pytest.fixture
+async def linked(client, create_user, wallet):
+    """A user with wallet linked"""
+    user = await create_user()
+    credentials = sign(wallet, await link_challenge(client, user, wallet))
+    response = await client.post("/account/wallet", json=credentials, headers=user.headers)
+    assert response.status_code == 200
+    assert response.json()["wallet_address"] == wallet.address
+    return user
+
+async def test_linked_wallet_logs_in(client, linked, wallet):
+    response = await client.post("/auth/wallet", json=sign(wallet, await login_challenge(client, wallet)))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["username"] == linked.username
+    assert (await client.get("/purchases", headers={"Authorization": f"Bearer {body['access_token']}"})).status_code == 200
+
+async def test_server_generated_address_logs_in(api, client, db, create_user):
+    user = await create_user()
+    key = db.query(api.models.User.ethereum_private_key).filter(api.models.User.id == user.id).scalar()
+    account = Account.from_key(key)
+    response = await client.post("/auth/wallet", json=sign(account, await login_challenge(client, account)))
+    assert response.status_code == 200
+    assert response.json()["username"] == user.username
+
+async def test_signature_cannot_be_replayed(client, linked, wallet):
+    credentials = sign(wallet, await login_challenge(client, wallet))
+    assert (await client.post("/auth/wallet", json=credentials)).status_code == 200
+    assert (await client.post("/auth/wallet", json=credentials)).status_code == 401
+
+async def test_another_key_cannot_answer(client, linked, wallet):
+    challenge = await login_challenge(client, wallet)
+    forged = dict(sign(Account.create(), challenge), wallet_address=wallet.address)
+    assert (await client.post("/auth/wallet", json=forged)).status_code == 401
+
+async def test_unlinked_wallet_is_refused(client, wallet):
+    response = await client.post("/auth/wallet", json=sign(wallet, await login_challenge(client, wallet)))
+    assert response.status_code == 401
+
+async def test_link_signature_cannot_log_in(client, create_user, wallet):
+    user = await create_user()
+    credentials = sign(wallet, await link_challenge(client, user, wallet))
+    assert (await client.post("/auth/wallet", json=credentials)).status_code == 401
+
+async def test_wallet_links_to_one_account(client, linked, create_user, wallet):
+    other = await create_user()
+    credentials = sign(wallet, await link_challenge(client, other, wallet))
+    assert (await client.post("/account/wallet", json=credentials, headers=other.headers)).status_code == 409
+
+async def test_link_challenge_is_bound_to_its_account(client, create_user, wallet):
+    first, second = await create_user(), await create_user()
+    credentials = sign(wallet, await link_challenge(client, first, wallet))
+    assert (await client.post("/account/wallet", json=credentials, headers=second.headers)).status_code == 401
+
+async def test_malformed_signature(client, wallet):
+    challenge = await login_challenge(client, wallet)
+    response = await client.post("/auth/wallet", json={
+        "wallet_address": wallet.address, "signature": "0x1234", "nonce": challenge["nonce"]
+    })
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+# utils/abi.py
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+@lru_cache(maxsize=None)
+def load_abi(artifact_path: str, cache_dir: Optional[str] = None) -> List[dict]:
+    """ABI of a compiled contract artifact, parsed once per process.
+
+    Truffle artifacts carry bytecode, source maps and the AST next to the ABI
+    and can run to megabytes. With cache_dir set, the bare ABI is also kept
+    there, keyed by the artifact's path, size and mtime, so later cold starts
+    read only that.
+    """
+    artifact = Path(artifact_path)
+    cached = None
+    if cache_dir is not None:
+        stat = artifact.stat()
+        key = hashlib.sha256(f"{artifact.resolve()}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+        cached = Path(cache_dir) / f"{artifact.stem}-{key[:16]}.json"
+        try:
+            return json.loads(cached.read_text())
+        except (OSError, ValueError):
+            pass
+
+    with open(artifact) as f:
+        data = json.load(f)
+    abi = data["abi"] if isinstance(data, dict) else data
+
+    if cached is not None:
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cached.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(abi, f, separators=(",", ":"))
+            os.replace(tmp, cached)
+        except OSError:
+            # A read-only deploy still works; it just parses the artifact each start
+            pass
+    return abi
@@ -1,21 +1,146 @@
 # utils/auth.py
-from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database import get_db
+from config import settings
+from database import SessionLocal
+from utils.bloom import BloomFilter
+from utils.passwords import password_hasher
 import models
 
-# Configuration
-SECRET_KEY = "your-secret-key-change-in-production"  # Change this!
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+REQUIRED_CLAIMS = ("sub", "role", "user_id", "jti", "type")
+
+pwd_context = password_hasher.context
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+class RevocationList:
+    """Revoked token ids, checked in memory against a bloom filter.
+
+    A miss proves a token was not revoked without touching the database; a hit
+    (revoked, or a rare false positive) is confirmed with one lookup on a worker
+    thread. sync() pulls ids revoked by other workers since the last pass, re-reading
+    an overlap window, and periodically rebuilds the filter from unexpired rows,
+    pruning the rest.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        sync_interval: float = 10.0,
+        sync_overlap: float = 60.0,
+        rebuild_interval: float = 3600.0
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_to: Optional[datetime] = None
+        self._last_rebuild: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _lookup(self, jti: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(models.RevokedToken.id).filter(models.RevokedToken.jti == jti).first() is not None
+        finally:
+            db.close()
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti not in self._filter:
+            return False
+        return await asyncio.to_thread(self._lookup, jti)
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime) -> bool:
+        """Persist a revocation and apply it to this worker immediately.
+
+        Returns False if jti was already revoked.
+        """
+        db.add(models.RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.commit()
+            revoked = True
+        except IntegrityError:
+            db.rollback()
+            revoked = False
+        self._filter.add(jti)
+        return revoked
+
+    def sync(self):
+        """Load revocations recorded since the last pass, or rebuild when due"""
+        db = SessionLocal()
+        try:
+            now = time.monotonic()
+            # Taken before reading, so rows committed during this pass are read by the next
+            started = datetime.now(timezone.utc)
+            if self._last_rebuild is None or now - self._last_rebuild >= self.rebuild_interval:
+                db.query(models.RevokedToken).filter(
+                    models.RevokedToken.expires_at < started
+                ).delete(synchronize_session=False)
+                db.commit()
+                rows = db.query(models.RevokedToken.jti).all()
+                rebuilt = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+                rebuilt.update(jti for jti, in rows)
+                self._filter = rebuilt
+                self._synced_to = started
+                self._last_rebuild = now
+                return
+
+            # Neither ids nor revoked_at are committed in order (and the database clock
+            # may differ from ours), so a window before the last pass is read again
+            rows = db.query(models.RevokedToken.jti).filter(
+                models.RevokedToken.revoked_at >= self._synced_to - timedelta(seconds=self.sync_overlap)
+            ).all()
+            self._filter.update(jti for jti, in rows)
+            self._synced_to = started
+        finally:
+            db.close()
+
+    async def _follow(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Revocation sync failed")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        """Keep the filter in sync from a background task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+revocations = RevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+    sync_overlap=settings.REVOCATION_SYNC_OVERLAP,
+    rebuild_interval=settings.REVOCATION_REBUILD_INTERVAL
+)
 
 class AuthManager:
     @staticmethod
@@ -29,46 +154,57 @@ class AuthManager:
         return pwd_context.hash(password)
 
     @staticmethod
-    def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-        """Create JWT token"""
+    def _encode(data: dict, token_type: str, expires_delta: timedelta) -> str:
+        now = datetime.now(timezone.utc)
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        return encoded_jwt
+        to_encode.update({
+            "type": token_type,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + expires_delta
+        })
+        return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
     @staticmethod
-    async def get_current_user(
-        token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-    ):
-        """Get current user from JWT token"""
+    def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+        """Create a short-lived JWT carrying sub, role and user_id"""
+        return AuthManager._encode(
+            data, ACCESS_TOKEN, expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+
+    @staticmethod
+    def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+        """Create a long-lived JWT that can only be exchanged for new tokens"""
+        return AuthManager._encode(
+            data, REFRESH_TOKEN, expires_delta or timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        )
+
+    @staticmethod
+    async def decode_token(token: str, token_type: str = ACCESS_TOKEN) -> dict:
+        """Validate signature, expiry, type and revocation, returning the claims"""
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            username: str = payload.get("sub")
-            if username is None:
-                raise credentials_exception
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         except JWTError:
             raise credentials_exception
-
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if user is None:
+        if any(claim not in payload for claim in REQUIRED_CLAIMS) or payload["type"] != token_type:
             raise credentials_exception
-        return user
+        if await revocations.is_revoked(payload["jti"]):
+            raise credentials_exception
+        return payload
 
     @staticmethod
-    async def get_current_active_user(
-        current_user = Depends(get_current_user)
-    ):
-        """Get current active user"""
-        return current_user
+    async def verify_token(token: str = Depends(oauth2_scheme)) -> dict:
+        """Claims of a valid access token; no database access unless the filter matches"""
+        return await AuthManager.decode_token(token, ACCESS_TOKEN)
+
+    @staticmethod
+    def revoke_token(db: Session, claims: dict) -> bool:
+        """Revoke a decoded token until it would have expired anyway; False if it already was"""
+        return revocations.revoke(db, claims["jti"], datetime.fromtimestamp(claims["exp"], timezone.utc))
 
-auth = AuthManager()
\ No newline at end of file
+auth = AuthManager()
@@ -1,14 +1,15 @@
 # utils/blockchain.py
 from web3 import Web3
-from eth_account.messages import encode_defunct
 from fastapi import HTTPException
-import json
 from typing import Dict, Any
-import os
+from config import settings
+from utils.abi import load_abi
+from utils.metrics import instrument_web3
+from utils import wallets
 
 class BlockchainManager:
     def __init__(self, provider_url="http://127.0.0.1:8545"):
-        self.w3 = Web3(Web3.HTTPProvider(provider_url))
+        self.w3 = instrument_web3(Web3(Web3.HTTPProvider(provider_url)))
         self.contract = None
         self.contract_address = None
 
@@ -19,11 +20,9 @@ class BlockchainManager:
     def load_contract(self, contract_address: str, abi_path: str):
         """Load smart contract"""
         try:
-            with open(abi_path, 'r') as file:
-                contract_abi = json.load(file)
             self.contract = self.w3.eth.contract(
                 address=Web3.to_checksum_address(contract_address),
-                abi=contract_abi['abi']
+                abi=load_abi(str(abi_path), settings.ABI_CACHE_DIR)
             )
             self.contract_address = contract_address
             return True
@@ -45,12 +44,6 @@ class BlockchainManager:
     def verify_signature(self, message: str, signature: str, address: str) -> bool:
         """Verify message signature from MetaMask"""
         try:
-            message_hash = encode_defunct(text=message)
-            recovered_address = self.w3.eth.account.recover_message(
-                message_hash, signature=signature
-            )
-            return recovered_address.lower() == address.lower()
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Signature verification failed: {str(e)}")
-
-blockchain = BlockchainManager()
\ No newline at end of file
+            return wallets.verify_signature(message, signature, address)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,77 @@
+# utils/chain_head.py
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from utils.metrics import registry
+
+if TYPE_CHECKING:
+    from web3 import AsyncWeb3
+
+logger = logging.getLogger(__name__)
+
+HEAD_BLOCK = registry.gauge("chain_head_block", "Latest block number seen by this worker")
+HEAD_AGE = registry.gauge("chain_head_age_seconds", "Seconds since the head was last refreshed")
+
+class ChainHead:
+    """Latest block number, polled in the background so probes never wait on the node"""
+
+    def __init__(self, w3: "AsyncWeb3", refresh_interval: float = 5.0):
+        self.w3 = w3
+        self.refresh_interval = refresh_interval
+        self.block_number: Optional[int] = None
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        HEAD_BLOCK.add_source(self._block_sample)
+        HEAD_AGE.add_source(self._age_sample)
+
+    def _block_sample(self):
+        yield {}, self.block_number
+
+    def _age_sample(self):
+        yield {}, self.age()
+
+    def age(self) -> Optional[float]:
+        return None if self.updated_at is None else time.monotonic() - self.updated_at
+
+    async def refresh(self):
+        try:
+            self.block_number = await self.w3.eth.block_number
+            self.connected = True
+            self.last_error = None
+            self.updated_at = time.monotonic()
+        except Exception as e:
+            if self.connected:
+                logger.warning("Chain head refresh failed: %s", e)
+            self.connected = False
+            self.last_error = str(e)
+
+    def status(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            "blockchain_connected": self.connected,
+            "current_block": self.block_number,
+            "block_age_seconds": round(age, 3) if age is not None else None
+        }
+
+    async def _follow(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Refresh the head from a background task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
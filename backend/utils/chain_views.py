@@ -0,0 +1,252 @@
+# utils/chain_views.py
+import asyncio
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from eth_utils import event_abi_to_log_topic, to_checksum_address, to_hex
+from eth_utils.abi import collapse_if_tuple
+
+from utils.metrics import stage
+from utils.rpc_gateway import RPCGateway, RPCUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Events that change what a cached view returns
+INVALIDATING_EVENTS = ("BookCreated", "BookPurchased", "BookUpdated")
+
+@lru_cache(maxsize=65536)
+def checksum(address: str) -> str:
+    """Checksummed address, memoized since hashing dominates a cache hit"""
+    return to_checksum_address(address)
+
+class ChainViewError(Exception):
+    pass
+
+class ChainViewCache:
+    """Read-through cache over the marketplace's getBook, hasPurchased and getAuthorBooks views.
+
+    Misses are issued together as eth_calls pinned to the last synced block,
+    which the gateway packs into JSON-RPC batches. A background task follows
+    new blocks and evicts entries touched by BookCreated/BookPurchased/
+    BookUpdated logs, so a cached value stays valid until an event says otherwise.
+    """
+
+    def __init__(
+        self,
+        contract,
+        gateway: RPCGateway,
+        max_entries: int = 100000,
+        sync_interval: float = 2.0,
+        max_block_range: int = 5000
+    ):
+        self.contract = contract
+        self.w3 = contract.w3
+        self.gateway = gateway
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self.max_block_range = max_block_range
+        self.synced_block: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+        self._events = {}
+        for name in INVALIDATING_EVENTS:
+            event = getattr(contract.events, name)()
+            self._events[event_abi_to_log_topic(event.abi)] = event
+
+    # Public views
+
+    async def has_purchased(self, buyer: str, book_id: int) -> bool:
+        """Whether buyer owns book_id on chain"""
+        return (await self.has_purchased_many(buyer, [book_id]))[book_id]
+
+    async def has_purchased_many(self, buyer: str, book_ids: Iterable[int]) -> Dict[int, bool]:
+        """Ownership of several books, fetched with one RPC for all cache misses"""
+        buyer = checksum(buyer)
+        book_ids = list(dict.fromkeys(book_ids))
+        keys = [("hasPurchased", buyer, book_id) for book_id in book_ids]
+        values = await self._get_many(keys)
+        return dict(zip(book_ids, values))
+
+    async def get_book(self, book_id: int) -> Optional[Dict[str, Any]]:
+        """On-chain Book struct as a dict, or None if the id does not exist"""
+        return (await self._get_many([("getBook", book_id)]))[0]
+
+    async def get_author_books(self, author: str) -> List[int]:
+        """Contract ids of the books created by author"""
+        return (await self._get_many([("getAuthorBooks", checksum(author))]))[0]
+
+    def mark_purchased(self, buyer: str, book_id: int):
+        """Record a purchase already proven by a receipt; ownership is never revoked"""
+        self._store(("hasPurchased", checksum(buyer), book_id), True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "synced_block": self.synced_block
+        }
+
+    # Cache
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or everything when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _get_many(self, keys: List[Hashable]) -> List[Any]:
+        results: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing = []
+        for key in keys:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                results[key] = self._entries[key]
+                self.hits += 1
+            elif key in self._inflight:
+                # Another request is already fetching this key
+                waiting[key] = self._inflight[key]
+            else:
+                missing.append(key)
+        self.misses += len(missing)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            try:
+                fetched = await self._fetch(missing)
+                for key, future in futures.items():
+                    future.set_result(fetched[key])
+                results.update(fetched)
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    # Marked retrieved so an unawaited future does not log a warning
+                    future.exception()
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop(key, None)
+                for future in futures.values():
+                    # Cancelled mid-fetch: waiters see the cancellation
+                    future.cancel()
+
+        for key, future in waiting.items():
+            results[key] = await future
+        return [results[key] for key in keys]
+
+    async def _fetch(self, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        # Pin reads to the synced block so later events are guaranteed to evict them
+        block = self.synced_block
+        block_tag = hex(block) if block is not None else "latest"
+        try:
+            with stage("chain_view_fetch"):
+                replies = await asyncio.gather(*(
+                    self.gateway.make_request(
+                        "eth_call", [{"to": self.contract.address, "data": self._encode(key)}, block_tag]
+                    )
+                    for key in keys
+                ))
+        except RPCUnavailable as e:
+            raise ChainViewError(f"eth_call failed: {str(e)}") from e
+        fetched = {key: self._decode(key, reply) for key, reply in zip(keys, replies)}
+
+        # Only cache if no sync ran meanwhile; its evictions may predate these values
+        if block is not None and block == self.synced_block:
+            for key, value in fetched.items():
+                self._store(key, value)
+        return fetched
+
+    def _encode(self, key: Tuple) -> str:
+        return self.contract.encodeABI(fn_name=key[0], args=list(key[1:]))
+
+    def _decode(self, key: Tuple, reply: Dict[str, Any]) -> Any:
+        name = key[0]
+        if "error" in reply:
+            # getBook reverts for unknown ids; cached until BookCreated evicts it
+            if name == "getBook" and "revert" in str(reply["error"].get("message", "")).lower():
+                return None
+            raise ChainViewError(f"{name}{key[1:]} failed: {reply['error']}")
+
+        fn_abi = self.contract.get_function_by_name(name).abi
+        output_types = [collapse_if_tuple(output) for output in fn_abi["outputs"]]
+        output = self.w3.codec.decode(output_types, bytes.fromhex(reply["result"][2:]))[0]
+        if name == "getBook":
+            fields = [component["name"] for component in fn_abi["outputs"][0]["components"]]
+            return dict(zip(fields, output))
+        if name == "getAuthorBooks":
+            return list(output)
+        return output
+
+    # Invalidation
+
+    def _evict_for_log(self, log):
+        event = self._events.get(bytes(log["topics"][0])) if log["topics"] else None
+        if event is None:
+            return
+        args = event.process_log(log)["args"]
+        book_id = args["bookId"]
+        self._entries.pop(("getBook", book_id), None)
+        if event.event_name == "BookCreated":
+            self._entries.pop(("getAuthorBooks", checksum(args["author"])), None)
+        elif event.event_name == "BookPurchased":
+            self._entries.pop(("hasPurchased", checksum(args["buyer"]), book_id), None)
+
+    async def _fetch_logs(self, from_block: int, to_block: int):
+        return await self.w3.eth.get_logs({
+            "address": self.contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [[to_hex(topic) for topic in self._events]]
+        })
+
+    async def sync(self):
+        """Advance to the chain head, evicting entries changed by new events"""
+        head = await self.w3.eth.block_number
+        if self.synced_block is None or head < self.synced_block or head - self.synced_block > self.max_block_range:
+            # First sync, reorg to a shorter chain, or too far behind to replay
+            self.invalidate()
+        elif head > self.synced_block:
+            logs = await self._fetch_logs(self.synced_block + 1, head)
+            for log in logs:
+                self._evict_for_log(log)
+        self.synced_block = head
+
+    async def _follow(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Chain view sync failed")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self):
+        """Follow new blocks in a background task"""
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        """Stop following blocks"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
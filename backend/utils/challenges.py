@@ -0,0 +1,41 @@
+# utils/challenges.py
+import secrets
+from datetime import datetime, timezone
+from typing import Optional
+
+from utils.shared_state import SharedState
+
+class LoginChallenges:
+    """Single-use, expiring messages a wallet signs to prove it holds its key.
+
+    Each challenge is keyed by (purpose, address, nonce) and removed on first
+    use, so a captured signature cannot be replayed, nor a sign-in signature
+    used for anything else. They live in shared state because the worker that
+    issues a challenge need not be the one that checks it.
+    """
+
+    def __init__(self, app_name: str, state: SharedState, ttl: float = 300.0):
+        self.app_name = app_name
+        self.state = state
+        self.ttl = ttl
+
+    def _key(self, purpose: str, address: str, nonce: str) -> str:
+        return f"challenge:{purpose}:{address.lower()}:{nonce}"
+
+    async def issue(self, address: str, purpose: str = "login", statement: Optional[str] = None) -> dict:
+        """Create a challenge for address; the wallet signs the returned message"""
+        nonce = secrets.token_hex(16)
+        issued_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        message = (
+            f"{statement or f'Sign in to {self.app_name}'}\n\n"
+            f"Address: {address}\n"
+            f"Nonce: {nonce}\n"
+            f"Issued At: {issued_at}"
+        )
+        await self.state.set(self._key(purpose, address, nonce), message, ex=self.ttl)
+        return {"nonce": nonce, "message": message, "expires_in": int(self.ttl)}
+
+    async def consume(self, address: str, nonce: str, purpose: str = "login") -> Optional[str]:
+        """Return and invalidate the challenge message, or None if unknown, expired or for another purpose"""
+        # Atomic, so two workers racing on one signature cannot both accept it
+        return await self.state.getdel(self._key(purpose, address, nonce))
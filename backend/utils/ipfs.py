@@ -1,43 +1,243 @@
 # utils/ipfs.py
-import ipfshttpclient
+import asyncio
+import httpx
+import uuid
 from fastapi import UploadFile, HTTPException
-import io
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+from config import settings
+from utils.ipfs_cache import IPFSCache
+from utils.metrics import stage
+
+class UploadTooLarge(Exception):
+    pass
+
+async def multipart_chunks(
+    file: UploadFile,
+    boundary: str,
+    chunk_size: int,
+    max_size: int
+) -> AsyncIterator[bytes]:
+    """Yield a multipart/form-data body for file one chunk at a time"""
+    filename = (file.filename or "file").replace('"', "%22")
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode()
+
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_size:
+            raise UploadTooLarge(f"File exceeds maximum size of {max_size} bytes")
+        yield chunk
+
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+def _not_found(exc: Exception) -> bool:
+    """True when the daemon itself answered that it has no such content"""
+    # Kubo reports every failure as a 500, so the message tells a missing block from a broken node
+    return isinstance(exc, httpx.HTTPStatusError) and "not found" in exc.response.text.lower()
+
+def _fetch_error(exc: Exception) -> HTTPException:
+    if _not_found(exc):
+        return HTTPException(status_code=404, detail=f"IPFS File not found: {str(exc)}")
+    return HTTPException(status_code=502, detail=f"IPFS unavailable: {str(exc)}")
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.TransportError):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500 and not _not_found(exc)
 
 class IPFSManager:
-    def __init__(self, ipfs_url="http://127.0.0.1:5001"):
-        self.ipfs_url = ipfs_url
-        self._client = None
+    """Async IPFS HTTP API client sharing one pooled connection set"""
+
+    def __init__(
+        self,
+        ipfs_url="http://127.0.0.1:5001",
+        max_upload_size: int = 200 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        max_concurrency: int = 16,
+        max_streams: int = 64,
+        cache: Optional[IPFSCache] = None
+    ):
+        self.ipfs_url = ipfs_url.rstrip("/")
+        self.max_upload_size = max_upload_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.max_streams = max_streams
+        self.cache = cache
+        self._http: Optional[httpx.AsyncClient] = None
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._stream_limit: Optional[asyncio.Semaphore] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            # Room for every limited request and stream, so neither waits on the other's connections
+            connections = self.max_concurrency + self.max_streams
+            self._http = httpx.AsyncClient(
+                base_url=f"{self.ipfs_url}/api/v0",
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+            )
+        return self._http
 
     @property
-    def client(self):
-        if not self._client:
+    def limit(self) -> asyncio.Semaphore:
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        return self._limit
+
+    @property
+    def stream_limit(self) -> asyncio.Semaphore:
+        """Bounds open cat() bodies, which last as long as the slowest reader"""
+        if self._stream_limit is None:
+            self._stream_limit = asyncio.Semaphore(self.max_streams)
+        return self._stream_limit
+
+    async def aclose(self):
+        """Close the pooled HTTP connections"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _backoff(self, attempt: int):
+        await asyncio.sleep(min(0.2 * 2 ** attempt, 2.0))
+
+    async def _call(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """POST to an API endpoint with retries and return the JSON body"""
+        with stage(f"ipfs{endpoint.replace('/', '_')}"):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self.limit:
+                        response = await self.http.post(endpoint, params=params)
+                        response.raise_for_status()
+                        return response.json()
+                except Exception as e:
+                    if attempt == self.max_retries or not _retryable(e):
+                        raise
+                await self._backoff(attempt)
+
+    async def add(self, file: UploadFile) -> str:
+        """Stream file to /api/v0/add with chunked transfer and return its CID.
+
+        The client's timeouts apply to each chunk written and to the wait for
+        the response, so a stalled daemon frees its concurrency slot instead
+        of holding it for good.
+        """
+        for attempt in range(self.max_retries + 1):
+            boundary = uuid.uuid4().hex
             try:
-                self._client = ipfshttpclient.connect(self.ipfs_url)
+                async with self.limit:
+                    response = await self.http.post(
+                        "/add",
+                        content=multipart_chunks(file, boundary, self.chunk_size, self.max_upload_size),
+                        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+                    )
+                    response.raise_for_status()
+                    return response.json()['Hash']
             except Exception as e:
-                raise HTTPException(status_code=500, detail=f"IPFS Connection failed: {str(e)}")
-        return self._client
+                if attempt == self.max_retries or not _retryable(e):
+                    raise
+                # Adding the same bytes again yields the same CID, so the body is replayed from the start
+                await file.seek(0)
+            await self._backoff(attempt)
+
+    async def cat(
+        self,
+        ipfs_hash: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream file contents, optionally a byte range, from /api/v0/cat"""
+        params: Dict[str, Any] = {"arg": ipfs_hash}
+        if offset:
+            params["offset"] = offset
+        if length is not None:
+            params["length"] = length
+
+        # Apart from self.limit: slow downloads must not hold up uploads and stat calls
+        async with self.stream_limit:
+            # Timed to the response headers; the body streams at the client's pace
+            with stage("ipfs_cat"):
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        request = self.http.build_request("POST", "/cat", params=params)
+                        response = await self.http.send(request, stream=True)
+                        if response.is_error:
+                            await response.aread()
+                            response.raise_for_status()
+                        break
+                    except Exception as e:
+                        if attempt == self.max_retries or not _retryable(e):
+                            raise
+                    await self._backoff(attempt)
+
+            try:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    yield chunk
+            finally:
+                await response.aclose()
+
+    async def pin(self, ipfs_hash: str) -> Dict[str, Any]:
+        """Pin a CID on the connected node"""
+        return await self._call("/pin/add", {"arg": ipfs_hash})
+
+    async def stat(self, ipfs_hash: str) -> Dict[str, Any]:
+        """Return size and type information for a CID"""
+        return await self._call("/files/stat", {"arg": f"/ipfs/{ipfs_hash}"})
 
     async def upload_file(self, file: UploadFile) -> str:
         """Upload file to IPFS and return hash"""
         try:
-            contents = await file.read()
-            file_obj = io.BytesIO(contents)
-            result = self.client.add(file_obj)
-            return result['Hash']
+            with stage("ipfs_add"):
+                return await self.add(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"IPFS Upload failed: {str(e)}")
         finally:
             await file.close()
 
-    def get_file(self, ipfs_hash: str) -> bytes:
+    async def get_cached_path(self, ipfs_hash: str) -> Path:
+        """Return a local copy of a CID, fetching it into the cache on a miss"""
+        try:
+            return await self.cache.fetch(ipfs_hash, lambda: self.cat(ipfs_hash))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise _fetch_error(e)
+
+    async def get_file(self, ipfs_hash: str) -> bytes:
         """Retrieve file from IPFS using hash"""
+        if self.cache is not None:
+            path = await self.get_cached_path(ipfs_hash)
+            return await asyncio.to_thread(path.read_bytes)
         try:
-            return self.client.cat(ipfs_hash)
+            return b"".join([chunk async for chunk in self.cat(ipfs_hash)])
         except Exception as e:
-            raise HTTPException(status_code=404, detail=f"IPFS File not found: {str(e)}")
+            raise _fetch_error(e)
 
     def get_gateway_url(self, ipfs_hash: str) -> str:
         """Get public gateway URL for IPFS hash"""
         return f"http://localhost:8080/ipfs/{ipfs_hash}"
 
-ipfs = IPFSManager()
\ No newline at end of file
+ipfs = IPFSManager(
+    settings.IPFS_API_URL,
+    max_upload_size=settings.IPFS_MAX_UPLOAD_SIZE,
+    chunk_size=settings.IPFS_UPLOAD_CHUNK_SIZE,
+    timeout=settings.IPFS_TIMEOUT,
+    max_retries=settings.IPFS_MAX_RETRIES,
+    max_concurrency=settings.IPFS_MAX_CONCURRENCY,
+    max_streams=settings.IPFS_MAX_STREAMS,
+    cache=IPFSCache(settings.IPFS_CACHE_DIR, settings.IPFS_CACHE_MAX_SIZE, workers=settings.WORKERS)
+)
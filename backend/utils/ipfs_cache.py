@@ -0,0 +1,217 @@
+# utils/ipfs_cache.py
+import asyncio
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict
+
+from utils.metrics import registry
+
+CID_PATTERN = re.compile(r"^[A-Za-z0-9]{1,128}$")
+
+CACHE_LOOKUPS = registry.counter("ipfs_cache_lookups_total", "IPFS cache lookups by result", ["result"])
+CACHE_EVICTIONS = registry.counter("ipfs_cache_evictions_total", "Files evicted from the IPFS cache")
+CACHE_BYTES = registry.gauge("ipfs_cache_size_bytes", "Bytes of IPFS files in the on-disk cache")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Running as another user
+    return True
+
+class IPFSCache:
+    """On-disk content-addressed cache of IPFS files with size-bounded LRU eviction.
+
+    The index lives in process memory, so with several workers each one keeps
+    its own directory under root and a 1/workers share of max_bytes; a worker
+    never deletes files another has indexed.
+    """
+
+    def __init__(self, root: str, max_bytes: int, workers: int = 1):
+        self.base = Path(root)
+        self.root = self.base
+        self.workers = max(workers, 1)
+        self.max_bytes = max_bytes // self.workers
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        CACHE_BYTES.add_source(self._size_sample)
+
+    def _size_sample(self):
+        yield {}, self._size
+
+    def _path(self, cid: str) -> Path:
+        if not CID_PATTERN.match(cid):
+            raise ValueError(f"Invalid CID: {cid}")
+        return self.root / cid[-2:] / cid
+
+    def _load(self):
+        """Index files left by a previous run, least recently used first"""
+        if self._loaded:
+            return
+        # preload() may be scanning on a worker thread while a request arrives
+        with self._load_lock:
+            if self._loaded:
+                return
+            self.root = self._claim_root() if self.workers > 1 else self.base
+            self.root.mkdir(parents=True, exist_ok=True)
+            found = []
+            for path in self.root.glob("*/*"):
+                if path.is_file() and CID_PATTERN.match(path.name):
+                    stat = path.stat()
+                    found.append((stat.st_atime, path.name, stat.st_size))
+            for _, cid, size in sorted(found):
+                self._entries[cid] = size
+                self._size += size
+            self._evict()
+            self._loaded = True
+
+    def _claim_root(self) -> Path:
+        """This worker's directory, adopting one a stopped worker left behind"""
+        own = self.base / f"worker-{os.getpid()}"
+        if own.exists():
+            return own
+        self.base.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.base.glob("worker-*")):
+            pid = path.name[len("worker-"):]
+            if not pid.isdigit() or _alive(int(pid)):
+                continue
+            try:
+                # Atomic: of several restarted workers, exactly one adopts each directory
+                path.rename(own)
+                return own
+            except OSError:
+                continue
+        return own
+
+    def preload(self):
+        """Index the cache directory now instead of on first use; blocking"""
+        self._load()
+
+    def _evict(self):
+        # The most recent entry always survives so the caller can still serve it
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            cid, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            CACHE_EVICTIONS.inc()
+            try:
+                self._path(cid).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, cid: str):
+        """Return the cached path for cid and mark it recently used, or None; counted as a hit or miss"""
+        path = self._lookup(cid)
+        if path is not None:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+        else:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+        return path
+
+    def _lookup(self, cid: str):
+        self._load()
+        if cid not in self._entries:
+            return None
+        path = self._path(cid)
+        if not path.exists():
+            self._size -= self._entries.pop(cid)
+            return None
+        self._entries.move_to_end(cid)
+        return path
+
+    async def fetch(self, cid: str, source: Callable[[], AsyncIterator[bytes]]) -> Path:
+        """Return a local path for cid, downloading it from source on a miss"""
+        path = self.get(cid)
+        if path is not None:
+            return path
+
+        # Single-flight: concurrent misses for one CID share a download
+        lock = self._locks.setdefault(cid, asyncio.Lock())
+        async with lock:
+            path = self._lookup(cid)
+            if path is not None:
+                return path
+            try:
+                path = await self._download(cid, source)
+            finally:
+                self._locks.pop(cid, None)
+        return path
+
+    @asynccontextmanager
+    async def _writer(self, cid: str):
+        """Yield an async write(chunk); the file is published under cid only if the block completes"""
+        path = self._path(cid)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                async def write(chunk: bytes):
+                    nonlocal size
+                    await asyncio.to_thread(handle.write, chunk)
+                    size += len(chunk)
+
+                yield write
+                await asyncio.to_thread(os.fsync, handle.fileno())
+            # Atomic publish: readers only ever see complete files
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+        # A concurrent fill of the same CID may have published it first
+        self._size += size - self._entries.pop(cid, 0)
+        self._entries[cid] = size
+        self._evict()
+
+    async def _download(self, cid: str, source: Callable[[], AsyncIterator[bytes]]) -> Path:
+        async with self._writer(cid) as write:
+            async for chunk in source():
+                await write(chunk)
+        return self._path(cid)
+
+    async def tee(self, cid: str, source: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass source through, caching it as cid if it is read to the end.
+
+        For a miss already counted by get(); the fill is not counted again.
+        """
+        self._load()
+        try:
+            async with self._writer(cid) as write:
+                async for chunk in source:
+                    await write(chunk)
+                    yield chunk
+        finally:
+            # A reader that stops early leaves source mid-stream
+            await source.aclose()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,326 @@
+# utils/metrics.py
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Statement kinds reported by name; anything else is OTHER to bound label cardinality
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"}
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples()
+        ]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values]
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from sources at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), source: Optional[Callable[[], Iterable]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._sources: List[Callable[[], Optional[Callable]]] = []
+        self._values: Dict[Tuple, float] = {}
+        if source is not None:
+            self.add_source(source)
+
+    def add_source(self, source: Callable[[], Iterable]):
+        """Read (labels dict, value) pairs from source() on every scrape.
+
+        Bound methods are held weakly, so a collected owner stops reporting.
+        """
+        if hasattr(source, "__self__"):
+            self._sources.append(weakref.WeakMethod(source))
+        else:
+            self._sources.append(lambda: source)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for ref in list(self._sources):
+            source = ref()
+            if source is None:
+                self._sources.remove(ref)
+                continue
+            for labels, value in source():
+                values[self._key(labels)] = value
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in values.items() if v is not None
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: [count per bucket (non-cumulative)..., sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, whether or not it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), source=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, source))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+STAGE_LATENCY = registry.histogram(
+    "stage_duration_seconds", "Time spent in one stage of a request (IPFS, web3 or database work)", ["stage"]
+)
+STAGE_ERRORS = registry.counter("stage_errors_total", "Stages that raised", ["stage"])
+RPC_REQUESTS = registry.counter("rpc_requests_total", "JSON-RPC calls made to the Ethereum node", ["method"])
+RPC_ERRORS = registry.counter("rpc_errors_total", "JSON-RPC calls that failed or returned an error", ["method"])
+RPC_LATENCY = registry.histogram("rpc_duration_seconds", "JSON-RPC round trip time", ["method"])
+RPC_COALESCED = registry.counter(
+    "rpc_coalesced_total", "Calls answered by an identical request already in flight", ["method"]
+)
+DB_QUERY_LATENCY = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["engine", "operation"]
+)
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of request handling; usable around sync or awaited code.
+
+        with stage("ipfs_add"):
+            cid = await ipfs.add(file)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=name)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware observing latency per route template, streamed bodies included"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in scope; unmatched paths share one label
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
+
+def record_rpc(method: str, seconds: float, calls: int = 1, errors: int = 0):
+    """Account for RPCs made outside web3, such as raw JSON-RPC batches"""
+    RPC_REQUESTS.inc(calls, method=method)
+    if errors:
+        RPC_ERRORS.inc(errors, method=method)
+    RPC_LATENCY.observe(seconds, method=method)
+
+def rpc_metrics_middleware(make_request, w3):
+    """web3 middleware counting and timing every request sent to the provider"""
+    def middleware(method, params):
+        start = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            record_rpc(method, time.perf_counter() - start, errors=1)
+            raise
+        record_rpc(method, time.perf_counter() - start, errors=int("error" in response))
+        return response
+    return middleware
+
+def instrument_web3(w3):
+    """Install rpc_metrics_middleware innermost, next to the provider; idempotent"""
+    if "metrics" not in w3.middleware_onion:
+        w3.middleware_onion.inject(rpc_metrics_middleware, "metrics", layer=0)
+    return w3
+
+# Database
+
+_engine_names: Dict[Engine, str] = {}
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_QUERY_LATENCY.observe(
+        time.perf_counter() - started.pop(),
+        engine=_engine_names.get(conn.engine, "default"),
+        operation=operation if operation in SQL_OPERATIONS else "OTHER"
+    )
+
+def _handle_error(context):
+    started = context.connection.info.get("metrics_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def _pool_stats() -> Iterable:
+    for engine, name in list(_engine_names.items()):
+        pool = engine.pool
+        # Only queue pools track these; SingletonThreadPool/NullPool report nothing
+        for stat in ("size", "checkedin", "checkedout", "overflow"):
+            reader = getattr(pool, stat, None)
+            if reader is not None:
+                # overflow() counts up from -size until the pool is full
+                yield {"engine": name, "state": stat}, max(reader(), 0)
+
+DB_POOL = registry.gauge(
+    "db_pool_connections", "Connection pool state per engine", ["engine", "state"], source=_pool_stats
+)
+
+def instrument_engine(engine: Engine, name: str):
+    """Time statements on engine and report its pool under name; idempotent"""
+    _engine_names[engine] = name
+    if not event.contains(engine, "before_cursor_execute", _before_execute):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+        event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,122 @@
+# utils/nonce.py
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional, Set, Tuple
+
+from web3 import AsyncWeb3, Web3
+
+from utils.metrics import stage
+from utils.shared_state import SharedState
+from utils.transactions import BroadcastOutcomeUnknown
+
+logger = logging.getLogger(__name__)
+
+class NonceManager:
+    """Nonce allocator keyed by sender address, shared by every worker through state.
+
+    Each sender's counter and released gaps are one JSON value, read and
+    written under a per-sender lock. After ttl idle seconds the value lapses
+    and the next allocation reloads it from the node.
+    """
+
+    def __init__(self, w3: AsyncWeb3, state: SharedState, ttl: float = 600.0, lock_timeout: float = 30.0):
+        self.w3 = w3
+        self.state = state
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def _lock(self, address: str):
+        return self.state.lock(f"nonce:{address.lower()}", timeout=self.lock_timeout)
+
+    async def _load(self, address: str) -> Tuple[Optional[int], Set[int]]:
+        raw = await self.state.get(f"nonce:{address.lower()}")
+        if raw is None:
+            return None, set()
+        data = json.loads(raw)
+        return data["next"], set(data["released"])
+
+    async def _save(self, address: str, next_nonce: int, released: Set[int]):
+        value = json.dumps({"next": next_nonce, "released": sorted(released)})
+        await self.state.set(f"nonce:{address.lower()}", value, ex=self.ttl)
+
+    async def _pending_count(self, address: str) -> int:
+        with stage("nonce_fetch"):
+            return await self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), "pending")
+
+    async def allocate(self, address: str) -> int:
+        """Return the next nonce for address, reusing released gaps first"""
+        async with self._lock(address):
+            next_nonce, released = await self._load(address)
+            if next_nonce is None:
+                next_nonce = await self._pending_count(address)
+            if released:
+                nonce = min(released)
+                released.discard(nonce)
+            else:
+                nonce = next_nonce
+                next_nonce += 1
+            await self._save(address, next_nonce, released)
+            return nonce
+
+    async def release(self, address: str, nonce: int):
+        """Hand back a nonce whose transaction was never broadcast"""
+        async with self._lock(address):
+            next_nonce, released = await self._load(address)
+            if next_nonce is None:
+                return
+            if nonce == next_nonce - 1:
+                next_nonce = nonce
+                # Collapse any released nonces now sitting at the top of the range
+                while next_nonce - 1 in released:
+                    next_nonce -= 1
+                    released.discard(next_nonce)
+            elif nonce < next_nonce:
+                released.add(nonce)
+            await self._save(address, next_nonce, released)
+
+    async def resync(self, address: str):
+        """Reload the counter from the node's pending transaction count"""
+        async with self._lock(address):
+            next_nonce, released = await self._load(address)
+            chain_nonce = await self._pending_count(address)
+            if next_nonce is None or chain_nonce > next_nonce:
+                next_nonce = chain_nonce
+            # Released nonces the node already counts were used elsewhere
+            released = {n for n in released if n >= chain_nonce}
+            await self._save(address, next_nonce, released)
+
+    async def settle(self, address: str, nonce: int):
+        """Resync after a broadcast with an unknown outcome, releasing nonce if the node lacks it"""
+        async with self._lock(address):
+            next_nonce, released = await self._load(address)
+            chain_nonce = await self._pending_count(address)
+            if next_nonce is None or chain_nonce > next_nonce:
+                next_nonce = chain_nonce
+            released = {n for n in released if n >= chain_nonce}
+            await self._save(address, next_nonce, released)
+        # The pending count stops at the first nonce the node has no transaction for
+        if nonce >= chain_nonce:
+            await self.release(address, nonce)
+
+    @asynccontextmanager
+    async def reserve(self, address: str):
+        """Allocate a nonce, releasing it if the body fails before broadcasting.
+
+        After BroadcastOutcomeUnknown the nonce is only reused once the node's
+        pending count shows no transaction holds it; if the node cannot be asked,
+        it stays allocated until the counter lapses and is reloaded.
+        """
+        nonce = await self.allocate(address)
+        try:
+            yield nonce
+        except BroadcastOutcomeUnknown:
+            try:
+                await self.settle(address, nonce)
+            except Exception:
+                logger.warning("Could not settle nonce %s of %s after a failed broadcast", nonce, address)
+            raise
+        except Exception:
+            await self.release(address, nonce)
+            await self.resync(address)
+            raise
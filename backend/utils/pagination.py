@@ -0,0 +1,39 @@
+# utils/pagination.py
+import base64
+import json
+from typing import Optional, Tuple, TypeVar
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import Query, aliased
+
+Q = TypeVar("Q", Query, Select)
+
+def encode_cursor(last_id: int, page: int) -> str:
+    """Opaque cursor pointing just past the row with last_id"""
+    raw = json.dumps({"id": last_id, "page": page}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[int], int]:
+    """Return (last_id, page) for a cursor, or (None, 1) for the first page"""
+    if not cursor:
+        return None, 1
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        return int(data["id"]), int(data["page"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def keyset_after(query: Q, model, last_id: Optional[int]) -> Q:
+    """Order newest first on (created_at, id) and skip rows up to last_id.
+
+    The cursor row's sort key is read back with a row-value subquery rather
+    than round-tripped through the cursor, so timestamp precision and time
+    zone handling stay entirely inside the database.
+    """
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if last_id is None:
+        return query
+    anchor = aliased(model)
+    boundary = select(anchor.created_at, anchor.id).where(anchor.id == last_id).scalar_subquery()
+    return query.where(tuple_(model.created_at, model.id) < boundary)
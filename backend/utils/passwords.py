@@ -0,0 +1,49 @@
+# utils/passwords.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from config import settings
+
+class PasswordPoolSaturated(Exception):
+    pass
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a bounded worker pool.
+
+    bcrypt releases the GIL, so a thread pool keeps the event loop free while
+    hashes run in parallel. Once max_pending calls are queued or running,
+    further calls fail fast with PasswordPoolSaturated instead of queueing.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, max_pending: int = 64):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            raise PasswordPoolSaturated("Password hashing pool is saturated")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash password off the event loop"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify password against hash off the event loop"""
+        return await self._run(self.context.verify, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
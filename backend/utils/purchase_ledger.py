@@ -0,0 +1,355 @@
+# utils/purchase_ledger.py
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from config import settings
+from database import SessionLocal
+from utils.metrics import registry, stage
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scans for journal segments left by a worker that exited
+RECOVER_INTERVAL = 60.0
+
+LEDGER_PENDING = registry.gauge(
+    "purchase_ledger_pending", "Verified purchases journaled but not yet inserted into the database"
+)
+
+@dataclass
+class PendingPurchase:
+    book_id: int
+    buyer_id: int
+    transaction_hash: str
+    purchase_price: float
+    created_at: datetime
+
+    def to_json(self) -> str:
+        return json.dumps(dict(asdict(self), created_at=self.created_at.isoformat()))
+
+    @classmethod
+    def from_json(cls, line: str) -> "PendingPurchase":
+        data = json.loads(line)
+        return cls(**dict(data, created_at=datetime.fromisoformat(data["created_at"])))
+
+class _Segment:
+    """One journal file, exclusively flock'ed by its writer until its rows are in the database"""
+
+    def __init__(self, path: Path, fd: int):
+        self.path = path
+        self.fd = fd
+        self.entries: List[PendingPurchase] = []
+
+    @classmethod
+    def create(cls, directory: Path) -> "_Segment":
+        # Locked under a temporary name first, so recovery never claims a live segment
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f"{uuid.uuid4().hex}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        path = tmp.with_suffix(".journal")
+        os.replace(tmp, path)
+        return cls(path, fd)
+
+    def append(self, lines: str, fsync: bool):
+        os.write(self.fd, lines.encode())
+        if fsync:
+            os.fsync(self.fd)
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        os.close(self.fd)
+
+def insert_purchases(db: Session, entries: Iterable[PendingPurchase], batch_size: int = 500) -> int:
+    """Multi-row INSERT of entries, skipping any already recorded; returns rows inserted"""
+    rows = [
+        dict(asdict(entry), status=models.PurchaseStatus.COMPLETED)
+        for entry in entries
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if insert is not None:
+            # The indexer, another worker or a replayed journal may have recorded some already
+            result = db.execute(insert(models.Purchase).values(batch).on_conflict_do_nothing())
+            inserted += result.rowcount
+            continue
+        for row in batch:
+            try:
+                with db.begin_nested():
+                    db.add(models.Purchase(**row))
+                inserted += 1
+            except IntegrityError:
+                pass
+    return inserted
+
+class PurchaseLedger:
+    """Write-behind recorder of verified purchases.
+
+    record() appends the purchase to a local journal and returns once it is on
+    disk; appends arriving while one is being written share the next write and
+    fsync. Every flush_interval seconds the journal segment is sealed and its
+    purchases inserted with batched multi-row INSERTs, one transaction per
+    segment, then the segment is deleted. A segment the database rejects is
+    retried row by row, and rows rejected on their own (a book or buyer that no
+    longer exists) move to dead_letter.jsonl rather than blocking later flushes.
+    Segments left by a crashed worker are replayed by whichever worker next
+    scans the directory. Until flushed, purchases are visible to this worker
+    through pending() and pending_for().
+    """
+
+    def __init__(
+        self,
+        journal_dir: str,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: float = 0.2,
+        batch_size: int = 500,
+        fsync: bool = True
+    ):
+        self.journal_dir = Path(journal_dir)
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._segment: Optional[_Segment] = None
+        self._sealed: List[_Segment] = []
+        self._by_tx: Dict[str, PendingPurchase] = {}
+        self._by_owner: Dict[Tuple[int, int], PendingPurchase] = {}
+        self._queue: List[Tuple[PendingPurchase, asyncio.Future]] = []
+        self._writing = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.batches = 0
+        self.dead_lettered = 0
+        LEDGER_PENDING.add_source(self._pending_sample)
+
+    def _pending_sample(self):
+        yield {}, len(self._by_tx)
+
+    # Reads
+
+    def pending(self, transaction_hash: str) -> Optional[PendingPurchase]:
+        return self._by_tx.get(transaction_hash)
+
+    def pending_for(self, buyer_id: int, book_id: Optional[int] = None) -> List[PendingPurchase]:
+        """Unflushed purchases by buyer, optionally of one book, newest first"""
+        if book_id is not None:
+            entry = self._by_owner.get((book_id, buyer_id))
+            return [entry] if entry else []
+        entries = [entry for entry in self._by_tx.values() if entry.buyer_id == buyer_id]
+        return sorted(entries, key=lambda entry: entry.created_at, reverse=True)
+
+    # Writes
+
+    async def record(self, entry: PendingPurchase):
+        """Journal a verified purchase; returns once it is durable"""
+        # Visible at once, so a concurrent retry is answered instead of queued twice
+        self._by_tx[entry.transaction_hash] = entry
+        self._by_owner[(entry.book_id, entry.buyer_id)] = entry
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((entry, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+        try:
+            await asyncio.shield(future)
+        except Exception:
+            self._forget([entry])
+            raise
+
+    async def _write(self):
+        # Drains the queue; whatever arrives during one append goes out in the next
+        while self._queue:
+            batch, self._queue = self._queue, []
+            try:
+                async with self._writing:
+                    if self._segment is None:
+                        self._segment = await asyncio.to_thread(_Segment.create, self.journal_dir)
+                    segment = self._segment
+                    lines = "".join(entry.to_json() + "\n" for entry, _ in batch)
+                    with stage("journal_append"):
+                        await asyncio.to_thread(segment.append, lines, self.fsync)
+                    segment.entries.extend(entry for entry, _ in batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _forget(self, entries: Iterable[PendingPurchase]):
+        for entry in entries:
+            if self._by_tx.get(entry.transaction_hash) is entry:
+                del self._by_tx[entry.transaction_hash]
+            if self._by_owner.get((entry.book_id, entry.buyer_id)) is entry:
+                del self._by_owner[(entry.book_id, entry.buyer_id)]
+
+    def _insert(self, entries: List[PendingPurchase]) -> int:
+        """Insert one segment's entries, dead-lettering rows the database rejects; blocking.
+
+        Returns the number of entries dead-lettered. Other errors (the database
+        being unreachable) propagate, leaving the segment to be retried.
+        """
+        db = self.session_factory()
+        try:
+            try:
+                insert_purchases(db, entries, self.batch_size)
+                db.commit()
+                return 0
+            except IntegrityError:
+                db.rollback()
+
+            # Find the offending rows without holding back the rest
+            rejected = []
+            for entry in entries:
+                try:
+                    insert_purchases(db, [entry])
+                    db.commit()
+                except IntegrityError as e:
+                    db.rollback()
+                    rejected.append((entry, str(e.orig)))
+            self._dead_letter(rejected)
+            return len(rejected)
+        finally:
+            db.close()
+
+    def _dead_letter(self, rejected: List[Tuple[PendingPurchase, str]]):
+        if not rejected:
+            return
+        lines = "".join(
+            json.dumps(dict(json.loads(entry.to_json()), error=error)) + "\n"
+            for entry, error in rejected
+        )
+        path = self.journal_dir / "dead_letter.jsonl"
+        with open(path, "a") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.dead_lettered += len(rejected)
+        logger.error("Moved %s rejected purchases to %s", len(rejected), path)
+
+    async def flush(self):
+        """Seal the current segment and insert every sealed segment's purchases"""
+        async with self._writing:
+            if self._segment is not None and self._segment.entries:
+                self._sealed.append(self._segment)
+                self._segment = None
+        # Oldest first; a segment that cannot be inserted stops the pass and is retried
+        for segment in list(self._sealed):
+            with stage("purchase_flush"):
+                rejected = await asyncio.to_thread(self._insert, segment.entries)
+            await asyncio.to_thread(segment.remove)
+            self._sealed.remove(segment)
+            self._forget(segment.entries)
+            self.flushed += len(segment.entries) - rejected
+            self.batches += 1
+
+    # Recovery
+
+    def recover(self) -> int:
+        """Replay segments whose writer is gone; blocking. Returns purchases replayed."""
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        replayed = 0
+        for path in sorted(self.journal_dir.glob("*.journal")):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Another live worker's segment
+                with open(fd, closefd=False) as f:
+                    # A crash mid-append leaves at most one partial last line
+                    entries = [PendingPurchase.from_json(line) for line in f if line.endswith("\n")]
+                if entries:
+                    self._insert(entries)
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                replayed += len(entries)
+            finally:
+                os.close(fd)
+        if replayed:
+            logger.info("Replayed %s journaled purchases", replayed)
+        return replayed
+
+    # Lifecycle
+
+    async def _follow(self):
+        recovered_at = None
+        while True:
+            try:
+                # Also picks up segments of a worker that died while this one ran
+                if recovered_at is None or time.monotonic() - recovered_at >= RECOVER_INTERVAL:
+                    await asyncio.to_thread(self.recover)
+                    recovered_at = time.monotonic()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The segments stay on disk and in memory; the next pass retries them
+                logger.exception("Purchase flush failed")
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        """Replay orphaned segments, then flush on an interval from a background task"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            await asyncio.gather(self._writer, return_exceptions=True)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final purchase flush failed; the journal is replayed at next start")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._by_tx),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dead_lettered": self.dead_lettered
+        }
+
+purchase_ledger = PurchaseLedger(
+    settings.PURCHASE_JOURNAL_DIR,
+    flush_interval=settings.PURCHASE_FLUSH_INTERVAL,
+    batch_size=settings.PURCHASE_FLUSH_BATCH_SIZE,
+    fsync=settings.PURCHASE_JOURNAL_FSYNC
+)
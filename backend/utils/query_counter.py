@@ -0,0 +1,44 @@
+# utils/query_counter.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_active: ContextVar[Optional["QueryCounter"]] = ContextVar("query_counter", default=None)
+
+class QueryCounter:
+    """Records the SQL statements executed while it is active"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@contextmanager
+def count_queries():
+    """Count statements issued in this context, including threads it spawns.
+
+        with count_queries() as counter:
+            client.get("/purchases")
+        assert counter.count == 2
+    """
+    counter = QueryCounter()
+    token = _active.set(counter)
+    try:
+        yield counter
+    finally:
+        _active.reset(token)
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    counter = _active.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+def instrument(engine: Engine):
+    """Attach the counting hook to engine; idempotent"""
+    if not event.contains(engine, "before_cursor_execute", _record):
+        event.listen(engine, "before_cursor_execute", _record)
@@ -0,0 +1,52 @@
+# utils/receipts.py
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from eth_utils import from_wei, to_checksum_address
+
+from utils.metrics import stage
+
+def normalize_tx_hash(tx_hash: str) -> str:
+    """Lowercase, 0x-prefixed form used as the cache and database key"""
+    tx_hash = tx_hash.strip().lower()
+    return tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}"
+
+class ReceiptCache:
+    """Bounded LRU of decoded BookPurchased events per mined transaction.
+
+    Receipts of mined transactions do not change, so each hash is decoded once;
+    a reverted transaction is cached as an empty event list.
+    """
+
+    def __init__(self, contract, max_entries: int = 10000):
+        self.contract = contract
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, tx_hash: str) -> Optional[List[Dict[str, Any]]]:
+        events = self._entries.get(tx_hash)
+        if events is not None:
+            self._entries.move_to_end(tx_hash)
+        return events
+
+    def add_receipt(self, tx_hash: str, receipt) -> List[Dict[str, Any]]:
+        """Decode BookPurchased logs from receipt and cache them under tx_hash"""
+        # Imported here so this module (and normalize_tx_hash) stays free of web3
+        from web3.logs import DISCARD
+
+        events = []
+        with stage("event_decode"):
+            if receipt["status"]:
+                for event in self.contract.events.BookPurchased().process_receipt(receipt, errors=DISCARD):
+                    events.append({
+                        "book_id": event["args"]["bookId"],
+                        "buyer": to_checksum_address(event["args"]["buyer"]),
+                        "author": to_checksum_address(event["args"]["author"]),
+                        "price": float(from_wei(event["args"]["price"], "ether")),
+                        "block_number": receipt["blockNumber"]
+                    })
+        self._entries[tx_hash] = events
+        self._entries.move_to_end(tx_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return events
@@ -0,0 +1,238 @@
+# utils/rpc_gateway.py
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from utils.metrics import RPC_COALESCED, record_rpc, registry
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_UP = registry.gauge("rpc_endpoint_up", "Whether an RPC endpoint is in rotation", ["endpoint"])
+
+# Writes are never merged: each caller must see its own broadcast attempt
+UNCOALESCED_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+# Fixed for the life of the chain; web3 asks for the chain id before every transaction
+CONSTANT_METHODS = {"eth_chainId", "net_version"}
+
+class RPCUnavailable(Exception):
+    """Every endpoint failed at the transport level"""
+
+def _json_default(value):
+    # What web3's formatters leave in params: HexBytes and AttributeDicts
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+@dataclass
+class Endpoint:
+    url: str
+    failures: int = 0
+    open_until: float = 0.0
+    latency: Optional[float] = None  # Exponentially weighted round trip, seconds
+
+    @property
+    def label(self) -> str:
+        # Host and port only: provider URLs often embed an API key in the path
+        parsed = urlparse(self.url)
+        if not parsed.hostname:
+            return self.url
+        return f"{parsed.hostname}:{parsed.port}" if parsed.port else parsed.hostname
+
+    def available(self, now: float) -> bool:
+        return self.open_until <= now
+
+class RPCGateway:
+    """The one path to the Ethereum node(s) for this worker.
+
+    Concurrent identical reads share one in-flight request. Everything sent
+    within batch_window seconds goes out as a single JSON-RPC batch over a
+    pooled keep-alive connection. Endpoints are tried in the configured order,
+    skipping any that failed failure_threshold times in a row until cooldown
+    seconds have passed; the next request after that probes it again.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        timeout: float = 10.0,
+        max_connections: int = 20,
+        batch_size: int = 100,
+        batch_window: float = 0.002,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0
+    ):
+        if not urls:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._ids = itertools.count(1)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._constants: Dict[str, Dict[str, Any]] = {}
+        self._queue: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+        ENDPOINT_UP.add_source(self._up_samples)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                headers={"Content-Type": "application/json"}
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # Requests
+
+    async def make_request(self, method: str, params: Any) -> Dict[str, Any]:
+        """JSON-RPC reply for one call; errors are returned in the reply, not raised"""
+        params = params if params is not None else []
+        if method in UNCOALESCED_METHODS:
+            return await self._enqueue(method, params)
+        if method in self._constants:
+            return self._constants[method]
+
+        key = (method, json.dumps(params, default=_json_default, sort_keys=True))
+        pending = self._inflight.get(key)
+        if pending is not None:
+            RPC_COALESCED.inc(method=method)
+            return await asyncio.shield(pending)
+
+        future = asyncio.ensure_future(self._enqueue(method, params))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one cancelled caller does not fail the others sharing the call
+        reply = await asyncio.shield(future)
+        if method in CONSTANT_METHODS and "result" in reply:
+            self._constants[method] = reply
+        return reply
+
+    def _enqueue(self, method: str, params: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        self._queue.append((request, future))
+        if len(self._queue) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            # Held until done so the task is not garbage collected mid-flight
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        requests = [request for request, _ in batch]
+        started = time.perf_counter()
+        try:
+            # A lone call goes out unwrapped; not every node accepts batches of one
+            replies = await self._post(requests if len(requests) > 1 else requests[0])
+        except Exception as e:
+            for request, future in batch:
+                record_rpc(request["method"], time.perf_counter() - started, errors=1)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        if not isinstance(replies, list):
+            if not isinstance(replies, dict):
+                replies = {"error": {"code": -32603, "message": f"Malformed reply: {replies!r}"}}
+            # The lone request's reply, or the node rejecting the batch as a whole
+            replies = [dict(replies, id=request["id"]) for request in requests]
+        by_id = {reply.get("id"): reply for reply in replies if isinstance(reply, dict)}
+        for request, future in batch:
+            reply = by_id.get(request["id"]) or {
+                "jsonrpc": "2.0", "id": request["id"], "error": {"code": -32603, "message": "No reply in batch"}
+            }
+            record_rpc(request["method"], elapsed, errors=int("error" in reply))
+            if not future.done():
+                future.set_result(reply)
+
+    # Endpoints
+
+    def _ranked(self) -> List[Endpoint]:
+        """Endpoints in rotation in configured order, then the rest by how soon they return"""
+        now = time.monotonic()
+        available = [e for e in self.endpoints if e.available(now)]
+        resting = sorted((e for e in self.endpoints if not e.available(now)), key=lambda e: e.open_until)
+        return available + resting
+
+    def _succeeded(self, endpoint: Endpoint, elapsed: float):
+        endpoint.failures = 0
+        endpoint.open_until = 0.0
+        endpoint.latency = elapsed if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * elapsed
+
+    def _failed(self, endpoint: Endpoint, error: Exception):
+        endpoint.failures += 1
+        if endpoint.failures >= self.failure_threshold:
+            endpoint.open_until = time.monotonic() + self.cooldown
+            logger.warning("RPC endpoint %s out of rotation for %ss: %s", endpoint.label, self.cooldown, error)
+
+    async def _post(self, payload) -> Any:
+        body = json.dumps(payload, default=_json_default)
+        last_error: Optional[Exception] = None
+        for endpoint in self._ranked():
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(endpoint.url, content=body)
+                response.raise_for_status()
+                replies = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                # Transport errors, 5xx/429 and garbage bodies: try the next endpoint
+                self._failed(endpoint, e)
+                last_error = e
+                continue
+            self._succeeded(endpoint, time.perf_counter() - started)
+            return replies
+        raise RPCUnavailable(f"All RPC endpoints failed: {last_error}")
+
+    def _up_samples(self):
+        now = time.monotonic()
+        for endpoint in self.endpoints:
+            yield {"endpoint": endpoint.label}, int(endpoint.available(now))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "endpoint": endpoint.label,
+                "up": endpoint.available(now),
+                "failures": endpoint.failures,
+                "latency_ms": round(endpoint.latency * 1000, 3) if endpoint.latency is not None else None
+            }
+            for endpoint in self.endpoints
+        ]
@@ -0,0 +1,29 @@
+# utils/rpc_provider.py
+from typing import Any
+
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from utils.rpc_gateway import RPCGateway, RPCUnavailable
+
+class GatewayProvider(AsyncBaseProvider):
+    """AsyncWeb3 provider that sends every request through an RPCGateway"""
+
+    def __init__(self, gateway: RPCGateway):
+        self.gateway = gateway
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return await self.gateway.make_request(method, params)
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            reply = await self.gateway.make_request("web3_clientVersion", [])
+        except RPCUnavailable:
+            if show_traceback:
+                raise
+            return False
+        return "result" in reply
+
+def gateway_web3(gateway: RPCGateway) -> AsyncWeb3:
+    return AsyncWeb3(GatewayProvider(gateway))
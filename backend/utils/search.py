@@ -0,0 +1,143 @@
+# utils/search.py
+import re
+from typing import List
+
+from sqlalchemy import or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import models
+
+# SQLite: external-content FTS5 table kept in sync by triggers
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, description,
+        content='books', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, description ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO books_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+# Postgres: weighted tsvector maintained by the database as a generated column
+POSTGRES_FTS_DDL = [
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH = text("""
+    SELECT books.* FROM books_fts
+    JOIN books ON books.id = books_fts.rowid
+    WHERE books_fts MATCH :query AND books.status = :status
+    ORDER BY bm25(books_fts, 10.0, 1.0)
+    LIMIT :limit OFFSET :offset
+""")
+
+POSTGRES_SEARCH = text("""
+    SELECT books.* FROM books, websearch_to_tsquery('english', :query) AS query
+    WHERE books.search_vector @@ query AND books.status = :status
+    ORDER BY ts_rank_cd(books.search_vector, query) DESC, books.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+def setup_search(conn: Connection):
+    """Create the full-text index for the connection's dialect; safe to call repeatedly"""
+    if conn.dialect.name == "sqlite":
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")
+        ).first()
+        if exists:
+            return
+        for statement in SQLITE_FTS_DDL:
+            conn.execute(text(statement))
+        # Index rows that predate the FTS table
+        conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    elif conn.dialect.name == "postgresql":
+        for statement in POSTGRES_FTS_DDL:
+            conn.execute(text(statement))
+
+def drop_search(conn: Connection):
+    """Remove the full-text index created by setup_search"""
+    if conn.dialect.name == "sqlite":
+        for trigger in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS books_fts"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_books_search_vector"))
+        conn.execute(text("ALTER TABLE books DROP COLUMN IF EXISTS search_vector"))
+
+def is_search_object(type_: str, name: str) -> bool:
+    """Whether name is a full-text table, column or index setup_search creates outside the models"""
+    if type_ == "table":
+        # The FTS5 table plus the shadow tables SQLite keeps for it
+        return name == "books_fts" or name.startswith("books_fts_")
+    if type_ == "column":
+        return name == "search_vector"
+    if type_ == "index":
+        return name == "ix_books_search_vector"
+    return False
+
+def fts5_query(query: str) -> str:
+    """Turn free text into an FTS5 expression: all terms required, last one as a prefix"""
+    terms = re.findall(r"\w+", query, re.UNICODE)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def like_search(db: Session, query: str, limit: int, offset: int) -> List[models.Book]:
+    """Unranked fallback for dialects without a full-text index: every term as a substring"""
+    terms = re.findall(r"\w+", query, re.UNICODE)
+    if not terms:
+        return []
+    books = db.query(models.Book).filter(models.Book.status == models.BookStatus.CONFIRMED)
+    for term in terms:
+        pattern = "%" + term.replace("_", "\\_") + "%"
+        books = books.filter(or_(
+            models.Book.title.ilike(pattern, escape="\\"),
+            models.Book.description.ilike(pattern, escape="\\")
+        ))
+    return books.order_by(models.Book.id.desc()).limit(limit).offset(offset).all()
+
+def search_books(db: Session, query: str, limit: int = 20, offset: int = 0) -> List[models.Book]:
+    """Return confirmed books ranked by relevance to query (newest first without full-text support)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = fts5_query(query)
+        if not match:
+            return []
+        statement, params = SQLITE_SEARCH, {"query": match}
+    elif dialect == "postgresql":
+        statement, params = POSTGRES_SEARCH, {"query": query}
+    else:
+        return like_search(db, query, limit, offset)
+
+    params.update(status=models.BookStatus.CONFIRMED.value, limit=limit, offset=offset)
+    return db.query(models.Book).from_statement(statement.bindparams(**params)).all()
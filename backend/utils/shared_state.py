@@ -0,0 +1,352 @@
+# utils/shared_state.py
+"""State that must agree between every worker serving the API.
+
+Nonce counters, wallet login challenges, login failure counters and cached
+book totals live here rather than in process memory. Each backend implements
+the same small subset of the redis.asyncio client API (get/set/getdel/delete/
+incr/expire/lock), so code written against one runs on all of them:
+
+- memory://                 One process only; the default for a single worker
+- sqlite:///shared_state.db Every worker on one host, through a WAL-mode file
+- redis://host:6379/0       Workers on any number of hosts (needs the redis package)
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import settings
+
+class LockTimeout(Exception):
+    """A shared lock could not be acquired within blocking_timeout"""
+
+class SharedState(ABC):
+    """Interface shared by the backends; values are strings, expiries in seconds"""
+
+    # Whether other processes see the same data; multi-worker serving requires it
+    shared = True
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ex: Optional[float] = None, nx: bool = False) -> bool:
+        """Store value, expiring after ex seconds; with nx only if key is absent"""
+
+    @abstractmethod
+    async def getdel(self, key: str) -> Optional[str]:
+        """Return and remove key atomically: at most one caller gets the value"""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> int:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """Add amount to an integer value (0 if absent), keeping its expiry"""
+
+    @abstractmethod
+    async def expire(self, key: str, seconds: float) -> bool:
+        ...
+
+    @abstractmethod
+    def lock(self, name: str, timeout: float = 30.0, blocking_timeout: Optional[float] = None):
+        """Async context manager holding a lock across processes.
+
+        The lock lapses after timeout seconds so a crashed holder cannot wedge
+        the others. blocking_timeout=0 tries once; LockTimeout if not acquired.
+        """
+
+    async def aclose(self):
+        pass
+
+class MemoryState(SharedState):
+    """Process-local backend, bounded to max_entries with oldest entries evicted first"""
+
+    shared = False
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _live(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def _store(self, key: str, value: str, expires_at: Optional[float]):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: str, ex: Optional[float] = None, nx: bool = False) -> bool:
+        if nx and self._live(key) is not None:
+            return False
+        self._store(key, str(value), time.monotonic() + ex if ex else None)
+        return True
+
+    async def getdel(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        if entry is None:
+            return None
+        del self._entries[key]
+        return entry[0]
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        entry = self._live(key)
+        value = int(entry[0]) + amount if entry else amount
+        self._store(key, str(value), entry[1] if entry else None)
+        return value
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        entry = self._live(key)
+        if entry is None:
+            return False
+        self._entries[key] = (entry[0], time.monotonic() + seconds)
+        return True
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float = 30.0, blocking_timeout: Optional[float] = None):
+        # One process: a plain asyncio.Lock, which never lapses, is enough
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        if blocking_timeout == 0:
+            if lock.locked():
+                raise LockTimeout(name)
+            await lock.acquire()
+        else:
+            try:
+                await asyncio.wait_for(lock.acquire(), blocking_timeout)
+            except asyncio.TimeoutError:
+                raise LockTimeout(name)
+        try:
+            yield
+        finally:
+            lock.release()
+
+class SQLiteState(SharedState):
+    """Backend for several workers on one host, stored in a SQLite file.
+
+    Every call is one short transaction on a worker thread; expiry uses wall
+    clock time, which all processes on the host share.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000, lock_poll_interval: float = 0.01):
+        self.path = path
+        self.lock_poll_interval = lock_poll_interval
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._mutex = threading.Lock()
+        self._writes = 0
+
+    def _run(self, func, *args):
+        return asyncio.to_thread(self._transaction, func, *args)
+
+    def _read(self, func, *args):
+        # Plain reads need no write lock
+        with self._mutex:
+            return func(time.time(), *args)
+
+    def _transaction(self, func, *args):
+        with self._mutex:
+            # IMMEDIATE takes the write lock up front, so read-modify-write is atomic
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(time.time(), *args)
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    self._conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def _select(self, now: float, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        return self._conn.execute(
+            "SELECT value, expires_at FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, now)
+        ).fetchone()
+
+    def _upsert(self, key: str, value: str, expires_at: Optional[float]):
+        self._conn.execute(
+            "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, expires_at)
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        def get(now, key):
+            row = self._select(now, key)
+            return row[0] if row else None
+        return await asyncio.to_thread(self._read, get, key)
+
+    async def set(self, key: str, value: str, ex: Optional[float] = None, nx: bool = False) -> bool:
+        def set_(now, key, value, ex, nx):
+            if nx and self._select(now, key) is not None:
+                return False
+            self._upsert(key, value, now + ex if ex else None)
+            return True
+        return await self._run(set_, key, str(value), ex, nx)
+
+    async def getdel(self, key: str) -> Optional[str]:
+        def getdel(now, key):
+            row = self._select(now, key)
+            self._conn.execute("DELETE FROM shared_state WHERE key = ?", (key,))
+            return row[0] if row else None
+        return await self._run(getdel, key)
+
+    async def delete(self, *keys: str) -> int:
+        def delete(now, keys):
+            return sum(self._conn.execute("DELETE FROM shared_state WHERE key = ?", (key,)).rowcount for key in keys)
+        return await self._run(delete, keys)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        def incr(now, key, amount):
+            row = self._select(now, key)
+            value = int(row[0]) + amount if row else amount
+            self._upsert(key, str(value), row[1] if row else None)
+            return value
+        return await self._run(incr, key, amount)
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        def expire(now, key, seconds):
+            return self._conn.execute(
+                "UPDATE shared_state SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (now + seconds, key, now)
+            ).rowcount > 0
+        return await self._run(expire, key, seconds)
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float = 30.0, blocking_timeout: Optional[float] = None):
+        key, token = f"lock:{name}", uuid.uuid4().hex
+        deadline = None if blocking_timeout is None else time.monotonic() + blocking_timeout
+        while not await self.set(key, token, ex=timeout, nx=True):
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout(name)
+            await asyncio.sleep(self.lock_poll_interval)
+        try:
+            yield
+        finally:
+            # Only our own token: the lock may have lapsed and been taken by another worker
+            def release(now, key, token):
+                self._conn.execute("DELETE FROM shared_state WHERE key = ? AND value = ?", (key, token))
+            await self._run(release, key, token)
+
+    async def aclose(self):
+        with self._mutex:
+            self._conn.close()
+
+class RedisState(SharedState):
+    """Backend for workers on several hosts; a thin wrapper over redis.asyncio"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("SHARED_STATE_URL uses redis:// but the redis package is not installed") from e
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: str, ex: Optional[float] = None, nx: bool = False) -> bool:
+        # px keeps sub-second expiries, which ex would reject
+        return bool(await self._redis.set(key, value, px=int(ex * 1000) if ex else None, nx=nx))
+
+    async def getdel(self, key: str) -> Optional[str]:
+        return await self._redis.getdel(key)
+
+    async def delete(self, *keys: str) -> int:
+        return await self._redis.delete(*keys)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self._redis.incr(key, amount)
+
+    async def expire(self, key: str, seconds: float) -> bool:
+        return bool(await self._redis.pexpire(key, int(seconds * 1000)))
+
+    @asynccontextmanager
+    async def lock(self, name: str, timeout: float = 30.0, blocking_timeout: Optional[float] = None):
+        lock = self._redis.lock(f"lock:{name}", timeout=timeout, blocking_timeout=blocking_timeout)
+        if not await lock.acquire(blocking=blocking_timeout != 0):
+            raise LockTimeout(name)
+        try:
+            yield
+        finally:
+            try:
+                await lock.release()
+            except Exception:
+                # Lapsed while held; whoever holds it now keeps it
+                pass
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+def create_shared_state(url: str, busy_timeout_ms: int = 5000) -> SharedState:
+    """Backend for a memory://, sqlite:///path or redis:// URL"""
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryState()
+    if scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute.db, as in DATABASE_URL
+        return SQLiteState(url[len("sqlite:///"):], busy_timeout_ms=busy_timeout_ms)
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+class RateLimiter:
+    """Fixed-window counter of events per key, shared by every worker"""
+
+    def __init__(self, state: SharedState, name: str, limit: int, window: float):
+        self.state = state
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _key(self, key: str) -> str:
+        return f"rate:{self.name}:{key}:{int(time.time() // self.window)}"
+
+    def retry_after(self) -> int:
+        """Seconds until the current window closes"""
+        return max(int(self.window - time.time() % self.window), 1)
+
+    async def hit(self, key: str) -> int:
+        """Count one event for key, returning the count in this window"""
+        window_key = self._key(key)
+        count = await self.state.incr(window_key)
+        if count == 1:
+            await self.state.expire(window_key, self.window)
+        return count
+
+    async def exceeded(self, key: str) -> bool:
+        if self.limit <= 0:
+            return False
+        count = await self.state.get(self._key(key))
+        return count is not None and int(count) >= self.limit
+
+shared_state = create_shared_state(settings.SHARED_STATE_URL, busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS)
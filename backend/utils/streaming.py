@@ -0,0 +1,61 @@
+# utils/streaming.py
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_range_header(value: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into an inclusive (start, end) pair.
+
+    Returns None when the whole entity should be sent: no header, a unit other
+    than bytes, or a multi-range request. Raises RangeNotSatisfiable when the
+    range falls outside the entity.
+    """
+    if not value or not value.startswith("bytes="):
+        return None
+    spec = value[len("bytes="):].strip()
+    if "," in spec:
+        return None
+
+    start_text, sep, end_text = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            suffix = int(end_text)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable(value)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(value)
+    return start, min(end, size - 1)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+async def iter_file_range(path: Path, start: int, length: int, chunk_size: int) -> AsyncIterator[bytes]:
+    """Read length bytes from path starting at start, one chunk at a time"""
+    handle = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(handle.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(handle.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
@@ -0,0 +1,74 @@
+# utils/transactions.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from web3 import AsyncWeb3
+from web3.exceptions import TransactionNotFound
+
+from utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+class BroadcastOutcomeUnknown(Exception):
+    """The broadcast request failed without an answer; the node may hold the transaction"""
+
+class TransactionManager:
+    """Signs, broadcasts and tracks transactions without blocking the event loop"""
+
+    def __init__(self, w3: AsyncWeb3, poll_interval: float = 2.0):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def send_transaction(self, transaction: Dict[str, Any], private_key: str) -> str:
+        """Sign and broadcast a transaction, returning its hash without waiting for a receipt"""
+        with stage("tx_sign"):
+            # Signing is CPU-bound elliptic-curve math
+            signed_txn = await asyncio.to_thread(self.w3.eth.account.sign_transaction, transaction, private_key)
+        with stage("tx_broadcast"):
+            try:
+                tx_hash = await self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            except ValueError as e:
+                # The node answered: either a rejection, or a failover retry of a
+                # broadcast the first endpoint had already accepted
+                if "already known" not in str(e).lower():
+                    raise
+                tx_hash = signed_txn.hash
+            except Exception as e:
+                # A timeout or dropped connection says nothing about whether it was accepted
+                raise BroadcastOutcomeUnknown(str(e)) from e
+        return tx_hash.hex()
+
+    async def get_receipt(self, tx_hash: str):
+        """Return the receipt for a mined transaction, or None while it is still pending"""
+        try:
+            with stage("receipt_fetch"):
+                return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def _watch(self, handler: Callable[[], Awaitable[None]]):
+        while True:
+            try:
+                await handler()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Receipt watcher iteration failed")
+            await asyncio.sleep(self.poll_interval)
+
+    def start_watcher(self, handler: Callable[[], Awaitable[None]]):
+        """Run handler every poll_interval seconds in a background task"""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch(handler))
+
+    async def stop_watcher(self):
+        """Cancel the background watcher task"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
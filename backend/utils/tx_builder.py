@@ -0,0 +1,207 @@
+# utils/tx_builder.py
+import asyncio
+import logging
+import math
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from web3 import AsyncWeb3
+
+from utils.metrics import stage
+from utils.transactions import TransactionManager
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Tracked:
+    sender: str
+    private_key: str
+    transaction: Dict[str, Any]
+    hashes: List[str] = field(default_factory=list)
+    first_sent_at: float = 0.0
+    last_sent_at: float = 0.0
+
+class TransactionBuilder:
+    """Builds, prices and re-prices contract transactions.
+
+    Gas limits come from eth_estimateGas plus a safety margin, cached per
+    function and calldata size bucket. Fees are EIP-1559 fields derived from
+    eth_feeHistory, falling back to a legacy gasPrice on nodes without a base
+    fee. Transactions sent through send() are tracked until mined; any still
+    pending after replace_after seconds is re-sent with the same nonce and
+    bumped fees.
+    """
+
+    def __init__(
+        self,
+        w3: AsyncWeb3,
+        tx_manager: TransactionManager,
+        gas_margin: float = 1.2,
+        bucket_bytes: int = 64,
+        estimate_ttl: float = 300.0,
+        fee_history_blocks: int = 10,
+        priority_percentile: float = 50.0,
+        min_priority_fee: int = 0,
+        fee_ttl: float = 3.0,
+        replace_after: float = 120.0,
+        bump_percent: float = 12.5,
+        max_replacements: int = 5,
+        track_for: float = 600.0
+    ):
+        self.w3 = w3
+        self.tx_manager = tx_manager
+        self.gas_margin = gas_margin
+        self.bucket_bytes = bucket_bytes
+        self.fee_history_blocks = fee_history_blocks
+        self.priority_percentile = priority_percentile
+        self.min_priority_fee = min_priority_fee
+        self.replace_after = replace_after
+        self.bump_percent = bump_percent
+        self.max_replacements = max_replacements
+        self.track_for = track_for
+        self._estimates = TTLCache(ttl=estimate_ttl)
+        self._fees = TTLCache(ttl=fee_ttl, max_entries=1)
+        self._chain_id: Optional[int] = None
+        self._tracked: Dict[str, _Tracked] = {}
+
+    # Gas
+
+    def _bucket_key(self, call) -> tuple:
+        data = call._encode_transaction_data()
+        size = (len(data) - 2) // 2
+        return call.fn_name, math.ceil(size / self.bucket_bytes)
+
+    async def estimate_gas(self, call, sender: str) -> int:
+        """Gas limit for call: its estimate plus the margin, reused across the size bucket"""
+        key = self._bucket_key(call)
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            with stage("gas_estimate"):
+                estimate = await call.estimate_gas({"from": sender})
+            self._estimates.set(key, estimate)
+        return math.ceil(estimate * self.gas_margin)
+
+    # Fees
+
+    async def _fetch_fees(self) -> Dict[str, int]:
+        try:
+            history = await self.w3.eth.fee_history(self.fee_history_blocks, "latest", [self.priority_percentile])
+            base_fee = history["baseFeePerGas"][-1]
+        except Exception:
+            base_fee = None
+        if not base_fee:
+            # Pre-London node (or legacy Ganache): a single gas price
+            return {"gasPrice": await self.w3.eth.gas_price}
+
+        rewards = [reward[0] for reward in history.get("reward") or [] if reward]
+        priority_fee = max(int(statistics.median(rewards)) if rewards else 0, self.min_priority_fee)
+        # Headroom for the base fee to double before the transaction is included
+        return {
+            "maxPriorityFeePerGas": priority_fee,
+            "maxFeePerGas": 2 * base_fee + priority_fee
+        }
+
+    async def suggest_fees(self) -> Dict[str, int]:
+        """Fee fields for a transaction sent now, shared across calls for a few seconds"""
+        fees = self._fees.get("fees")
+        if fees is None:
+            with stage("fee_suggest"):
+                fees = await self._fetch_fees()
+            self._fees.set("fees", fees)
+        return dict(fees)
+
+    async def chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = await self.w3.eth.chain_id
+        return self._chain_id
+
+    # Build and send
+
+    async def build(self, call, sender: str, nonce: int) -> Dict[str, Any]:
+        """Fully populated transaction, so build_transaction makes no RPCs of its own"""
+        gas, fees, chain_id = await asyncio.gather(
+            self.estimate_gas(call, sender), self.suggest_fees(), self.chain_id()
+        )
+        return await call.build_transaction({
+            "from": sender,
+            "nonce": nonce,
+            "gas": gas,
+            "chainId": chain_id,
+            **fees
+        })
+
+    async def send(self, call, sender: str, private_key: str, nonce: int) -> str:
+        """Build, sign and broadcast call; the transaction is re-priced if it stalls"""
+        transaction = await self.build(call, sender, nonce)
+        tx_hash = await self.tx_manager.send_transaction(transaction, private_key)
+        now = time.monotonic()
+        self._tracked[tx_hash] = _Tracked(sender, private_key, transaction, [tx_hash], now, now)
+        return tx_hash
+
+    def mined(self, tx_hash: str):
+        """Stop tracking a transaction whose receipt has been seen"""
+        self._tracked.pop(tx_hash, None)
+
+    # Replacement
+
+    def _bump(self, transaction: Dict[str, Any], fees: Dict[str, int]) -> Dict[str, Any]:
+        factor = 1 + self.bump_percent / 100
+        bumped = dict(transaction)
+        # Nodes only accept a replacement that raises every fee field by the bump
+        for name in ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"):
+            if name in transaction:
+                bumped[name] = max(math.ceil(transaction[name] * factor), fees.get(name, 0))
+        if "maxFeePerGas" in bumped:
+            bumped["maxFeePerGas"] = max(bumped["maxFeePerGas"], bumped["maxPriorityFeePerGas"])
+        return bumped
+
+    async def replace_stuck(self) -> Dict[str, str]:
+        """Re-price transactions pending past the deadline.
+
+        Returns {previous hash: current hash} for every transaction whose
+        tracking hash changed, either to a replacement or to an earlier
+        version that was mined first, so callers can follow the move.
+        """
+        moved = {}
+        now = time.monotonic()
+        for tx_hash, tracked in list(self._tracked.items()):
+            if now - tracked.first_sent_at > self.track_for:
+                del self._tracked[tx_hash]
+                continue
+            if now - tracked.last_sent_at < self.replace_after:
+                continue
+
+            # Any version, including an earlier one, may have been mined meanwhile
+            mined_hash = None
+            for sent_hash in reversed(tracked.hashes):
+                if await self.tx_manager.get_receipt(sent_hash) is not None:
+                    mined_hash = sent_hash
+                    break
+            if mined_hash is not None:
+                del self._tracked[tx_hash]
+                if mined_hash != tx_hash:
+                    moved[tx_hash] = mined_hash
+                continue
+            if len(tracked.hashes) > self.max_replacements:
+                continue
+
+            transaction = self._bump(tracked.transaction, await self.suggest_fees())
+            try:
+                new_hash = await self.tx_manager.send_transaction(transaction, tracked.private_key)
+            except Exception as e:
+                # Typically "nonce too low": one of the versions was just mined
+                logger.warning("Replacing %s failed: %s", tx_hash, e)
+                tracked.last_sent_at = now
+                continue
+
+            logger.info("Replaced stuck transaction %s with %s", tx_hash, new_hash)
+            tracked.transaction = transaction
+            tracked.hashes.append(new_hash)
+            tracked.last_sent_at = now
+            del self._tracked[tx_hash]
+            self._tracked[new_hash] = tracked
+            moved[tx_hash] = new_hash
+        return moved
@@ -0,0 +1,26 @@
+# utils/wallets.py
+from typing import Tuple
+
+# eth_account is imported on first use: it is among the slowest imports of a
+# worker, and only registration and wallet login need it.
+
+def create_account() -> Tuple[str, str]:
+    """New Ethereum keypair as (checksummed address, hex private key)"""
+    from eth_account import Account
+
+    account = Account.create()
+    return account.address, account.key.hex()
+
+def verify_signature(message: str, signature: str, address: str) -> bool:
+    """Whether signature is address's personal_sign signature of message.
+
+    Raises ValueError for a signature that cannot be decoded at all.
+    """
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    try:
+        recovered = Account.recover_message(encode_defunct(text=message), signature=signature)
+    except Exception as e:
+        raise ValueError(f"Signature verification failed: {str(e)}") from e
+    return recovered.lower() == address.lower()
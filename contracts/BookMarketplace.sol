@@ -30,6 +30,7 @@ contract BookMarketplace is Ownable, ReentrancyGuard, Pausable {
     
     uint256 public platformFeePercent = 10; // 10% platform fee
     uint256 public constant MAX_FEE_PERCENT = 30; // Maximum 30% platform fee
+    uint256 public constant MAX_BATCH_SIZE = 100; // Maximum books per createBooks call
     
     // Events
     event BookCreated(
@@ -83,6 +84,33 @@ contract BookMarketplace is Ownable, ReentrancyGuard, Pausable {
         string memory ipfsHash,
         uint256 price
     ) external whenNotPaused returns (uint256) {
+        return _createBook(title, ipfsHash, price);
+    }
+    
+    function createBooks(
+        string[] calldata titles,
+        string[] calldata ipfsHashes,
+        uint256[] calldata prices
+    ) external whenNotPaused returns (uint256[] memory) {
+        require(titles.length > 0, "Batch cannot be empty");
+        require(titles.length <= MAX_BATCH_SIZE, "Batch too large");
+        require(
+            titles.length == ipfsHashes.length && titles.length == prices.length,
+            "Array length mismatch"
+        );
+        
+        uint256[] memory bookIds = new uint256[](titles.length);
+        for (uint256 i = 0; i < titles.length; i++) {
+            bookIds[i] = _createBook(titles[i], ipfsHashes[i], prices[i]);
+        }
+        return bookIds;
+    }
+    
+    function _createBook(
+        string memory title,
+        string memory ipfsHash,
+        uint256 price
+    ) internal returns (uint256) {
         require(bytes(title).length > 0, "Title cannot be empty");
         require(bytes(ipfsHash).length > 0, "IPFS hash cannot be empty");
         require(price > 0, "Price must be greater than 0");
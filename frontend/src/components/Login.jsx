@@ -42,7 +42,7 @@ const Login = ({ onLogin }) => {
     <div className="login-container">
       <h2>{isRegistering ? 'Register' : 'Login'}</h2>
       
-      <WalletConnect onConnect={handleWalletConnect} />
+      <WalletConnect onConnect={handleWalletConnect} onLogin={onLogin} />
 
       <form onSubmit={handleSubmit} className="login-form">
         <input
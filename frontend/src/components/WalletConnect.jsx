@@ -1,11 +1,15 @@
 import { useState, useEffect } from 'react';
 import { Box, Button, Text, VStack, useToast } from '@chakra-ui/react';
+import axios from 'axios';
 import { web3Service } from '../utils/web3';
 
-function WalletConnect({ onConnect }) {
+const API_URL = 'http://localhost:8000';
+
+function WalletConnect({ onConnect, onLogin }) {
     const [account, setAccount] = useState(null);
     const [balance, setBalance] = useState(null);
     const [isLoading, setIsLoading] = useState(false);
+    const [isSigningIn, setIsSigningIn] = useState(false);
     const [error, setError] = useState(null);
     const toast = useToast();
 
@@ -73,6 +77,33 @@ function WalletConnect({ onConnect }) {
         }
     };
 
+    // Challenge/response login: sign a one-time server nonce instead of sending a password
+    const signInWithWallet = async () => {
+        setIsSigningIn(true);
+        setError(null);
+
+        try {
+            const { data: challenge } = await axios.get(`${API_URL}/auth/challenge`, {
+                params: { wallet_address: account }
+            });
+            const signature = await web3Service.signer.signMessage(challenge.message);
+            const { data } = await axios.post(`${API_URL}/auth/wallet`, {
+                wallet_address: account,
+                signature,
+                nonce: challenge.nonce
+            });
+
+            localStorage.setItem('token', data.access_token);
+            localStorage.setItem('refreshToken', data.refresh_token);
+            onLogin(data.access_token);
+        } catch (err) {
+            console.error('Wallet sign-in failed:', err);
+            setError(err.response?.data?.detail || 'Wallet sign-in failed');
+        } finally {
+            setIsSigningIn(false);
+        }
+    };
+
     return (
         <Box p={6} borderWidth={1} borderRadius="lg" maxW="400px" mx="auto">
             <VStack spacing={4}>
@@ -93,6 +124,17 @@ function WalletConnect({ onConnect }) {
                             {account}
                         </Text>
                         <Text>Balance: {balance} ETH</Text>
+                        {onLogin && (
+                            <Button
+                                colorScheme="teal"
+                                onClick={signInWithWallet}
+                                isLoading={isSigningIn}
+                                loadingText="Waiting for signature..."
+                                width="100%"
+                            >
+                                Sign in with Wallet
+                            </Button>
+                        )}
                     </>
                 )}
                 